@@ -10,12 +10,16 @@ import sys
 import time
 
 # local modules
+import pynt.logger
 import pynt.elements
 import pynt.layers
 import pynt.paths
+import pynt.rangeset
 import pynt.algorithm.output
 
 
+logger = logging.getLogger("pynt.algorithm")
+
 
 # Three checks for the algorithm variants:
 # - channelsAvailable(): are enough channels available (only checked after a "merge" of channels)
@@ -47,6 +51,8 @@ class BaseAlgorithm(object):
     solution        = None  # algorithm-specific, for example a Path or list of Path objects
     _runalgorithm   = False # True if algorithm was run
     progressfunc    = None  # Callback function, called for each step as progressfunc(count, path, leaves, note)
+    compiledgraph   = None  # pynt.graph.CompiledGraph, or None to read the connections from the network elements
+    labelcontinuity = False # if True, only return solutions with a common label on all interfaces at the layer of the source
     def __init__(self):
         self.outerleaves = []
         # self.tree = []
@@ -70,7 +76,6 @@ class BaseAlgorithm(object):
         self.progressPrinters.remove(output)
     
     def setEndpoints(self, startcp, endcp):
-        logger = logging.getLogger("pynt.algorithm")
         self.sourcecp = startcp
         self.destinationcp = endcp
         if startcp.getLayer() != endcp.getLayer():
@@ -107,15 +112,69 @@ class BaseAlgorithm(object):
         return connection
     
     def findShortestPath(self):
+        """Run the search, and return the solution. The search holds the writelock of the context of the 
+        source, so it sees the network elements as they are before or after a fetch, never halfway."""
         if not self._runalgorithm:
-            starthop = self.createHop(self.sourcecp, pynt.paths.StartingPoint(), pynt.paths.Path())
-            self.outerleaves.append(starthop.getPath())
-            self.breadthfirstsearch()
+            context = self.sourcecp.getNamespace().context
+            context.writelock.acquire()
+            try:
+                starthop = self.createHop(self.sourcecp, pynt.paths.StartingPoint(), pynt.paths.Path())
+                self.outerleaves.append(starthop.getPath())
+                self.breadthfirstsearch()
+                if self.labelcontinuity:
+                    self.solution = self.getFeasiblePaths(self.solution)
+            finally:
+                context.writelock.release()
             self._runalgorithm = True
         return self.solution
     
+    def getPathLabelSets(self, path):
+        """Return the label sets of the connection points in the path at the layer of the first connection point.
+        Empty label sets are skipped; we assume the layer has no concept of labels at those interfaces."""
+        layer = path[0].getConnectionPoint().getLayer()
+        labelsets = []
+        for hop in path:
+            cp = hop.getConnectionPoint()
+            if cp.getLayer() == layer:
+                labelset = cp.getLabelSet()
+                if not labelset.isempty():
+                    labelsets.append(labelset)
+        return labelsets
+    
+    def getCommonLabelSets(self, paths=None):
+        """Return a list with the common labels of all interfaces at the layer of the source, for each path
+        (by default, the solutions). The label sets of all paths are intersected in one call.
+        The common labels of a path without any label set are None (any label)."""
+        if paths == None:
+            paths = self.solution
+        groups = [self.getPathLabelSets(path) for path in paths]
+        commonlabelsets = pynt.rangeset.IntersectAll(groups)
+        for (i, group) in enumerate(groups):
+            if not group:
+                commonlabelsets[i] = None
+        return commonlabelsets
+    
+    def getFeasiblePaths(self, paths=None):
+        """Return the paths (by default, the solutions) with at least one common label on all interfaces at 
+        the layer of the source, so that the same label (e.g. wavelength) can be used along the whole path."""
+        if paths == None:
+            paths = self.solution
+        commonlabelsets = self.getCommonLabelSets(paths)
+        return [path for (path, commonlabels) in zip(paths, commonlabelsets) if (commonlabels == None) or not commonlabels.isempty()]
+    
+    def assignLabels(self, paths=None):
+        """Return a list with the label to use on each path (by default, the solutions): the lowest common
+        label of the interfaces at the layer of the source (first fit), or None if there is no such label."""
+        labels = []
+        for commonlabels in self.getCommonLabelSets(paths):
+            if commonlabels:
+                labels.append(commonlabels[0].min)
+            else:
+                labels.append(None)
+        return labels
+    
     def breadthfirstsearch(self):
-        logger = logging.getLogger("pynt.algorithm")
+        trace = pynt.logger.IsTracing(logger)
         logger.log(25, "Starting breadth first search algorithm")
         c = 0
         self.printProgressHeader()
@@ -125,9 +184,11 @@ class BaseAlgorithm(object):
                 logger.warning("No more leaves to parse after %d iterations; %d paths found" % (c,len(self.solution)))
                 break
             # walk all outerleaves, finding the one with the smallest metric
-            logger.debug("Find smallest metric of %d outer leaves" % len(self.outerleaves))
+            if trace:
+                logger.debug("Find smallest metric of %d outer leaves", len(self.outerleaves))
             smallmetricpath  = self.getSmallestMetricLeaf()
-            logger.debug("Examining path %s" % smallmetricpath)
+            if trace:
+                logger.debug("Examining path %s", smallmetricpath)
             # if this is the destination hop, and the stack is empty:
             #   store in solution.
             if smallmetricpath.getLastHop().getConnectionPoint() == self.destinationcp:
@@ -185,7 +246,6 @@ class BaseAlgorithm(object):
     
     def stopAlgorithm(self, currentmetric):
         """Return True if the algorithm may stop."""
-        logger = logging.getLogger("pynt.algorithm")
         #self.minsolutionmetric
         #self.maxsolutionmetric        
         ##self.getequalmetricsolutions = False  # get all solutions of the same metric
@@ -217,7 +277,7 @@ class BaseAlgorithm(object):
         1. getNextCCpList() quickly get a list of (connection, connection point)
         2. createHop() objects (this can be a very expensive operation)
         3. check IsValidPath(hop) to see if the path with new hop is really valid"""
-        logger = logging.getLogger("pynt.algorithm")
+        trace = pynt.logger.IsTracing(logger, logging.INFO)
         hop    = path.getLastHop()
         curcp  = hop.getConnectionPoint()
         if len(path) >= 2:
@@ -230,7 +290,8 @@ class BaseAlgorithm(object):
         validpaths = []
         if len(nextccps) > 1:
             # we will branch the tree. Make sure each branch uses it's own values by smart-copying the path
-            logger.info("Branching path %s in %d branches" % (path, len(nextccps)))
+            if trace:
+                logger.info("Branching path %s in %d branches", path, len(nextccps))
             # Note: copying a path is a time-consuming operation, and should be avoided if possible.
             path = path.copy()
         for (nextconnection, nextcp) in nextccps:
@@ -244,9 +305,11 @@ class BaseAlgorithm(object):
                     nextpath = nexthop.path
                 else:
                     nextpath = path
-                logger.info("Terminate path %s: %s" % (nextpath, e))
+                if trace:
+                    logger.info("Terminate path %s: %s", nextpath, e)
         if len(nextccps) == 0:
-            logger.info("Terminate path %s: no connections points towards direction(s) %s found" % (path, alloweddirections))
+            if trace:
+                logger.info("Terminate path %s: no connections points towards direction(s) %s found", path, alloweddirections)
         return validpaths
     
     def getAllowedNextDirections(self, path):
@@ -256,75 +319,69 @@ class BaseAlgorithm(object):
         """Return a list of possible (connection, connection point) (c+cp), one distance from the given connection point.
         The only filter we have is a custom direction object, which is typically a list, but is algorithm-specific.
         Typicall directions are internal/external/adaptation/deadaptation. By default, use directionAll"""
-        logger = logging.getLogger("pynt.algorithm")
-        logger.debug("Find list of type '%s' connections from %s" % (direction, cp))
+        trace = pynt.logger.IsTracing(logger)
+        if trace:
+            logger.debug("Find list of type '%s' connections from %s", direction, cp)
         ccplist = []
         if pynt.paths.directionInternal in direction:
             extendlist = self.getNextPotentialSwitchToList(cp)
-            logger.debug("Found %d potential switch to interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d potential switch to interfaces", len(extendlist))
             ccplist.extend(extendlist)
             extendlist = self.getNextPotentialDeAdaptationList(cp)
-            logger.debug("Found %d potential client interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d potential client interfaces", len(extendlist))
             ccplist.extend(extendlist)
         if pynt.paths.directionExternal in direction:
             extendlist = self.getNextLinkToList(cp)
-            logger.debug("Found %d linked to interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d linked to interfaces", len(extendlist))
             ccplist.extend(extendlist)
             extendlist = self.getNextPotentialAdaptationList(cp)
-            logger.debug("Found %d potential server interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d potential server interfaces", len(extendlist))
             ccplist.extend(extendlist)
         return ccplist
     
+    def setCompiledGraph(self, graph):
+        """Read the connections from the given pynt.graph.CompiledGraph (or from the network elements if graph 
+        is None). The graph is not updated: changes after it was compiled are not seen by the algorithm."""
+        self.compiledgraph = graph
+    
+    def getNeighbours(self, cp, kind):
+        """Return the (connection point, via) neighbours of the given kind of cp, from the graph if it is set."""
+        if self.compiledgraph != None:
+            return self.compiledgraph.getNeighbours(cp, kind)
+        return cp.getNeighbours(kind)
+    
     def getNextActualSwitchToList(self, cp):
         """Return a list tuples (SwitchToConnection, connection point) for each 
         actual switchedTo (including packet and circuit switchedto) from the 
         given cp to another interface."""
-        ccplist = []
-        switchmatrix = cp.getSwitchMatrix()
-        if switchmatrix:
-            for intf in switchmatrix.getActualSwitchedInterfaces(cp, bidirectional=True):
-                connection = self.createConnection(pynt.paths.SwitchMatrixConnection, switchmatrix)
-                ccplist.append((connection, intf))
-        else:
-            for intf in cp.getActualSwitchedInterfaces(bidirectional=True):
-                connection = self.createConnection(pynt.paths.SwitchToConnection)
-                ccplist.append((connection, intf))
-        return ccplist
+        return self.getSwitchToList(self.getNeighbours(cp, "actualswitched"))
     
     def getNextPotentialSwitchToList(self, cp):
         """Return a list tuples (SwitchToConnection, connection point) for each 
         potential switchedTo (including configurable, as those are clearly can be created) 
         from the given cp to another interface."""
-        ccplist = []
-        switchmatrix = cp.getSwitchMatrix()
-        if switchmatrix:
-            #print "%s: %s -> ? (potential switched interfaces)" % (switchmatrix.getName(), cp)
-            for intf in switchmatrix.getPotentialSwitchedInterfaces(cp, bidirectional=True):
-                connection = self.createConnection(pynt.paths.SwitchMatrixConnection, switchmatrix)
-                ccplist.append((connection, intf))
-            #print "%s: %s -> %s" % (switchmatrix.getName(), cp, [ccp[1].getName() for ccp in ccplist])
-        else:
-            for intf in cp.getPotentialSwitchedInterfaces(bidirectional=True):
-                connection = self.createConnection(pynt.paths.SwitchToConnection)
-                ccplist.append((connection, intf))
-        return ccplist
+        return self.getSwitchToList(self.getNeighbours(cp, "potentialswitched"))
     
     def getNextAvailableSwitchToList(self, cp):
         """Return a list tuples (SwitchToConnection, connection point) for each 
         potential switchedTo (including configurable, as those are clearly can be created) 
         from the given cp to another interface."""
+        return self.getSwitchToList(self.getNeighbours(cp, "availableswitched"))
+    
+    def getSwitchToList(self, neighbours):
+        """Return a list of (connection, connection point) for the (interface, switchmatrix) 
+        neighbours in the adjacency index of a connection point."""
         ccplist = []
-        switchmatrix = cp.getSwitchMatrix()
-        if switchmatrix:
-            # print "%s: %s %s>%s -> ? (available switched interfaces)" % (switchmatrix.getName(), cp, cp.ingressLabelSetToStr(), cp.internalLabelSetToStr())
-            for intf in switchmatrix.getAvailableSwitchedInterfaces(cp, bidirectional=True):
+        for (intf, switchmatrix) in neighbours:
+            if switchmatrix:
                 connection = self.createConnection(pynt.paths.SwitchMatrixConnection, switchmatrix)
-                ccplist.append((connection, intf))
-            # print "%s: %s -> %s" % (switchmatrix.getName(), cp, [ccp[1].getName() for ccp in ccplist])
-        else:
-            for intf in cp.getAvailableSwitchedInterfaces(bidirectional=True):
+            else:
                 connection = self.createConnection(pynt.paths.SwitchToConnection)
-                ccplist.append((connection, intf))
+            ccplist.append((connection, intf))
         return ccplist
     
     def getNextLinkToList(self, cp):
@@ -332,14 +389,12 @@ class BaseAlgorithm(object):
         linkedTo (including those in a broadcastsegment) from the given cp to another 
         interface."""
         ccplist = []
-        for intf in cp.getLinkedInterfacesOnly():
+        for (intf, via) in self.getNeighbours(cp, "linked"):
             connection = self.createConnection(pynt.paths.LinkToConnection)
             ccplist.append((connection, intf))
-        broadcastsegment = cp.getBroadcastSegment()
-        if broadcastsegment:
-            for intf in broadcastsegment.getOtherInterfaces(cp):
-                connection = self.createConnection(pynt.paths.BroadcastSwitchToConnection, broadcastsegment)
-                ccplist.append((connection, intf))
+        for (intf, broadcastsegment) in self.getNeighbours(cp, "broadcast"):
+            connection = self.createConnection(pynt.paths.BroadcastSwitchToConnection, broadcastsegment)
+            ccplist.append((connection, intf))
         return ccplist
     
     def getNextConnectedToList(self, cp):
@@ -348,7 +403,7 @@ class BaseAlgorithm(object):
         ccplist = []
         # We want connected interfaces only, because linked interfaces will 
         # otherwise be returned as well!
-        for intf in cp.getConnectedInterfacesOnly():
+        for (intf, via) in self.getNeighbours(cp, "connected"):
             connection = self.createConnection(pynt.paths.ConnectedToConnection)
             ccplist.append((connection, intf))
         return ccplist
@@ -357,10 +412,7 @@ class BaseAlgorithm(object):
         """Return a list tuples (AdaptationConnection, connection point) for each 
         server layer interface from the given cp to another interface."""
         ccplist = []
-        adaptationfunction = cp.getServerAdaptationFunction()
-        if adaptationfunction == None:
-            return []
-        for intf in cp.getServerInterfaces():
+        for (intf, adaptationfunction) in self.getNeighbours(cp, "actualserver"):
             connection = self.createConnection(pynt.paths.AdaptationConnection, adaptationfunction)
             ccplist.append((connection, intf))
         return ccplist
@@ -370,7 +422,7 @@ class BaseAlgorithm(object):
         server layer interface from the given cp to another interface, both actual 
         and potential server layer interfaces."""
         ccplist = []
-        for (intf,adaptationfunction) in cp.getAllServerTuples():
+        for (intf, adaptationfunction) in self.getNeighbours(cp, "server"):
             connection = self.createConnection(pynt.paths.AdaptationConnection, adaptationfunction)
             ccplist.append((connection, intf))
         return ccplist
@@ -385,10 +437,7 @@ class BaseAlgorithm(object):
         """Return a list tuples (AdaptationConnection, connection point) for each 
         client layer interface from the given cp to another interface."""
         ccplist = []
-        adaptationfunction = cp.getClientAdaptationFunction()
-        if adaptationfunction == None:
-            return []
-        for intf in cp.getClientInterfaces():
+        for (intf, adaptationfunction) in self.getNeighbours(cp, "actualclient"):
             connection = self.createConnection(pynt.paths.DeAdaptationConnection, adaptationfunction)
             ccplist.append((connection, intf))
         return ccplist
@@ -398,7 +447,7 @@ class BaseAlgorithm(object):
         server layer interface from the given cp to another interface, both actual 
         and potential server layer interfaces."""
         ccplist = []
-        for (intf,adaptationfunction) in cp.getAllClientTuples():
+        for (intf, adaptationfunction) in self.getNeighbours(cp, "client"):
             connection = self.createConnection(pynt.paths.DeAdaptationConnection, adaptationfunction)
             ccplist.append((connection, intf))
         return ccplist
@@ -426,8 +475,9 @@ class BaseAlgorithm(object):
           the same VLAN if it was already used earlier in the same path)
         - etc., etc.
         """
-        logger = logging.getLogger("pynt.algorithm")
-        logger.debug("Validate path: %s" % path)
+        trace = pynt.logger.IsTracing(logger)
+        if trace:
+            logger.debug("Validate path: %s", path)
         if len(path) < 2:
             raise InvalidPath("Path length < 2; can't get previous hop")
         hop = path.getLastHop()
@@ -524,9 +574,10 @@ class BaseAlgorithm(object):
         assert(isinstance(nextcp, pynt.elements.ConnectionPoint))
         assert(isinstance(nextconnection, pynt.paths.Connection))
         assert(isinstance(path, pynt.paths.Path))
-        logger = logging.getLogger("pynt.algorithm")
+        trace = pynt.logger.IsTracing(logger)
         stack  = path.getStack()
-        logger.debug("Creating Hop of (%s) %s %s" % (nextconnection.getDescription(), type(nextcp).__name__, nextcp.getURIdentifier()))
+        if trace:
+            logger.debug("Creating Hop of (%s) %s %s", nextconnection.getDescription(), type(nextcp).__name__, nextcp.getURIdentifier())
         if isinstance(nextconnection, pynt.paths.AdaptationConnection):      # increase the stack (always create a copy!)
             stackelt = self.getLayerProperty(nextconnection, nextcp)
             stack = pynt.paths.Stack(stack[:])  # make a copy of the stack.
@@ -588,7 +639,6 @@ class BaseAlgorithm(object):
             interfacecount     = 1
             adaptationfunction = None
         if not interfacecount:
-            logger = logging.getLogger("pynt.algorithm")
             logger.warning("Server layer count of adaptation %s is not defined. Assuming 1." % connection.adaptationfunction)
             interfacecount = 1
         stackelt = pynt.paths.LayerProperty(layer, adaptationfunction, interfacecount)
@@ -603,22 +653,27 @@ class PathFind(BaseAlgorithm):
         """Return a list of possible (connection, connection point) (c+cp), one distance from the given connection point.
         The only filter we have is a custom direction object, which is typically a list, but is algorithm-specific.
         Typicall directions are internal/external/adaptation/deadaptation. By default, use directionAll"""
-        logger = logging.getLogger("pynt.algorithm")
-        logger.debug("Find list of type '%s' connections from %s" % (direction, cp))
+        trace = pynt.logger.IsTracing(logger)
+        if trace:
+            logger.debug("Find list of type '%s' connections from %s", direction, cp)
         ccplist = []
         if pynt.paths.directionInternal in direction:
             extendlist = self.getNextPotentialSwitchToList(cp)
-            logger.debug("Found %d potential switch to interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d potential switch to interfaces", len(extendlist))
             ccplist.extend(extendlist)
             extendlist = self.getNextPotentialDeAdaptationList(cp)
-            logger.debug("Found %d potential client interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d potential client interfaces", len(extendlist))
             ccplist.extend(extendlist)
         if pynt.paths.directionExternal in direction:
             extendlist = self.getNextLinkToList(cp)
-            logger.debug("Found %d linked to interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d linked to interfaces", len(extendlist))
             ccplist.extend(extendlist)
             extendlist = self.getNextPotentialAdaptationList(cp)
-            logger.debug("Found %d potential server interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d potential server interfaces", len(extendlist))
             ccplist.extend(extendlist)
         return ccplist
     
@@ -642,8 +697,9 @@ class PFTopology(PathFind):
           the same VLAN if it was already used earlier in the same path)
         - etc., etc.
         """
-        logger = logging.getLogger("pynt.algorithm")
-        logger.debug("Validate path: %s" % path)
+        trace = pynt.logger.IsTracing(logger)
+        if trace:
+            logger.debug("Validate path: %s", path)
         if len(path) < 2:
             raise InvalidPath("path length < 2; can't get previous hop")
         hop = path.getLastHop()
@@ -661,7 +717,8 @@ class PFTopology(PathFind):
             raise InvalidPath("connection point %s exhausted available channels (it is already used earlier in the path)" % (path.getLastHop().getConnectionPoint()))
         if isinstance(connection, pynt.paths.SwitchMatrixConnection) and self.visitedMatrixBefore(path):
             raise InvalidPath("switch matrix %s processed before" % (connection.switchmatrix))
-        logger.debug("Path is valid: %s: no irregularities found" % (path))
+        if trace:
+            logger.debug("Path is valid: %s: no irregularities found", path)
         return True
     
 
@@ -684,8 +741,9 @@ class PFAdaptation(PathFind):
           the same VLAN if it was already used earlier in the same path)
         - etc., etc.
         """
-        logger = logging.getLogger("pynt.algorithm")
-        logger.debug("Validate path: %s" % path)
+        trace = pynt.logger.IsTracing(logger)
+        if trace:
+            logger.debug("Validate path: %s", path)
         if len(path) < 2:
             raise InvalidPath("path length < 2; can't get previous hop")
         hop = path.getLastHop()
@@ -703,7 +761,8 @@ class PFAdaptation(PathFind):
             raise InvalidPath("connection point %s exhausted available channels (it is already used earlier in the path)" % (path.getLastHop().getConnectionPoint()))
         if isinstance(connection, pynt.paths.SwitchMatrixConnection) and self.visitedMatrixBefore(path):
             raise InvalidPath("switch matrix %s processed before" % (connection.switchmatrix))
-        logger.debug("Path is valid: %s: no irregularities found" % (path))
+        if trace:
+            logger.debug("Path is valid: %s: no irregularities found", path)
         return True
     
 
@@ -713,22 +772,27 @@ class PFAvailable(PathFind):
         """Return a list of possible (connection, connection point) (c+cp), one distance from the given connection point.
         The only filter we have is a custom direction object, which is typically a list, but is algorithm-specific.
         Typicall directions are internal/external/adaptation/deadaptation. By default, use directionAll"""
-        logger = logging.getLogger("pynt.algorithm")
-        logger.debug("Find list of type '%s' connections from %s" % (direction, cp))
+        trace = pynt.logger.IsTracing(logger)
+        if trace:
+            logger.debug("Find list of type '%s' connections from %s", direction, cp)
         ccplist = []
         if pynt.paths.directionInternal in direction:
             extendlist = self.getNextAvailableSwitchToList(cp)
-            logger.debug("Found %d available switch to interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d available switch to interfaces", len(extendlist))
             ccplist.extend(extendlist)
             extendlist = self.getNextAvailableDeAdaptationList(cp)
-            logger.debug("Found %d available client interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d available client interfaces", len(extendlist))
             ccplist.extend(extendlist)
         if pynt.paths.directionExternal in direction:
             extendlist = self.getNextLinkToList(cp)
-            logger.debug("Found %d linked to interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d linked to interfaces", len(extendlist))
             ccplist.extend(extendlist)
             extendlist = self.getNextAvailableAdaptationList(cp)
-            logger.debug("Found %d available server interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d available server interfaces", len(extendlist))
             ccplist.extend(extendlist)
         return ccplist
     def IsValidPath(self, path):
@@ -748,8 +812,9 @@ class PFAvailable(PathFind):
           the same VLAN if it was already used earlier in the same path)
         - etc., etc.
         """
-        logger = logging.getLogger("pynt.algorithm")
-        logger.debug("Validate path: %s" % path)
+        trace = pynt.logger.IsTracing(logger)
+        if trace:
+            logger.debug("Validate path: %s", path)
         if len(path) < 2:
             raise InvalidPath("path length < 2; can't get previous hop")
         hop     = path.getLastHop()
@@ -836,7 +901,8 @@ class PFAvailable(PathFind):
                 # TODO: This overwrites earlier labels. That is not good if swapping is possible.
                 if newlabels != labelsofar:
                     curlayerproperties.setEgressLabelSet(newlabels)
-        logger.debug("Path is valid: %s: no irregularities found" % (path))
+        if trace:
+            logger.debug("Path is valid: %s: no irregularities found", path)
         return True
     
 
@@ -844,7 +910,8 @@ class PFAvailable(PathFind):
 
 class PathWalk(BaseAlgorithm):
     def breadthfirstsearch(self):
-        logger = logging.getLogger("pynt.algorithm")
+        trace = pynt.logger.IsTracing(logger)
+        traceinfo = pynt.logger.IsTracing(logger, logging.INFO)
         logger.log(25, "Starting bread first search algorithm")
         print "Try  Hops  Metric Outerleaves in tree"
         print "---- ----- ------ -------------------------------------------------------"
@@ -855,9 +922,11 @@ class PathWalk(BaseAlgorithm):
                 logger.warning("No more leaves to parse; %d paths found" % len(self.solution))
                 return False # return without a solution
             # walk all outerleaves, finding the one with the smallest metric
-            logger.debug("Find smallest metric of %d outer leaves" % len(self.outerleaves))
+            if trace:
+                logger.debug("Find smallest metric of %d outer leaves", len(self.outerleaves))
             smallmetricpath  = self.getSmallestMetricLeaf()
-            logger.info("Examining path %s" % smallmetricpath)
+            if traceinfo:
+                logger.info("Examining path %s", smallmetricpath)
             if smallmetricpath.getMetric() > self.metriclimit:
                 logger.warning("Reached metric limit %.2f; %d paths found" % (self.metriclimit, len(self.solution)))
             else:
@@ -880,22 +949,27 @@ class PathWalk(BaseAlgorithm):
         Typicall directions are internal/external/adaptation/deadaptation. By default, use directionAll.
            
         This function is overridden from BaseAlgorithm, because we want actual switched to interfaces, not potential."""
-        logger = logging.getLogger("pynt.algorithm")
-        logger.debug("Find list of type '%s' connections from %s" % (direction, cp))
+        trace = pynt.logger.IsTracing(logger)
+        if trace:
+            logger.debug("Find list of type '%s' connections from %s", direction, cp)
         ccplist = []
         if pynt.paths.directionInternal in direction:
             extendlist = self.getNextActualSwitchToList(cp)
-            logger.debug("Found %d potential switch to interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d potential switch to interfaces", len(extendlist))
             ccplist.extend(extendlist)
             extendlist = self.getNextActualDeAdaptationList(cp)
-            logger.debug("Found %d potential client interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d potential client interfaces", len(extendlist))
             ccplist.extend(extendlist)
         if pynt.paths.directionExternal in direction:
             extendlist = self.getNextLinkToList(cp)
-            logger.debug("Found %d linked to interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d linked to interfaces", len(extendlist))
             ccplist.extend(extendlist)
             extendlist = self.getNextActualAdaptationList(cp)
-            logger.debug("Found %d potential server interfaces" % (len(extendlist)))
+            if trace:
+                logger.debug("Found %d potential server interfaces", len(extendlist))
             ccplist.extend(extendlist)
         return ccplist
 
@@ -910,7 +984,7 @@ class PFDuplicateStackSupression(PFTest):
     pass
 
 class PFShortestPathOnce(PFTest):
-    visitedcp       = None  # dict with a list of visited connection points (at switch matrices) with stacks. Used to supress duplicate searches
+    visitedcp       = None  # dict, sorted by objectid of visited connection points (at switch matrices), pointing to a list of stacks. Used to supress duplicate searches
     def visitedMatrixBefore(self, path):
         """Checks if a path goes through an switch matrix that has been used before
         *in this or any other path* with the same stack and the same or a subset of available labels 
@@ -925,14 +999,15 @@ class PFShortestPathOnce(PFTest):
         #print "Processing %s / %s:\n  %s" % (switchmatrix, cp, stack)
         if self.visitedcp == None:
             self.visitedcp = {}
-        if cp not in self.visitedcp:
-            self.visitedcp[cp] = [stack.copy()]
-            #print "visitedcp[%s] is now %s" % (cp, self.visitedcp[cp])
+        cpid = cp.getObjectId()
+        if cpid not in self.visitedcp:
+            self.visitedcp[cpid] = [stack.copy()]
+            #print "visitedcp[%s] is now %s" % (cp, self.visitedcp[cpid])
             return False
-        for visitedstack in self.visitedcp[cp]:
+        for visitedstack in self.visitedcp[cpid]:
             if stack.issubset(visitedstack): # we already visited this cp before
                 return True
-        self.visitedcp[cp].append(stack.copy())
+        self.visitedcp[cpid].append(stack.copy())
         return False
 
 class PFExplicitDirection(PFTest):
@@ -6,6 +6,7 @@ import pynt.algorithm.output
 import pynt.output.dot
 import pynt.elements
 import pynt.xmlns
+import pynt.capacity
 
 infinity = "infinity"
 
@@ -28,6 +29,7 @@ class Dijkstra(pynt.algorithm.BaseAlgorithm):
             raise Exception("Please provide a valid subject for the Dijkstra Algorithm \
                              to search in (or None to search everything.)")
         self.solution = []
+        self.insufficient = None  # set of objectids with too little available capacity, if the capacity store is used
         # self.setPrinter(pynt.algorithm.output.defaultProgressPrinter())
         # self.setPrinter(pynt.algorithm.output.TextProgressPrinter())
         self.setPrinter(DijkstraDotSolutionPrinter(outfile=outfile, subject=subject))
@@ -51,6 +53,8 @@ class Dijkstra(pynt.algorithm.BaseAlgorithm):
         self.destinationcp = endcp
         
     def getNeighbors(self, cp):
+        if self.compiledgraph != None:
+            return self.getCompiledGraphNeighbors(cp)
         if isinstance(cp, pynt.elements.Interface):
             neighbors = []
             for intf in cp.getConnectedInterfacesOnly():
@@ -82,6 +86,27 @@ class Dijkstra(pynt.algorithm.BaseAlgorithm):
         # if self.subjects:
         #     return filter(lambda x:x.getNamespace() in self.subjects, neighbors)
 
+    def getCompiledGraphNeighbors(self, cp):
+        """Same as getNeighbors(), with the "mutualconnected" and "membership" connections of the compiled graph."""
+        graph = self.compiledgraph
+        if isinstance(cp, pynt.elements.Interface):
+            neighbors = []
+            if not (self.intraDomain and cp not in self.restrictedGraph):
+                neighbors.extend([intf for (intf, via) in graph.getNeighbours(cp, "mutualconnected")])
+            neighbors.extend([element for (element, via) in graph.getNeighbours(cp, "membership")])
+            if not self.intraDomain and self.subjects:
+                return filter(lambda x:x.getNamespace() in self.subjects, neighbors)
+            else:
+                return neighbors
+        elif isinstance(cp, (pynt.elements.SwitchMatrix, pynt.elements.Device)):
+            return [intf for (intf, via) in graph.getNeighbours(cp, "membership")]
+        elif isinstance(cp, pynt.elements.BroadcastSegment):
+            neighbors = [intf for (intf, via) in graph.getNeighbours(cp, "mutualconnected")]
+            if self.subjects:
+                return filter(lambda x:x.getNamespace() in self.subjects, neighbors)
+            else:
+                return neighbors
+    
     def getRestrictedGraph(self, bandwidth=None):
         result = []
         if isinstance(self.sourcecp, pynt.elements.Device):
@@ -93,6 +118,14 @@ class Dijkstra(pynt.algorithm.BaseAlgorithm):
         for dev in devs:
             result += dev.getNativeInterfaces()
         return result
+    
+    def filterCapacity(self, interfaces, bandwidth):
+        """Return the interfaces with an available capacity of at least bandwidth. Uses the 
+        capacity store of the context if NumPy is available."""
+        if pynt.capacity.IsAvailable() and interfaces:
+            store = pynt.capacity.GetCapacityStore(interfaces[0].getNamespace().context)
+            return store.filterInterfaces(interfaces, "availablecapacity", minimum=bandwidth)
+        return [intf for intf in interfaces if intf.getAvailableCapacity() >= bandwidth]
             
     def extractMin(self, unvisited, dist):
         # Sort the unvisited list based on the distances defined in dist.
@@ -108,7 +141,16 @@ class Dijkstra(pynt.algorithm.BaseAlgorithm):
     
     def getMetric(self, source, target, bandwidth=None):
         metric = 0
-        if bandwidth:
+        if bandwidth and (self.compiledgraph != None):
+            # NaN (no available capacity) is never smaller than bandwidth, -inf (None) always is
+            availablecapacities = self.compiledgraph.availablecapacities
+            for nodeid in (self.compiledgraph.getNodeId(source), self.compiledgraph.getNodeId(target)):
+                if (nodeid != None) and (availablecapacities[nodeid] < bandwidth):
+                    return infinity
+        elif bandwidth and (self.insufficient != None):
+            if (source.getObjectId() in self.insufficient) or (target.getObjectId() in self.insufficient):
+                return infinity
+        elif bandwidth:
             if hasattr(source, "getAvailableCapacity") and source.getAvailableCapacity() < bandwidth:
                 return infinity
             if hasattr(target, "getAvailableCapacity") and target.getAvailableCapacity() < bandwidth:
@@ -128,26 +170,34 @@ class Dijkstra(pynt.algorithm.BaseAlgorithm):
         
 
     def findShortestPath(self, startid=None, endid=None, bandwidth=None):
-        if self.intraDomain:
-            self.restrictedGraph = self.getRestrictedGraph()
         if startid:
             self.sourcecp = pynt.xmlns.GetRDFObject(startid)
         if endid:
             self.destinationcp = pynt.xmlns.GetRDFObject(endid)
-        q = [(0, self.sourcecp, ())]
+        if self.intraDomain:
+            self.restrictedGraph = set(self.getRestrictedGraph())
+        self.insufficient = None
+        if bandwidth and (self.compiledgraph == None) and pynt.capacity.IsAvailable():
+            # one array operation, instead of calling getAvailableCapacity() for each edge
+            store = pynt.capacity.GetCapacityStore(self.sourcecp.getNamespace().context)
+            self.insufficient = set(store.selectObjectIds("availablecapacity", below=bandwidth).tolist())
+        # queue and visited set are keyed on the objectid, which is cheaper to hash and 
+        # compare than the objects, and gives a deterministic order for equal costs.
+        q = [(0, self.sourcecp.getObjectId(), self.sourcecp, ())]
         visited = set()
         while q:
-            (cost, v1, path) = heapq.heappop(q)
-            if v1 not in visited:
-                visited.add(v1)
+            (cost, v1id, v1, path) = heapq.heappop(q)
+            if v1id not in visited:
+                visited.add(v1id)
                 path += (v1,)
                 if v1 == self.destinationcp:
                     return list(path)
                 for v2 in self.getNeighbors(v1):
-                    if v2 not in visited:
+                    v2id = v2.getObjectId()
+                    if v2id not in visited:
                         m = self.getMetric(v1,v2,bandwidth)
                         if not m == infinity:
-                            heapq.heappush(q, (cost+m, v2, path))
+                            heapq.heappush(q, (cost+m, v2id, v2, path))
         return None
     
 class DijkstraAbstract(Dijkstra):
@@ -198,9 +248,8 @@ class DijkstraStar(Dijkstra):
         self.graph = StarGraph()
         for dom in pynt.xmlns.GetAllRDFObjects(klass=pynt.elements.AdminDomain):
             # Get all devices that have an external interface
-            for intf in dom.getInterfaces():
-                if intf.getAvailableCapacity() >= bandwidth:
-                    self.graph.addEdgeInterface(dom,intf,bandwidth)
+            for intf in self.filterCapacity(dom.getInterfaces(), bandwidth):
+                self.graph.addEdgeInterface(dom,intf,bandwidth)
         return self.graph
 
     def addEndpoints(self):
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""The pynt.capacity module keeps the capacity and metric of all interfaces of a topology context
+in NumPy arrays, indexed by objectid, so that a bandwidth-constrained path computation can select
+interfaces with one array operation, instead of calling the getters of each interface.
+
+CapacityStore:
+    the columns of a context: capacity, availablecapacity, maximumreservablecapacity,
+    minimumreservablecapacity, granularity and metric of each connection point, and domain,
+    the objectid of the domain of its device (0 if there is none).
+
+A value of None is stored as -inf, as None is smaller than any number in Python. Rows of other
+objects, and of connection points without the attribute, are NaN, which fails every comparison.
+The store is updated from the change journal: only the changed connection points are read again.
+Like the other views of a context, it is not updated while a writer holds the writelock; see
+pynt.xmlns.TopologyContext.
+
+NumPy is optional. Callers should check IsAvailable(), and else use the getters of the interfaces.
+"""
+
+# built-in modules
+import logging
+import weakref
+# optional modules
+try:
+    import numpy
+except ImportError:
+    numpy = None
+# local modules
+import pynt.xmlns
+import pynt.elements
+
+
+# column name -> name of the getter of the connection point
+getters = {
+    "capacity":                     "getCapacity",
+    "availablecapacity":            "getAvailableCapacity",
+    "maximumreservablecapacity":    "getMaximumReservableCapacity",
+    "minimumreservablecapacity":    "getMinimumReservableCapacity",
+    "granularity":                  "getGranularity",
+    "metric":                       "getMetric",
+}
+
+
+def IsAvailable():
+    """Return True if NumPy is installed, and a CapacityStore can be used."""
+    return numpy != None
+
+
+def _isRegistered(rdfobject):
+    namespace = rdfobject.getNamespace()
+    return (namespace != None) and (namespace.elements.get(rdfobject.getIdentifier()) is rdfobject)
+
+def _getDomainId(interface):
+    device = interface.getDevice()
+    if (device == None) or (device.getDomain() == None):
+        return 0
+    return device.getDomain().getObjectId()
+
+
+class CapacityStore(object):
+    """Columns with the capacities and metric of the connection points in a context, indexed by objectid.
+    Call update() before reading the columns directly; the select and filter functions do so themselves."""
+    context         = None  # TopologyContext of this store
+    sequence        = None  # int, sequence number of the change journal at the last update, or None
+    columns         = None  # dict column name -> numpy array of floats, indexed by objectid
+    domains         = None  # numpy array of ints, indexed by objectid: objectid of the domain, or 0
+    present         = None  # numpy array of booleans, indexed by objectid: True for connection points
+    interfaces      = None  # list, indexed by objectid: weak reference to the ConnectionPoint, or None
+
+    def __init__(self, context):
+        if numpy == None:
+            raise ImportError("Module numpy is not available. It can be downloaded from http://numpy.scipy.org/\n")
+        self.context = context
+        self.clear(0)
+
+    def __str__(self):
+        return '<%s %s at %s>' % (type(self).__name__, self.context.getName(), self.sequence)
+    def __repr__(self):
+        return '<%s %s at %s>' % (type(self).__name__, self.context.getName(), self.sequence)
+
+    def clear(self, size):
+        self.columns = {}
+        for name in getters:
+            self.columns[name] = numpy.empty(size, dtype=float)
+            self.columns[name].fill(numpy.nan)
+        self.domains = numpy.zeros(size, dtype=int)
+        self.present = numpy.zeros(size, dtype=bool)
+        self.interfaces = [None] * size
+
+    def resize(self, size):
+        """Grow the columns, so that objectids below size fit."""
+        oldsize = len(self.interfaces)
+        if size <= oldsize:
+            return
+        size = max(size, 2*oldsize)
+        for name in getters:
+            column = numpy.empty(size, dtype=float)
+            column.fill(numpy.nan)
+            column[:oldsize] = self.columns[name]
+            self.columns[name] = column
+        domains = numpy.zeros(size, dtype=int)
+        domains[:oldsize] = self.domains
+        self.domains = domains
+        present = numpy.zeros(size, dtype=bool)
+        present[:oldsize] = self.present
+        self.present = present
+        self.interfaces.extend([None] * (size - oldsize))
+
+    def storeRow(self, interface):
+        objectid = interface.getObjectId()
+        self.resize(objectid + 1)
+        for (name, getter) in getters.iteritems():
+            if hasattr(interface, getter):
+                value = getattr(interface, getter)()
+                if value == None:
+                    value = -numpy.inf
+                self.columns[name][objectid] = value
+            else:
+                self.columns[name][objectid] = numpy.nan
+        self.domains[objectid] = _getDomainId(interface)
+        self.present[objectid] = True
+        self.interfaces[objectid] = weakref.ref(interface)   # the store does not keep interfaces alive
+
+    def clearRow(self, rdfobject):
+        objectid = rdfobject.getObjectId()
+        if objectid < len(self.interfaces):
+            for name in getters:
+                self.columns[name][objectid] = numpy.nan
+            self.domains[objectid] = 0
+            self.present[objectid] = False
+            self.interfaces[objectid] = None
+
+    def update(self, wait=False):
+        """Read the connection points which changed since the last update.
+        Reads all connection points if the changes are no longer in the journal.
+        If wait is False, the store is not updated while a writer holds the writelock."""
+        logger = logging.getLogger("pynt.capacity")
+        journal = self.context.getJournal()
+        if wait or (self.sequence == None):
+            self.context.writelock.acquire()
+        elif not self.context.writelock.acquire(False):
+            logger.debug("Writelock of %s is busy; using the connection points at %d" % (self.context, self.sequence))
+            return
+        try:
+            sequence = journal.getSequence()
+            if sequence == self.sequence:
+                return
+            changes = None
+            if self.sequence != None:
+                try:
+                    changes = journal.getChanges(self.sequence)
+                except pynt.xmlns.ChangesUnavailableException:
+                    changes = None
+            if changes != None and [change for change in changes if change[1] == None]:
+                changes = None  # a change of the whole registry, like a "deleteAll"
+            if changes == None:
+                interfaces = pynt.xmlns.GetAllRDFObjects(klass=pynt.elements.ConnectionPoint, context=self.context)
+                self.clear(max([0] + [interface.getObjectId() for interface in interfaces]) + 1)
+                for interface in interfaces:
+                    self.storeRow(interface)
+                logger.debug("Read all %d connection points of %s at %d" % (len(interfaces), self.context, sequence))
+            else:
+                changed = {}    # dict objectid -> rdfobject
+                for (changesequence, subject, change, value) in changes:
+                    for rdfobject in (subject, value):
+                        if isinstance(rdfobject, pynt.elements.ConnectionPoint):
+                            changed[rdfobject.getObjectId()] = rdfobject
+                        elif isinstance(rdfobject, pynt.xmlns.CollectedRDFObject) and issubclass(rdfobject.klass, pynt.elements.ConnectionPoint):
+                            changed[rdfobject.getObjectId()] = rdfobject
+                        elif isinstance(rdfobject, pynt.elements.Device):
+                            # the domain of a device applies to all its interfaces
+                            for interface in rdfobject.getLogicalInterfaces():
+                                changed[interface.getObjectId()] = interface
+                for rdfobject in changed.itervalues():
+                    if _isRegistered(rdfobject):
+                        self.storeRow(rdfobject)
+                    else:
+                        self.clearRow(rdfobject)
+                logger.debug("Read %d changed connection points of %s at %d" % (len(changed), self.context, sequence))
+            self.sequence = sequence
+        finally:
+            self.context.writelock.release()
+
+    def getColumn(self, name):
+        """Return the numpy array of the given column. Don't modify the array."""
+        self.update()
+        return self.columns[name]
+
+    def getValue(self, interface, name):
+        """Return the value of the given column for interface, as a float (-inf for None, NaN if unknown)."""
+        self.update()
+        objectid = interface.getObjectId()
+        if objectid >= len(self.interfaces):
+            return numpy.nan
+        return float(self.columns[name][objectid])
+
+    def getMask(self, name, minimum=None, below=None, domain=None):
+        """Return a boolean numpy array, indexed by objectid, which is True for the connection points
+        with minimum <= value < below, in the given domain. Each criterion is optional."""
+        self.update()
+        column = self.columns[name]
+        mask = self.present.copy()
+        olderrors = numpy.seterr(invalid='ignore')  # comparisons with NaN are False
+        try:
+            if minimum != None:
+                mask &= (column >= minimum)
+            if below != None:
+                mask &= (column < below)
+        finally:
+            numpy.seterr(**olderrors)
+        if domain != None:
+            mask &= (self.domains == domain.getObjectId())
+        return mask
+
+    def selectObjectIds(self, name, minimum=None, below=None, domain=None):
+        """Return a numpy array with the objectids of the connection points with minimum <= value < below."""
+        return numpy.flatnonzero(self.getMask(name, minimum=minimum, below=below, domain=domain))
+
+    def getInterfaces(self, name, minimum=None, below=None, domain=None):
+        """Return a list of the connection points with minimum <= value < below, in the given domain,
+        sorted by objectid. E.g. getInterfaces("availablecapacity", minimum=bandwidth, domain=domain)"""
+        interfaces = [self.interfaces[objectid]() for objectid in self.selectObjectIds(name, minimum=minimum, below=below, domain=domain)]
+        return [interface for interface in interfaces if interface != None]
+
+    def filterInterfaces(self, interfaces, name, minimum=None, below=None):
+        """Return the connection points in interfaces with minimum <= value < below, in the same order."""
+        self.update()
+        if not interfaces:
+            return []
+        objectids = numpy.array([interface.getObjectId() for interface in interfaces], dtype=int)
+        objectids[objectids >= len(self.interfaces)] = 0
+        values = self.columns[name][objectids]
+        values[objectids == 0] = numpy.nan
+        mask = numpy.ones(len(interfaces), dtype=bool)
+        olderrors = numpy.seterr(invalid='ignore')  # comparisons with NaN are False
+        try:
+            if minimum != None:
+                mask &= (values >= minimum)
+            if below != None:
+                mask &= (values < below)
+        finally:
+            numpy.seterr(**olderrors)
+        return [interfaces[i] for i in numpy.flatnonzero(mask)]
+
+
+def GetCapacityStore(context=None):
+    """Return the CapacityStore of the given (or else the active) context, updated to the latest change,
+    or to the last update before a fetch that is still running. Raises an ImportError if numpy is not available."""
+    context = pynt.xmlns.GetActiveContext(context)
+    store = context.capacitystore
+    if store == None:
+        store = CapacityStore(context)
+        context.capacitystore = store
+    store.update()
+    return store
@@ -3,6 +3,8 @@
 
 # built-in modules
 import logging
+import sys          # for Transaction.commit()
+import bisect       # for the sorted interface list of devices
 # local modules
 import pynt
 import pynt.xmlns
@@ -11,17 +13,71 @@ import pynt.layers
 import pynt.logger
 
 
+# shared by all network elements
+logger = logging.getLogger("pynt.elements")
+
+
+class OrderedSet(object):
+    """Set which remembers the insertion order. Membership tests, additions and removals take 
+    constant time. getView() returns the items as a list in insertion order; this list is kept 
+    up to date by add(), and is rebuilt after a removal. Don't modify the list."""
+    def __init__(self, items=()):
+        self.positions = {}     # dict item -> insertion number
+        self.counter = 0        # insertion number of the next item
+        self.view = []          # list of items in insertion order, or None after a removal
+        for item in items:
+            self.add(item)
+    def __contains__(self, item):
+        return item in self.positions
+    def __len__(self):
+        return len(self.positions)
+    def __iter__(self):
+        return iter(self.getView())
+    def add(self, item):
+        """Add item. Returns False if it was already present."""
+        if item in self.positions:
+            return False
+        self.positions[item] = self.counter
+        self.counter += 1
+        if self.view != None:
+            self.view.append(item)
+        return True
+    def discard(self, item):
+        """Remove item. Returns False if it was not present."""
+        if item not in self.positions:
+            return False
+        del self.positions[item]
+        self.view = None
+        return True
+    def getView(self):
+        if self.view == None:
+            self.view = sorted(self.positions, key=self.positions.get)
+        return self.view
+    def copy(self):
+        result = OrderedSet()
+        result.positions = self.positions.copy()
+        result.counter = self.counter
+        if self.view != None:
+            result.view = self.view[:]
+        else:
+            result.view = None
+        return result
+
+
 class NetworkElement(pynt.xmlns.RDFObject):
     """A network element; an RDF object representing a part of a physical network."""
+    __slots__ = ('location', 'logger')
     def __init__(self, identifier, namespace):
         # WARNING: A RDFObject should always be created using a [Get]CreateRDFObject() function
         # The init function must never create any other RDFObjects, even not indirectly
         pynt.xmlns.RDFObject.__init__(self, identifier=identifier, namespace=namespace)
         self.location = None
         pynt.logger.InitLogger()
-        self.logger = logging.getLogger("pynt.elements")
+        self.logger = logger
     
-    def setLocatedAt(self, location):   self.location = location
+    def setLocatedAt(self, location):
+        self.location = location
+        self.recordChange("setLocatedAt", location)
     def getLocatedAt(self):             return self.location
 
 
@@ -46,13 +102,35 @@ class ConnectionPoint(NetworkElement):
     
     Note if you want to create an Interface, use GetCreateConnectionPoint or 
     use the getCreateNativeInterface function of the relevant device."""
-    prefix              = ""    # string                           TODO: get rid of these?
-    blade               = 0     # int                              TODO: get rid of these?
-    port                = 0     # int                              TODO: get rid of these?
-    metric              = None
-    teaddress           = None
-    layer               = None  # Layer object or None (unknown)
-    device              = None  # parent device or None (unknown)
+    # Slots, set in __init__. There are many connection points, and most do not use most attributes.
+    __slots__ = (
+        'prefix',           # string                           TODO: get rid of these?
+        'blade',            # int                              TODO: get rid of these?
+        'port',             # int                              TODO: get rid of these?
+        'metric',
+        'teaddress',
+        'layer',            # Layer object or None (unknown)
+        'device',           # parent device or None (unknown)
+        'capacity',         # float (in Mbyte/s) or None (unknown)
+        'maximumReservableCapacity',
+        'minimumReservableCapacity',
+        'granularity',
+        'clientadaptations',    # dict of adaptation instances, indexed by AdaptationFunction. 
+        'serveradaptations',    # dict of adaptation instances, indexed by AdaptationFunction. 
+        # Only one interface in the list of adaptations may point to actual (non-potential) interfaces.
+        'linkedInterfaces',     # list of linkTo interfaces (currently: one at most)
+        'linkedSegment',        # linkTo broadcast segment
+        'connectedInterfaces',  # connectedTo interfaces (excluding linked interfaces)
+        'switchedInterfaces',   # switchedTo interfaces (excluding packetSwitched and circuitSwitched interfaces)
+        'packetSwtInterfaces',  # packetSwitchedTo interfaces
+        'circuitSwtInterfaces', # circuitSwitchedTo interfaces
+        'switchFromInterfaces', # sources of switchedTo with self as sink
+        'switchmatrix',         # switchmatrix (for now, only one.)
+        'properties',           # mapping of proptypes to propvalues
+        'adjacency',            # cache: (journal sequence number, dict kind -> tuple of neighbours). See getNeighbours()
+        'adaptationcache',      # cache: (adaptation version of the context, dict name -> tuple). See getClientStack()
+        # slots of the mix-ins are defined in the subclasses which use them.
+    )
     
     actual              = False # signifies that the CP has actual values associated with it. Opposite of potential.
     removable           = False # signifies that the CP may be marked as configued, and can be removed.
@@ -60,11 +138,6 @@ class ConnectionPoint(NetworkElement):
     potential           = False # signifies that the CP is not "real", but one or more can be instantiated. Opposite of actual.
     ismultiple          = False # True if this one object (can) represent(s) multiple connection points
     
-    capacity                = None  # float (in Mbyte/s) or None (unknown)
-    maximumReservableCapacity = None
-    minimumReservableCapacity = None
-    granularity               = None
-    
     #                       actual      removable  configurable  potential  ismultiple
     # Interface               +           -           ?           -           -
     # StaticInterface         +           -           -           -           -
@@ -72,38 +145,37 @@ class ConnectionPoint(NetworkElement):
     # PotentialInterface      -           ?           +           +           -
     # InstantiatedInterface   +           +           -           -           -
     
-    clientadaptations   = None  # dict of adaptation instances, indexed by AdaptationFunction. 
-    serveradaptations   = None  # dict of adaptation instances, indexed by AdaptationFunction. 
-    # Only one interface in the list of adaptations may point to actual (non-potential) interfaces.
-    
-    linkedInterfaces    = None  # list of linkTo interfaces (currently: one at most)
-    linkedSegment       = None  # linkTo broadcast segment
-    connectedInterfaces = None  # connectedTo interfaces (excluding linked interfaces)
-    switchedInterfaces  = None  # switchedTo interfaces (excluding packetSwitched and circuitSwitched interfaces)
-    packetSwtInterfaces = None  # packetSwitchedTo interfaces
-    circuitSwtInterfaces = None # circuitSwitchedTo interfaces
-    switchmatrix        = None  # switchmatrix (for now, only one.)
-
-    properties          = None  # mapping of proptypes to propvalues
-    
     def __init__(self, identifier, namespace):
         # WARNING: A RDFObject should always be created using a [Get]CreateRDFObject() function
         # The init function must never create any other RDFObjects, even not indirectly
         NetworkElement.__init__(self, identifier=identifier, namespace=namespace)
-        # list of interfaces. We MUST create the new lists here, not above, otherwise
-        # each interface will share the same list instance.
-        self.clientadaptations   = {}   # adaptation towards the client layer (towards the internal switchmatrix)
-        self.serveradaptations   = {}   # adaptation towards the server layer (towards the external linkTo)
-        self.linkedInterfaces    = []  # linkTo interfaces
+        self.prefix              = ""
+        self.blade               = 0
+        self.port                = 0
+        self.metric              = None
+        self.teaddress           = None
+        self.layer               = None
+        self.device              = None
+        self.capacity            = None
+        self.maximumReservableCapacity = None
+        self.minimumReservableCapacity = None
+        self.granularity         = None
+        # Most interfaces have no or few relations. The lists and dicts are shared read-only empty 
+        # instances, until getOwnContainer() allocates a list or dict for this interface.
+        self.clientadaptations   = pynt.xmlns.emptydict  # adaptation towards the client layer (towards the internal switchmatrix)
+        self.serveradaptations   = pynt.xmlns.emptydict  # adaptation towards the server layer (towards the external linkTo)
+        self.linkedInterfaces    = pynt.xmlns.emptylist  # linkTo interfaces
         self.linkedSegment       = None  # linkTo broadcast segment
-        self.connectedInterfaces = []  # connectedTo interfaces
-        self.switchedInterfaces  = []  # switchedTo interfaces
-        self.packetSwtInterfaces = []  # packetSwitchedTo interfaces
-        self.circuitSwtInterfaces = []  # circuitSwitchedTo interfaces
-        self.switchFromInterfaces = []  # sources of switchedTo with self as sink
+        self.connectedInterfaces = pynt.xmlns.emptylist  # connectedTo interfaces
+        self.switchedInterfaces  = pynt.xmlns.emptylist  # switchedTo interfaces
+        self.packetSwtInterfaces = pynt.xmlns.emptylist  # packetSwitchedTo interfaces
+        self.circuitSwtInterfaces = pynt.xmlns.emptylist  # circuitSwitchedTo interfaces
+        self.switchFromInterfaces = pynt.xmlns.emptylist  # sources of switchedTo with self as sink
         self.namespace.networkschema = True
-        self.properties = {}
+        self.properties = pynt.xmlns.emptydict
         self.switchmatrix = None
+        self.adjacency = None
+        self.adaptationcache = None
     
     def isConfigured(self):                         return self.removable
     def isPotential(self):                          return self.potential
@@ -111,16 +183,29 @@ class ConnectionPoint(NetworkElement):
     def setPrefix(self,prefix):                     self.prefix   = str(prefix)
     def setBlade(self,blade):                       self.blade    = int(blade)
     def setPort(self,port):                         self.port     = int(port)
-    def setMetric(self,metric):                     self.metric = int(metric)
-    def setTEAddress(self, teaddress):              self.teaddress = teaddress
-    def setCapacity(self, capacity):                self.capacity       = float(capacity)
-    def setMaximumReservableCapacity(self,maximumReservableCapacity):   self.maximumReservableCapacity = float(maximumReservableCapacity)
-    def setMinimumReservableCapacity(self,minimumReservableCapacity):   self.minimumReservableCapacity = float(minimumReservableCapacity)
-    def setGranularity(self,granularity):           self.granularity = float(granularity)
+    def setMetric(self,metric):
+        self.metric = int(metric)
+        self.recordChange("setMetric", self.metric)
+    def setTEAddress(self, teaddress):
+        self.teaddress = teaddress
+        self.recordChange("setTEAddress", teaddress)
+    def setCapacity(self, capacity):
+        self.capacity       = float(capacity)
+        self.recordChange("setCapacity", self.capacity)
+    def setMaximumReservableCapacity(self,maximumReservableCapacity):
+        self.maximumReservableCapacity = float(maximumReservableCapacity)
+        self.recordChange("setMaximumReservableCapacity", self.maximumReservableCapacity)
+    def setMinimumReservableCapacity(self,minimumReservableCapacity):
+        self.minimumReservableCapacity = float(minimumReservableCapacity)
+        self.recordChange("setMinimumReservableCapacity", self.minimumReservableCapacity)
+    def setGranularity(self,granularity):
+        self.granularity = float(granularity)
+        self.recordChange("setGranularity", self.granularity)
     
     def setLayer(self,layer):
         assert(isinstance(layer, pynt.layers.Layer))
         self.layer = layer
+        self.recordChange("setLayer", layer)
         # TODO: check if labels and labelsets are allowed with this new layer.
         # TODO: check if layer used to be something different.
     def setDevice(self, device):
@@ -128,6 +213,7 @@ class ConnectionPoint(NetworkElement):
             device.removeLogicalInterface(self)
         self.device = device
         device.addLogicalInterface(self)
+        self.recordChange("setDevice", device)
     def getPrefix(self):                            return self.prefix
     def getBlade(self):                             return self.blade
     def getPort(self):                              return self.port
@@ -163,8 +249,9 @@ class ConnectionPoint(NetworkElement):
             return
         # for reference: type of objectvalue is either rdflib.Literal.Literal or rdflib.URIRef.URIRef 
         # FIXME: check for property existing for layer
-        self.logger.debug("Setting property for %s to %s" % (identifier, value))
-        self.properties[str(identifier)] = value
+        self.logger.debug("Setting property for %s to %s", identifier, value)
+        self.getOwnContainer('properties')[str(identifier)] = value
+        self.recordChange("addProperty", str(identifier))
     def getProperty(self, identifier):
         """Looks for the identifier (for example egressStatus) in the list of
            properties and returns the value for the property. There are two
@@ -221,8 +308,10 @@ class ConnectionPoint(NetworkElement):
                     % (interface.getName(), self.getName(), currentAdaptation))
         adaptation.addServerInterface(self)
         adaptation.addClientInterface(interface)
-        self.clientadaptations[adaptationfunction] = adaptation
-        interface.serveradaptations[adaptationfunction] = adaptation
+        self.getOwnContainer('clientadaptations')[adaptationfunction] = adaptation
+        interface.getOwnContainer('serveradaptations')[adaptationfunction] = adaptation
+        self.resetAdaptationCache()
+        self.recordChange("addClientInterface", interface)
         #print "-> created adaptation %s" % adaptation
     def removeClientInterface(self, interface, adaptationfunction):
         """Remove a logical interface as a channel from the current interace"""
@@ -231,11 +320,11 @@ class ConnectionPoint(NetworkElement):
         assert(isinstance(interface, ConnectionPoint))
         # The following may raise a KeyError; we assume the adaptation is defined in both interfaces.
         adaptation = self.clientadaptations[adaptationfunction]
-        assert(adaptation == interface.clientadaptations[adaptationfunction])
+        assert(adaptation == interface.serveradaptations[adaptationfunction])
         # Note that we should either remove self and/or interface from the adaptation.
         # Thus not just remove interface. We remove both, unless there are still other 
         # client resp. server interfaces in the adaptation.
-        removeclient = (adaptation.allServerInterfaceCount() <= 1)
+        removeclient = (adaptation.allServersInterfaceCount() <= 1)
         removeserver = (adaptation.allClientInterfaceCount() <= 1)
         if removeclient:
             adaptation.removeClientInterface(interface)
@@ -243,8 +332,10 @@ class ConnectionPoint(NetworkElement):
         if removeserver:
             adaptation.removeServerInterface(self)
             del self.clientadaptations[adaptationfunction]
+        self.resetAdaptationCache()
+        self.recordChange("removeClientInterface", interface)
         # If all went well, we have no dangling adaptations.
-        assert(adaptation.allServerInterfaceCount() + adaptation.allClientInterfaceCount() != 1)
+        assert(adaptation.allServersInterfaceCount() + adaptation.allClientInterfaceCount() != 1)
     def addServerInterface(self, interface, adaptationfunction):
         """Add an a logical interface that embeds data of this interface, building an external adaptation stack"""
         interface.addClientInterface(self, adaptationfunction)
@@ -271,26 +362,21 @@ class ConnectionPoint(NetworkElement):
                 return adaptation.getClientInterfaces()
         return []
     def getAllClientTuples(self):
-        """Return a full list of (interface, adaptation) tuplets of client layer interfaces. 
-        Both actual and potential interfaces."""
-        interfaces = []
-        for adaptation in self.clientadaptations.values():
-            if adaptation.potentialclient:
-                interfaces.append((adaptation.potentialclient, adaptation.function))
-            for client in adaptation.clients:
-                interfaces.append((client, adaptation.function))
-        return interfaces
+        """Return a full tuple of (interface, adaptation) tuplets of client layer interfaces. 
+        Both actual and potential interfaces. Don't modify the tuple."""
+        return self.getAdaptationCache("allclient", _allClientTuples)
     def getPotentialClientTuples(self):
-        """Return a list of (interface, adaptation) tuplets for all client layer potential interfaces."""
-        interfaces = []
-        for adaptation in self.clientadaptations.values():
-            if adaptation.potentialclient:
-                interfaces.append((adaptation.potentialclient, adaptation.function))
-        return interfaces
+        """Return a tuple of (interface, adaptation) tuplets for all client layer potential interfaces."""
+        return self.getAdaptationCache("potentialclient", _potentialClientTuples)
+    def getClientStack(self):
+        """Return a tuple of (interface, adaptation) tuplets of all client layer interfaces, recursively, 
+        in the order of getClientStackInterfaces(). adaptation is the adaptation function with 
+        which the interface is adapted in the previous interface in the stack."""
+        return self.getAdaptationCache("clientstack", _clientStack)
     def getClientStackInterfaces(self, curlist=None):
         """Recursively fetch all client layer interfaces, building a full stack of channels"""
         if curlist == None:
-            curlist = []
+            return [interface for (interface, adaptation) in self.getClientStack()]
         # depth first tree search with duplicate elimination
         for (interface,adaptation) in self.getAllClientTuples():
             if interface in curlist:
@@ -317,22 +403,17 @@ class ConnectionPoint(NetworkElement):
                 return adaptation.getServerInterfaces()
         return []
     def getAllServerTuples(self):
-        """Return a full list of (interface, adaptationfunction) tuplets of server layer interfaces. 
-        Both actual and potential interfaces."""
-        interfaces = []
-        for adaptation in self.serveradaptations.values():
-            if adaptation.potentialserver:
-                interfaces.append((adaptation.potentialserver, adaptation.function))
-            for server in adaptation.servers:
-                interfaces.append((server, adaptation.function))
-        return interfaces
+        """Return a full tuple of (interface, adaptationfunction) tuplets of server layer interfaces. 
+        Both actual and potential interfaces. Don't modify the tuple."""
+        return self.getAdaptationCache("allserver", _allServerTuples)
     def getPotentialServerTuples(self):
-        """Return a list of (interface, adaptation) tuplets for all server layer potential interfaces."""
-        interfaces = []
-        for adaptation in self.serveradaptations.values():
-            if adaptation.potentialserver:
-                interfaces.append((adaptation.potentialserver, adaptation.function))
-        return interfaces
+        """Return a tuple of (interface, adaptation) tuplets for all server layer potential interfaces."""
+        return self.getAdaptationCache("potentialserver", _potentialServerTuples)
+    def getServerStack(self):
+        """Return a tuple of (interface, adaptation) tuplets of all server layer interfaces, recursively, 
+        in the order of getServerStackInterfaces(). adaptation is the adaptation function with 
+        which the previous interface in the stack is adapted in the interface."""
+        return self.getAdaptationCache("serverstack", _serverStack)
     def isClientMultiplexingInterface(self):
         """Return True if the interface is (potentially) one of multiple channels in a multiplexing adaptation.
         This is determined by the adaptation functions."""
@@ -345,7 +426,7 @@ class ConnectionPoint(NetworkElement):
     def getServerStackInterfaces(self, curlist=None):
         """Recursively fetch all server layer interfaces, building a full external adaptation stack"""
         if curlist == None:
-            curlist = []
+            return [interface for (interface, adaptation) in self.getServerStack()]
         # depth first tree search with duplicate elimination
         for (interface,adaptation) in self.getAllServerTuples():
             if interface in curlist:
@@ -354,7 +435,30 @@ class ConnectionPoint(NetworkElement):
             curlist.append(interface)
         return curlist
     
-
+    def getAdaptationCache(self, name, function):
+        """Return the cached result of function(self), which only depends on the adaptations. 
+        The cache is valid as long as the adaptation version of the context is the same."""
+        version = self.namespace.context.adaptationversion
+        cache = self.adaptationcache
+        if (cache == None) or (cache[0] != version):
+            cache = (version, {})
+            self.adaptationcache = cache
+        result = cache[1].get(name)
+        if result == None:
+            result = tuple(function(self))
+            # function may change adaptations, like EthernetInterface creating tagged interfaces
+            version = self.namespace.context.adaptationversion
+            if cache[0] != version:
+                cache = (version, {})
+                self.adaptationcache = cache
+            cache[1][name] = result
+        return result
+    
+    def resetAdaptationCache(self):
+        """Invalidate the cached adaptation tuples and stacks of all connection points in the context. 
+        Called by each change of an adaptation."""
+        self.namespace.context.adaptationversion += 1
+    
     def getLogicalInterfaces(self):
         """
         returns a plain list of all logical interfaces associated with the current interface. 
@@ -362,13 +466,10 @@ class ConnectionPoint(NetworkElement):
         the logical channels. Inverse multiplexing channels come after multiplexing channels.
         """
         logicalinterfaces = []
-        for interface in self.getServerStackInterfaces():
-            if interface not in logicalinterfaces:
-                logicalinterfaces.append(interface)
-        if self not in logicalinterfaces:
-            logicalinterfaces.append(self)
-        for interface in self.getClientStackInterfaces():
-            if interface not in logicalinterfaces:
+        seen = set()
+        for (interface, adaptation) in self.getServerStack() + ((self, None),) + self.getClientStack():
+            if interface not in seen:
+                seen.add(interface)
                 logicalinterfaces.append(interface)
         return logicalinterfaces
     
@@ -416,7 +517,8 @@ class ConnectionPoint(NetworkElement):
                 raise pynt.ConsistencyException(("Can not link interface %s to %s: that interface is already linkedTo %s. " \
                         "While this is technically possible (unidirectional traffic), we do not recommend it now.") \
                         % (interface.getName(), self.getName(), interface.linkedInterfaces[0].getName()))
-            self.linkedInterfaces.append(interface)
+            self.getOwnContainer('linkedInterfaces').append(interface)
+            self.recordChange("addLinkedInterface", interface)
     
     def addConnectedInterface(self, interface):
         assert(self.actual)  # only actual (not potential) interfaces can have connections
@@ -426,7 +528,8 @@ class ConnectionPoint(NetworkElement):
             self.logger.warning("Connecting interface %s to %s: non matching layers %s and %s." \
                     % (interface.getName(), self.getName(), interface.getLayer(), self.getLayer()))
         if not interface in self.connectedInterfaces:
-            self.connectedInterfaces.append(interface)
+            self.getOwnContainer('connectedInterfaces').append(interface)
+            self.recordChange("addConnectedInterface", interface)
     
     def getActualSwitchedInterfaces(self, bidirectional=False):
         """Return all actual switched interfaces, including packet and circuit switched interfaces, and those 
@@ -474,6 +577,16 @@ class ConnectionPoint(NetworkElement):
                     "to switch matrix %s.") % (switchmatrix.getName(), self.getName(), self.switchmatrix.getName()))
         self.switchmatrix = switchmatrix
         switchmatrix.addInterface(self)
+        self.recordChange("setSwitchMatrix", switchmatrix)
+    
+    def recordChange(self, change, value=None):
+        # a change of an interface, or a cross connect to an interface, can change the available 
+        # switched interfaces of the other interfaces in the switch matrix
+        if self.switchmatrix:
+            self.switchmatrix.incrementVersion()
+        if isinstance(value, ConnectionPoint) and value.switchmatrix and (value.switchmatrix is not self.switchmatrix):
+            value.switchmatrix.incrementVersion()
+        return NetworkElement.recordChange(self, change, value)
     
     def getSwitchMatrix(self):
         return self.switchmatrix
@@ -505,31 +618,41 @@ class ConnectionPoint(NetworkElement):
             # check if we should make a switch to (it does not exist implicitly).
             # also raises ConsistencyException is 
             if not self.switchmatrix.shouldMakeSwitchTo(self, interface):
-                self.logger.debug("Skip making switchTo from %s to %s: switch already implicitly exists." \
-                        % self, interface)
+                self.logger.debug("Skip making switchTo from %s to %s: switch already implicitly exists.", self, interface)
                 return
-        self.switchedInterfaces.append(interface)
-        interface.switchFromInterfaces.append(self)
+        self.getOwnContainer('switchedInterfaces').append(interface)
+        interface.getOwnContainer('switchFromInterfaces').append(self)
+        if self.switchmatrix:
+            self.switchmatrix.addCrossConnect(self, interface)
         try:
             if bidirectional and self not in interface.switchedInterfaces:
                 interface.addSwitchedInterface(self, bidirectional=bidirectional)
         except pynt.ConsistencyException:
             self.switchedInterfaces.remove(interface)
             interface.switchFromInterfaces.remove(self)
+            if self.switchmatrix:
+                self.switchmatrix.removeCrossConnect(self, interface)
             raise
+        self.recordChange("addSwitchedInterface", interface)
     def addPacketSwitchedInterface(self, interface):
         if self.getLayer() != interface.getLayer():
             raise pynt.ConsistencyException("Can not switch interface %s to %s: non matching layers %s and %s." \
                     % (interface.getName(), self.getName(), interface.getLayer(), self.getLayer()))
         if not interface in self.packetSwtInterfaces:
-            self.packetSwtInterfaces.append(interface)
+            self.getOwnContainer('packetSwtInterfaces').append(interface)
+            if self.switchmatrix:
+                self.switchmatrix.addCrossConnect(self, interface)
+            self.recordChange("addPacketSwitchedInterface", interface)
     
     def addCircuitSwitchedInterface(self, interface):
         if self.getLayer() != interface.getLayer():
             raise pynt.ConsistencyException("Can not switch interface %s to %s: non matching layers %s and %s." \
                     % (interface.getName(), self.getName(), interface.getLayer(), self.getLayer()))
         if not interface in self.circuitSwtInterfaces:
-            self.circuitSwtInterfaces.append(interface)
+            self.getOwnContainer('circuitSwtInterfaces').append(interface)
+            if self.switchmatrix:
+                self.switchmatrix.addCrossConnect(self, interface)
+            self.recordChange("addCircuitSwitchedInterface", interface)
     
     def getCreateAdaptationInterface(self, klass, identifier="", namespace=None, name="", identifierappend="", nameappend=""):
         """Create a new logical interface instance, with the properties inhereted from this interface, 
@@ -613,6 +736,133 @@ class ConnectionPoint(NetworkElement):
         # check if just fetched interface belongs to this device
         return interface
     
+    def getNeighbours(self, kind):
+        """Return a tuple of (interface, via) pairs, for the given kind of neighbours in neighbourfunctions.
+        via is the switch matrix, broadcast segment or adaptation function of the connection, or None.
+        The tuples are kept in an adjacency index, which is valid as long as the sequence number of 
+        the change journal is the same. Every mutator records a change, and a change of one object 
+        can change the neighbours of other interfaces (e.g. labels of interfaces in a switch matrix)."""
+        sequence = self.namespace.context.journal.sequence
+        adjacency = self.adjacency
+        if (adjacency == None) or (adjacency[0] != sequence):
+            adjacency = (sequence, {})
+            self.adjacency = adjacency
+        neighbours = adjacency[1].get(kind)
+        if neighbours == None:
+            neighbours = tuple(neighbourfunctions[kind](self))
+            adjacency[1][kind] = neighbours
+        return neighbours
+
+
+def _allClientTuples(cp):
+    interfaces = []
+    for adaptation in cp.clientadaptations.values():
+        if adaptation.potentialclient:
+            interfaces.append((adaptation.potentialclient, adaptation.function))
+        for client in adaptation.clients:
+            interfaces.append((client, adaptation.function))
+    return interfaces
+
+def _potentialClientTuples(cp):
+    return [(adaptation.potentialclient, adaptation.function) for adaptation in cp.clientadaptations.values() if adaptation.potentialclient]
+
+def _allServerTuples(cp):
+    interfaces = []
+    for adaptation in cp.serveradaptations.values():
+        if adaptation.potentialserver:
+            interfaces.append((adaptation.potentialserver, adaptation.function))
+        for server in adaptation.servers:
+            interfaces.append((server, adaptation.function))
+    return interfaces
+
+def _potentialServerTuples(cp):
+    return [(adaptation.potentialserver, adaptation.function) for adaptation in cp.serveradaptations.values() if adaptation.potentialserver]
+
+def _adaptationStack(cp, tuplesfunction, clientfirst):
+    """Depth first search with duplicate elimination. Interfaces are added before (clientfirst) 
+    or after their own client resp. server interfaces."""
+    stack = []
+    seen = set([cp])
+    def visit(interface):
+        for (other, adaptationfunction) in tuplesfunction(interface):
+            if other in seen:
+                continue
+            seen.add(other)
+            if clientfirst:
+                stack.append((other, adaptationfunction))
+            visit(other)
+            if not clientfirst:
+                stack.append((other, adaptationfunction))
+    visit(cp)
+    return stack
+
+def _clientStack(cp):
+    return _adaptationStack(cp, lambda interface: interface.getAllClientTuples(), True)
+
+def _serverStack(cp):
+    return _adaptationStack(cp, lambda interface: interface.getAllServerTuples(), False)
+
+def _linkedNeighbours(cp):
+    return [(interface, None) for interface in cp.getLinkedInterfacesOnly()]
+
+def _broadcastNeighbours(cp):
+    segment = cp.getBroadcastSegment()
+    if segment:
+        return [(interface, segment) for interface in segment.getOtherInterfaces(cp)]
+    return []
+
+def _connectedNeighbours(cp):
+    return [(interface, None) for interface in cp.getConnectedInterfacesOnly()]
+
+def _actualSwitchedNeighbours(cp):
+    switchmatrix = cp.getSwitchMatrix()
+    if switchmatrix:
+        return [(interface, switchmatrix) for interface in switchmatrix.getActualSwitchedInterfaces(cp, bidirectional=True)]
+    return [(interface, None) for interface in cp.getActualSwitchedInterfaces(bidirectional=True)]
+
+def _potentialSwitchedNeighbours(cp):
+    switchmatrix = cp.getSwitchMatrix()
+    if switchmatrix:
+        return [(interface, switchmatrix) for interface in switchmatrix.getPotentialSwitchedInterfaces(cp, bidirectional=True)]
+    return [(interface, None) for interface in cp.getPotentialSwitchedInterfaces(bidirectional=True)]
+
+def _availableSwitchedNeighbours(cp):
+    switchmatrix = cp.getSwitchMatrix()
+    if switchmatrix:
+        return [(interface, switchmatrix) for interface in switchmatrix.getAvailableSwitchedInterfaces(cp, bidirectional=True)]
+    return [(interface, None) for interface in cp.getAvailableSwitchedInterfaces(bidirectional=True)]
+
+def _actualServerNeighbours(cp):
+    adaptationfunction = cp.getServerAdaptationFunction()
+    if adaptationfunction == None:
+        return []
+    return [(interface, adaptationfunction) for interface in cp.getServerInterfaces()]
+
+def _serverNeighbours(cp):
+    return cp.getAllServerTuples()
+
+def _actualClientNeighbours(cp):
+    adaptationfunction = cp.getClientAdaptationFunction()
+    if adaptationfunction == None:
+        return []
+    return [(interface, adaptationfunction) for interface in cp.getClientInterfaces()]
+
+def _clientNeighbours(cp):
+    return cp.getAllClientTuples()
+
+# kinds of neighbours in the adjacency index, with the function returning the (interface, via) pairs.
+neighbourfunctions = {
+    "linked":               _linkedNeighbours,              # linkedTo
+    "broadcast":            _broadcastNeighbours,           # linkedTo via a broadcast segment
+    "connected":            _connectedNeighbours,           # connectedTo (excluding linkedTo)
+    "actualswitched":       _actualSwitchedNeighbours,      # switchedTo, actual cross connects
+    "potentialswitched":    _potentialSwitchedNeighbours,   # switchedTo, possible cross connects
+    "availableswitched":    _availableSwitchedNeighbours,   # switchedTo, possible cross connects with free labels
+    "actualserver":         _actualServerNeighbours,        # adaptation to actual server layer interfaces
+    "server":               _serverNeighbours,              # adaptation to actual and potential server layer interfaces
+    "actualclient":         _actualClientNeighbours,        # de-adaptation to actual client layer interfaces
+    "client":               _clientNeighbours,              # de-adaptation to actual and potential client layer interfaces
+}
 
 
 # Mix-Ins (kind of decorators) for Connection Points:
@@ -626,16 +876,17 @@ class ConnectionPoint(NetworkElement):
 
 class SingleLabelCPMixIn(object):
     """Mix-in for a connection point with a single label. Either for a static, instantiated or configurable interface."""
-    layer                   = None  # used to find label type (int, float, ...)
-    #hasinternallabel        = None  # None = unknown (use layer and switch matrix to determine), False = no, True = yes
-    hasexternallabel        = None  # None = unknown (use adaptation to determine), False = no, True = yes
-    #labelvalue              = None  # label, used to identify channels in multiplexing.
-    ingresslabel            = None  # label used to signify traffic on an outgoing interface. subproperty of labelvalue.
-    egresslabel             = None  # label used to signify traffic received on an interface. subproperty of labelvalue.
-    # internal label needs to be replaced by ingress/egress label
-    internallabel           = None  # label used to determine switching/swapping possibilities. subproperty of labelvalue.
+    # The mix-ins have no class defaults: these would hide the slots of the classes using them.
+    # self.layer is used to find label type (int, float, ...)
+    __slots__ = ()
     def __init__(self):
-        pass
+        #self.hasinternallabel = None  # None = unknown (use layer and switch matrix to determine), False = no, True = yes
+        self.hasexternallabel   = None  # None = unknown (use adaptation to determine), False = no, True = yes
+        #self.labelvalue        = None  # label, used to identify channels in multiplexing.
+        self.ingresslabel       = None  # label used to signify traffic on an outgoing interface. subproperty of labelvalue.
+        self.egresslabel        = None  # label used to signify traffic received on an interface. subproperty of labelvalue.
+        # internal label needs to be replaced by ingress/egress label
+        self.internallabel      = None  # label used to determine switching/swapping possibilities. subproperty of labelvalue.
     def hasExternalLabel(self):
         # NOTE: same function as MultiLabelCPMixIn.hasExternalLabel(). If you change this function, also change that one.
         if self.hasexternallabel != None:
@@ -650,6 +901,7 @@ class SingleLabelCPMixIn(object):
         return True
     def setHasExternalLabel(self, boolean):
         self.hasexternallabel = bool(boolean)
+        self.recordChange("setHasExternalLabel", self.hasexternallabel)
     def getLabelTypeAndInterval(self):
         """Use the layer to return the tuplet (type, interval)"""
         if self.layer:
@@ -657,11 +909,15 @@ class SingleLabelCPMixIn(object):
             return (labelset.itemtype, labelset.interval)  # may just the defaul labelset if not defined
         else:
             return (int, 1)
+    def newLabelSet(self, labelvalue=None):
+        """Return a new label set with the given label, of the label type of the layer."""
+        if self.layer:
+            return self.layer.newLabelSet(labelvalue)
+        return pynt.rangeset.RangeSet(labelvalue, itemtype=int, interval=1)
     def getNoLabel(self):
         """Set the labelvalues to a value signifying this layer has no labels, but we can still do calculation with it."""
         # TODO: this is a quick hack. We need another way to signify "the empty label"
-        (itemtype, interval) = self.getLabelTypeAndInterval()
-        return pynt.rangeset.RangeSet(None, itemtype=itemtype, interval=interval)
+        return self.newLabelSet(None)
     def isAllowedLabel(self, labelvalue):
         if self.layer:
             return self.layer.isAllowedLabel(labelvalue)
@@ -691,19 +947,24 @@ class SingleLabelCPMixIn(object):
         if not self.isAllowedInternalLabel(labelvalue):
             raise pynt.ConsistencyException(("Can not set internal label of configurable interface %s to %s, " \
                     "as this value is not part of the internal labelset %s") % (self, labelvalue, self.getLabelSet()))
+        if self.switchmatrix:
+            self.switchmatrix.updateLabelIndex(self, self.internallabel, labelvalue)
         self.internallabel     = labelvalue
+        self.recordChange("setInternalLabel", labelvalue)
     def setIngressLabel(self, labelvalue):
         assert(not isinstance(labelvalue, pynt.rangeset.RangeSet)), "setIngressLabel only takes primitive labels. Got %s" % labelvalue
         if not self.isAllowedIngressLabel(labelvalue):
             raise pynt.ConsistencyException(("Can not set ingress label of configurable interface %s to %s, " \
                     "as this value is not part of the ingress labelset %s") % (self, labelvalue, self.getLabelSet()))
         self.ingresslabel     = labelvalue
+        self.recordChange("setIngressLabel", labelvalue)
     def setEgressLabel(self, labelvalue):
         assert(not isinstance(labelvalue, pynt.rangeset.RangeSet)), "setEgressLabel only takes primitive labels. Got %s" % labelvalue
         if not self.isAllowedEgressLabel(labelvalue):
             raise pynt.ConsistencyException(("Can not set egress label of configurable interface %s to %s, " \
                     "as this value is not part of the egress labelset %s") % (self, labelvalue, self.getLabelSet()))
         self.egresslabel     = labelvalue
+        self.recordChange("setEgressLabel", labelvalue)
     def getLabel(self):
         if self.internallabel != None:
             return self.internallabel
@@ -719,23 +980,13 @@ class SingleLabelCPMixIn(object):
     def getEgressLabel(self):
         return self.egresslabel
     def getLabelSet(self):
-        labelvalue = self.getLabel()
-        (itemtype, interval) = self.getLabelTypeAndInterval()
-        if labelvalue == None:
-            return self.getNoLabel()
-        return pynt.rangeset.RangeSet(labelvalue, itemtype=itemtype, interval=interval)
+        return self.newLabelSet(self.getLabel())
     def getInternalLabelSet(self):
-        labelvalue = self.getInternalLabel()
-        (itemtype, interval) = self.getLabelTypeAndInterval()
-        return pynt.rangeset.RangeSet(labelvalue, itemtype=itemtype, interval=interval)
+        return self.newLabelSet(self.getInternalLabel())
     def getIngressLabelSet(self):
-        labelvalue = self.getIngressLabel()
-        (itemtype, interval) = self.getLabelTypeAndInterval()
-        return pynt.rangeset.RangeSet(labelvalue, itemtype=itemtype, interval=interval)
+        return self.newLabelSet(self.getIngressLabel())
     def getEgressLabelSet(self):
-        labelvalue = self.getEgressLabel()
-        (itemtype, interval) = self.getLabelTypeAndInterval()
-        return pynt.rangeset.RangeSet(labelvalue, itemtype=itemtype, interval=interval)
+        return self.newLabelSet(self.getEgressLabel())
     # TODO: the allow* and *labelsetToStr are really ugly helper functions to deal with all sorts of special cases such as 
     # "no label allowed" and "all labels allowed". Ideally, this ought to be handled in the datatype module, if that is finished.
     def allowAnyInternalLabel(self):
@@ -790,16 +1041,18 @@ class SingleLabelCPMixIn(object):
 
 class MultiLabelCPMixIn(object):
     """Mix-in for a connection point with multiple labels. Either a list of interfaces, or a potential interface."""
-    layer                   = None  # used to find label type (int, float, ...)
-    #hasinternallabel        = None  # None = unknown (use layer and switch matrix to determine), False = no, True = yes
-    hasexternallabel        = None  # None = unknown (use adaptation to determine), False = no, True = yes
-    # internallabels is to be replaced by ingress/egress labels
-    internallabels          = None  # None means: no checking. Set to Range(None) to only allow None value.
-    ingresslabels           = None  # None means: no checking. Set to Range(None) to only allow None value.
-    egresslabels            = None  # None means: no checking. Set to Range(None) to only allow None value.
+    # self.layer is used to find label type (int, float, ...)
+    __slots__ = ()
     def __init__(self):
         pynt.logger.InitLogger()
-        self.logger = logging.getLogger("pynt.elements")
+        self.logger = logger
+        #self.hasinternallabel = None  # None = unknown (use layer and switch matrix to determine), False = no, True = yes
+        self.hasexternallabel   = None  # None = unknown (use adaptation to determine), False = no, True = yes
+        # internallabels is to be replaced by ingress/egress labels
+        # The label sets are often the same; the setters then share one copy (see setLabelSet)
+        self.internallabels     = None  # None means: no checking. Set to Range(None) to only allow None value.
+        self.ingresslabels      = None  # None means: no checking. Set to Range(None) to only allow None value.
+        self.egresslabels       = None  # None means: no checking. Set to Range(None) to only allow None value.
         
         # we do not set the labelvalues to an empty RangeSet, simply because we do not 
         # know the type (float, int, ...), since the layer may not be set during instantiation.
@@ -822,6 +1075,7 @@ class MultiLabelCPMixIn(object):
         return True
     def setHasExternalLabel(self, boolean):
         self.hasexternallabel = bool(boolean)
+        self.recordChange("setHasExternalLabel", self.hasexternallabel)
     def getLabelTypeAndInterval(self):
         """Use the layer to return the tuplet (type, interval)"""
         # TODO: Use layer
@@ -829,6 +1083,8 @@ class MultiLabelCPMixIn(object):
     def getNoLabel(self):
         """Set the labelvalues to a value signifying this layer has no labels, but we can still do calculation with it."""
         # TODO: this is a quick hack. We need another way to signify "the empty label"
+        if (self.layer != None) and self.layer.hasBitmapLabels():
+            return self.layer.newLabelSet()
         (itemtype, interval) = self.getLabelTypeAndInterval()
         return pynt.rangeset.RangeSet(None, itemtype=itemtype, interval=interval)
     # TODO: the allow* and *labelsetToStr are really ugly helper functions to deal with all sorts of special cases such as 
@@ -984,8 +1240,19 @@ class MultiLabelCPMixIn(object):
             return labelprop.range.rangeset.issuperset(iflabelset)
     def setLabelSet(self, labelvalues):
         self.setInternalLabelSet(labelvalues)
-        self.setIngressLabelSet(labelvalues)
-        self.setEgressLabelSet(labelvalues)
+        # share the copy of the internal label set, instead of making three copies
+        self.setIngressLabelSet(self.internallabels)
+        self.setEgressLabelSet(self.internallabels)
+    def copyLabelSet(self, labelvalues):
+        """Return the interned copy of the label set, which is shared by all interfaces and layer properties
+        with the same labels, or labelvalues itself if it is already one of the label sets of this interface.
+        Integer label sets are converted to a bitmap if the layer uses bitmaps for its labels."""
+        if (labelvalues is self.internallabels) or (labelvalues is self.ingresslabels) or (labelvalues is self.egresslabels):
+            return labelvalues
+        if (self.layer != None) and self.layer.hasBitmapLabels() and (labelvalues.itemtype in [int, long, None]) \
+                and not isinstance(labelvalues, pynt.rangeset.BitmapRangeSet):
+            labelvalues = self.layer.newLabelSet(labelvalues)
+        return pynt.rangeset.Intern(labelvalues)
     def formatLayerPropertyName(self, labelprop):
         if labelprop == None:
             return "None (nothing allowed)"
@@ -999,7 +1266,8 @@ class MultiLabelCPMixIn(object):
         if labelvalues == None:
             self.internallabels = None
         else:
-            self.internallabels = labelvalues.copy()
+            self.internallabels = self.copyLabelSet(labelvalues)
+        self.recordChange("setInternalLabelSet", self.internallabels)
         if hasattr(self,"internallabel") and not self.isAllowedInternalLabel(self.internallabel):
             # TODO: This should be a check beforehand with ConsistencyException
             self.logger.error("Internal label %s of interface %s is not allowed after setting the labelset to %s" % (self.internallabel, self.getURIdentifier(), self.internallabels))
@@ -1012,7 +1280,8 @@ class MultiLabelCPMixIn(object):
         if labelvalues == None:
             self.ingresslabels = None
         else:
-            self.ingresslabels = labelvalues.copy()
+            self.ingresslabels = self.copyLabelSet(labelvalues)
+        self.recordChange("setIngressLabelSet", self.ingresslabels)
         if hasattr(self,"ingresslabel") and not self.isAllowedInternalLabel(self.ingresslabel):
             # TODO: This should be a check beforehand with ConsistencyException
             self.logger.error("Ingress label %s of interface %s is not allowed after setting the labelset to %s" % (self.ingresslabel, self.getURIdentifier(), self.ingresslabels))
@@ -1024,7 +1293,8 @@ class MultiLabelCPMixIn(object):
         if labelvalues == None:
             self.egresslabels = None
         else:
-            self.egresslabels = labelvalues.copy()
+            self.egresslabels = self.copyLabelSet(labelvalues)
+        self.recordChange("setEgressLabelSet", self.egresslabels)
         if hasattr(self,"egresslabel") and not self.isAllowedInternalLabel(self.egresslabel):
             # TODO: This should be a check beforehand with ConsistencyException
             self.logger.error("Egress label %s of interface %s is not allowed after setting the labelset to %s" % (self.egresslabel, self.getURIdentifier(), self.egresslabels))
@@ -1050,9 +1320,19 @@ class MultiLabelCPMixIn(object):
         return self.getNoLabel()
     def setMultiLabelValuesFromCP(self, cp):
         """Copy the values from the given Connection Point to self"""
-        self.setInternalLabelSet(getattr(cp, "internallabels", None))
-        self.setIngressLabelSet (getattr(cp, "ingresslabels", None))
-        self.setEgressLabelSet  (getattr(cp, "egresslabels", None))
+        internallabels = getattr(cp, "internallabels", None)
+        ingresslabels  = getattr(cp, "ingresslabels", None)
+        egresslabels   = getattr(cp, "egresslabels", None)
+        self.setInternalLabelSet(internallabels)
+        # label sets which are shared by cp, are also shared by self
+        if (ingresslabels is internallabels) and (ingresslabels != None):
+            ingresslabels = self.internallabels
+        self.setIngressLabelSet(ingresslabels)
+        if (egresslabels is internallabels) and (egresslabels != None):
+            egresslabels = self.internallabels
+        elif (egresslabels is getattr(cp, "ingresslabels", None)) and (egresslabels != None):
+            egresslabels = self.ingresslabels
+        self.setEgressLabelSet(egresslabels)
     def LabelsToStr(self):
         if isinstance(self, SingleLabelCPMixIn):
             return SingleLabelCPMixIn.LabelsToStr(self)
@@ -1092,17 +1372,22 @@ class SinglePropertyCPMixIn(object):
     """A list of values of properties. Specified in the context of a acutal Connection Point.
     The types are now fixed, but should be dynamic, based upon the properties of a specfic layer 
     (see the properties attribute in the Layer object for details)"""
-    layer                   = None
-    # NOTE: capacity will be moved to properties/potentialproperties
-    ingressBandwidth        = None  # float (in Mbyte/s) or None (unknown)
-    egressBandwidth         = None  # float (in Mbyte/s) or None (unknown)
-    availableCapacity       = None
+    __slots__ = ()
     # TODO: make this generic; in particular, use the layer properties.
     def __init__(self):
-        pass
-    def setIngressBandwidth(self,ingressBandwidth): self.ingressBandwidth = float(ingressBandwidth)
-    def setEgressBandwidth(self, egressBandwidth):  self.egressBandwidth  = float(egressBandwidth)
-    def setAvailableCapacity(self, available):      self.availableCapacity = float(available)
+        # NOTE: capacity will be moved to properties/potentialproperties
+        self.ingressBandwidth   = None  # float (in Mbyte/s) or None (unknown)
+        self.egressBandwidth    = None  # float (in Mbyte/s) or None (unknown)
+        self.availableCapacity  = None
+    def setIngressBandwidth(self,ingressBandwidth):
+        self.ingressBandwidth = float(ingressBandwidth)
+        self.recordChange("setIngressBandwidth", self.ingressBandwidth)
+    def setEgressBandwidth(self, egressBandwidth):
+        self.egressBandwidth  = float(egressBandwidth)
+        self.recordChange("setEgressBandwidth", self.egressBandwidth)
+    def setAvailableCapacity(self, available):
+        self.availableCapacity = float(available)
+        self.recordChange("setAvailableCapacity", self.availableCapacity)
     def getIngressBandwidth(self):                  return self.ingressBandwidth
     def getEgressBandwidth(self):                   return self.egressBandwidth
     def getAvailableCapacity(self):                 return self.availableCapacity
@@ -1115,10 +1400,9 @@ class MultiPropertyCPMixIn(object):
     The types are now fixed, but should be dynamic, based upon the properties of a specfic layer 
     (see the properties attribute in the Layer object for details)"""
     # TODO: implement as described.
-    layer                   = None
-    allowedcapacities       = None
+    __slots__ = ()
     def __init__(self):
-        pass
+        self.allowedcapacities  = None
     def setMultiPropertyValuesFromCP(self, cp):
         """Copy the values from the given connection point to self"""
         if cp.configurable:
@@ -1141,6 +1425,8 @@ def InterfaceIdentifier(prefix, blade, port):
 
 class Interface(SingleLabelCPMixIn, SinglePropertyCPMixIn, ConnectionPoint):
     """An interface: a fixed connection point"""
+    __slots__ = ('hasexternallabel', 'ingresslabel', 'egresslabel', 'internallabel', 
+            'ingressBandwidth', 'egressBandwidth', 'availableCapacity')
     actual              = True  # signifies that the CP has actual values associated with it.
     removable           = False # signifies that the CP may be marked as configued, and can be removed.
     configurable        = False # signifies that the CP has multiple values, one of them that can be picked.
@@ -1201,6 +1487,7 @@ def GetCreateInterface(identifier, namespace, klass=Interface, initfunction=None
 
 class StaticInterface(Interface):
     """Fixed, not configurable interface."""
+    __slots__ = ()
     actual              = True  # signifies that the CP has actual values associated with it.
     removable           = False  # signifies that the CP may be marked as configued, and can be removed.
     configurable        = False # False, as the list is stored in the Potential Interface. Not in here.
@@ -1211,6 +1498,7 @@ class StaticInterface(Interface):
 
 # WARNING: the order is important here. SingleLabelCPMixIn must come after MultiLabelCPMixIn
 class ConfigurableInterface(MultiLabelCPMixIn, MultiPropertyCPMixIn, Interface):
+    __slots__ = ('internallabels', 'ingresslabels', 'egresslabels', 'allowedcapacities')
     actual              = True  # signifies that the CP has actual values associated with it.
     removable           = False # signifies that the CP may be marked as configued, and can be removed.
     configurable        = True  # signifies that the CP has multiple values, one of them that can be picked.
@@ -1227,6 +1515,7 @@ class ConfigurableInterface(MultiLabelCPMixIn, MultiPropertyCPMixIn, Interface):
 class PotentialMuxInterface(MultiLabelCPMixIn, MultiPropertyCPMixIn, ConnectionPoint):
     """A potential interface. A potential interface. This is semantically equivalent with 
     An interface with one of the given labelvalues can be configured by a device."""
+    __slots__ = ('hasexternallabel', 'internallabels', 'ingresslabels', 'egresslabels', 'allowedcapacities')
     actual              = False # signifies that the CP has actual values associated with it.
     removable           = False # signifies that the CP may be marked as configued, and can be removed.
     configurable        = True  # signifies that the CP has multiple values, one of them that can be picked.
@@ -1243,6 +1532,7 @@ class InstantiatedMuxInterface(Interface):
     label, but no possible labels (those are listed in the potential Interface).
     Semantically, a MultiplexInterface can be removed, unlike other kinds of Interfaces.
     There should always be an associated Potential Interface with it."""
+    __slots__ = ()
     actual              = True  # signifies that the CP has actual values associated with it.
     removable           = True  # signifies that the CP may be marked as configued, and can be removed.
     configurable        = False # False, as the list is stored in the Potential Interface. Not in here.
@@ -1291,12 +1581,15 @@ class Device(NetworkElement):
     getCreateNativeInterface.    
     """
     blades               = None  # list (set in __init__)
-    interfaces           = None  # list (set in __init__)
+    interfaces           = None  # list, sorted by rdfObjectKey (set in __init__)
+    interfacekeys        = None  # list of the rdfObjectKey of each interface, in the same order (set in __init__)
+    interfaceset         = None  # set of interfaces, for membership tests (set in __init__)
+    interfacesequence    = None  # sequence number of the change journal when interfacekeys was last checked
     logicalinterfaces    = None  # list (set in __init__)
+    logicalinterfaceset  = None  # set of logical interfaces, for membership tests (set in __init__)
     switchmatrices       = None  # list (set in __init__)
     nativeInterfaceClass = Interface
     domain               = None
-    location             = None
     
     def __init__(self, identifier, namespace):
         # WARNING: A RDFObject should always be created using a [Get]CreateRDFObject() function
@@ -1304,35 +1597,47 @@ class Device(NetworkElement):
         NetworkElement.__init__(self, identifier=identifier, namespace=namespace)
         self.blades             = []
         self.interfaces         = []
+        self.interfacekeys      = []
+        self.interfaceset       = set()
         self.logicalinterfaces  = []
+        self.logicalinterfaceset = set()
         self.switchmatrices     = []
         self.namespace.networkschema = True
     
     def setDomain(self, domain):
         self.domain = domain
         domain.addDevice(self)
+        self.recordChange("setDomain", domain)
     def getDomain(self):
         return self.domain
     def unsetDomain(self):
         self.domain.removeDevice(self)
         self.domain = None
+        self.recordChange("setDomain", None)
 
     def setLocation(self, location):
         self.location = location
+        self.recordChange("setLocation", location)
     def getLocation(self):
         return self.location
     def unsetLocation(self):
         self.location = None
+        self.recordChange("setLocation", None)
 
     def resetLogicalInterfaceCache(self):
         self.logicalinterfaces = []
+        self.logicalinterfaceset = set()
     
     def addLogicalInterface(self, interface):
         self.logicalinterfaces.append(interface)
+        self.logicalinterfaceset.add(interface)
+        self.recordChange("addLogicalInterface", interface)
     
     def removeLogicalInterface(self, interface):
-        if interface in self.logicalinterfaces:
+        if interface in self.logicalinterfaceset:
             self.logicalinterfaces.remove(interface)
+            self.logicalinterfaceset.discard(interface)
+            self.recordChange("removeLogicalInterface", interface)
     
     def getLogicalInterfaces(self, ordered=False):
         if ordered:
@@ -1342,21 +1647,44 @@ class Device(NetworkElement):
     def determineLogicalInterfaces(self):
         # returns an sorted list of logical interfaces, by crawling through the physical interfaces
         logicalinterfaces = []
+        seen = set()
         for interface in self.getNativeInterfaces():
             for logicalinterface in interface.getLogicalInterfaces():
-                if logicalinterface not in logicalinterfaces:
+                if logicalinterface not in seen:
+                    seen.add(logicalinterface)
                     logicalinterfaces.append(logicalinterface)
-        self.logicalinterfaces.sort(key=pynt.xmlns.rdfObjectKey)
-        for interface in self.logicalinterfaces:
-            if interface not in logicalinterfaces:
+        for interface in sorted(self.logicalinterfaces, key=pynt.xmlns.rdfObjectKey):
+            if interface not in seen:
+                seen.add(interface)
                 logicalinterfaces.append(interface)
         self.logicalinterfaces = logicalinterfaces
+        self.logicalinterfaceset = seen
         return self.logicalinterfaces
     
     def getNativeInterfaces(self):
-        self.interfaces.sort(key=pynt.xmlns.rdfObjectKey)
+        """Return the native interfaces, sorted by rdfObjectKey. Don't modify the list.
+        The list is kept sorted on insertion. Only if the change journal moved on, the keys are 
+        compared, and the list is sorted again if an interface got an other identifier or namespace."""
+        sequence = self.namespace.context.journal.sequence
+        if sequence != self.interfacesequence:
+            keys = [pynt.xmlns.rdfObjectKey(interface) for interface in self.interfaces]
+            if keys != self.interfacekeys:
+                self.interfaces.sort(key=pynt.xmlns.rdfObjectKey)
+                self.interfacekeys = [pynt.xmlns.rdfObjectKey(interface) for interface in self.interfaces]
+            self.interfacesequence = sequence
         return self.interfaces
     
+    def _addNativeInterface(self, interface):
+        """Insert interface in the sorted list of native interfaces. Returns False if it was already present."""
+        if interface in self.interfaceset:
+            return False
+        key = pynt.xmlns.rdfObjectKey(interface)
+        pos = bisect.bisect_right(self.interfacekeys, key)
+        self.interfacekeys.insert(pos, key)
+        self.interfaces.insert(pos, interface)
+        self.interfaceset.add(interface)
+        return True
+    
     def getBlades(self):
         return self.blades
     
@@ -1380,10 +1708,11 @@ class Device(NetworkElement):
         Define all values that must be defined in a valid object"""
         interface.setDevice(self)
         # interface.removable = False
-        if interface not in self.interfaces:
-            self.interfaces.append(interface)
-        if interface not in self.logicalinterfaces:
+        if self._addNativeInterface(interface):
+            self.recordChange("addNativeInterface", interface)
+        if interface not in self.logicalinterfaceset:
             self.logicalinterfaces.append(interface)
+            self.logicalinterfaceset.add(interface)
     
     def getCreateBlade(self, bladeno, namespace=None):
         """
@@ -1415,6 +1744,7 @@ class Device(NetworkElement):
                     % (switchmatrix.getName(), self.getName(), switchmatrix.getDevice().getName()))
         if switchmatrix not in self.switchmatrices:
             self.switchmatrices.append(switchmatrix)
+            self.recordChange("addSwitchMatrix", switchmatrix)
         if switchmatrix.getDevice() != self:
             switchmatrix.setDevice(self)
 
@@ -1797,25 +2127,52 @@ class SwitchMatrix(NetworkElement):
     # TODO: integrate self.canmerge and allowmerge
     lookuptable             = None
     interfaces              = None  # a list
+    interfaceindex          = None  # dict interface -> position in interfaces
+    crossconnects           = None  # dict source interface -> list of sink interfaces (explicit cross connects only)
+    reversecrossconnects    = None  # dict sink interface -> list of source interfaces (explicit cross connects only)
+    labelindex              = None  # dict internal label -> list of interfaces with that label, in order of interfaces. Only SingleLabelCPMixIn interfaces.
+    version                 = 0     # int, incremented on each change of the switch matrix or its interfaces
+    availablecache          = None  # tuple (version, dict), cache of getAvailableSwitchedInterfaces()
+    pendingcrossconnects    = None  # set of (source, sink) cross connects, already checked by a Transaction
     def __init__(self, identifier, namespace):
         NetworkElement.__init__(self, identifier, namespace)
         self.interfaces = []
+        self.interfaceindex = {}
+        self.crossconnects = {}
+        self.reversecrossconnects = {}
+        self.labelindex = {}
+        self.version = 0
+        self.availablecache = None
         self.namespace.networkschema = True
     
+    def recordChange(self, change, value=None):
+        self.incrementVersion()
+        return NetworkElement.recordChange(self, change, value)
+    def incrementVersion(self):
+        """Invalidate the cached available switched interfaces. Called for every change of the 
+        switch matrix, and for every change of its interfaces, like cross connects and labels."""
+        self.version += 1
+    
     def setLayer(self, layer):
         assert(isinstance(layer, pynt.layers.Layer))
         self.layer = layer
+        self.recordChange("setLayer", layer)
     def setDevice(self, device):
         if self.device not in [device, None]:
             raise pynt.ConsistencyException("SwitchMatrix %s is part of Device %s. Can not add it to Device %s" \
                     % (self.getName(), self.device.getName(), device.getName()))
         assert(isinstance(device, Device))
         self.device = device
+        self.recordChange("setDevice", device)
         if self not in device.getSwitchMatrices():
             device.addSwitchMatrix(self)
     
-    def setSwitchingCapability(self, switchingcapability):  self.hasswitchingcapability = bool(switchingcapability)
-    def setSwappingCapability(self, swappingcapability):    self.hasswappingcapability  = bool(swappingcapability)
+    def setSwitchingCapability(self, switchingcapability):
+        self.hasswitchingcapability = bool(switchingcapability)
+        self.recordChange("setSwitchingCapability", self.hasswitchingcapability)
+    def setSwappingCapability(self, swappingcapability):
+        self.hasswappingcapability  = bool(swappingcapability)
+        self.recordChange("setSwappingCapability", self.hasswappingcapability)
     def setUnicast(self, unicast=True):
         self.hasunicast = bool(unicast)
         if self.hasunicast and self.hasbroadcast:
@@ -1824,17 +2181,20 @@ class SwitchMatrix(NetworkElement):
         if not self.hasunicast and self.hasmulticast:
             self.logger.warning("Setting multicast of SwitchMatrix %s to False, as unicast is set to False" % self.getName())
             self.hasmulticast = False
+        self.recordChange("setUnicast", self.hasunicast)
     def setMulticast(self, multicast=True):
         self.hasmulticast = bool(multicast)
         if self.hasmulticast and not self.hasunicast:
             self.logger.warning("Setting broadcast of SwitchMatrix %s to False, as unicast is set to True" % self.getName())
             self.hasunicast = True
+        self.recordChange("setMulticast", self.hasmulticast)
     def setBroadcast(self, broadcast=True):
         self.hasbroadcast = bool(broadcast)
         if self.hasbroadcast and (self.hasunicast or self.hasmulticast):
             self.logger.warning("Setting unicast of SwitchMatrix %s to False, as broadcast is set to True" % self.getName())
             self.hasunicast = False
             self.hasmulticast = False
+        self.recordChange("setBroadcast", self.hasbroadcast)
     def getLayer(self):                                     return self.layer
     def getDevice(self):                                    return self.device
     def getSwitchingCapability(self):                       return self.hasswitchingcapability
@@ -1846,7 +2206,7 @@ class SwitchMatrix(NetworkElement):
     def canBroadcast(self):
         return self.hasbroadcast
     def addInterface(self, interface):
-        if interface in self.interfaces:
+        if interface in self.interfaceindex:
             return
         assert(isinstance(interface, ConnectionPoint))
         if interface.getLayer() != self.getLayer():
@@ -1871,15 +2231,68 @@ class SwitchMatrix(NetworkElement):
                 raise pynt.ConsistencyException("Can not add interface %s in Device %s to switch matrix %s " \
                         "in Device %s." % (interface.getName(), interface.getDevice().getName(), self.getName(), 
                         self.getDevice().getName()))
+        self.interfaceindex[interface] = len(self.interfaces)
         self.interfaces.append(interface)
+        if isinstance(interface, SingleLabelCPMixIn):
+            self.labelindex.setdefault(interface.getInternalLabel(), []).append(interface)
+        # cross connects made before the interface was part of this switch matrix
+        for sink in interface.getDirectlySwitchedInterfaces():
+            self.addCrossConnect(interface, sink)
         interface.setSwitchMatrix(self)
+        self.recordChange("addInterface", interface)
     def getInterfaces(self):
         return self.interfaces
     def getOtherInterfaces(self, interface):
         interfaces = self.interfaces[:]
-        if interface in interfaces:
-            interfaces.remove(interface)
+        if interface in self.interfaceindex:
+            del interfaces[self.interfaceindex[interface]]
         return interfaces
+    
+    # The cross connect table and label index are maintained by the interfaces: 
+    # addSwitchedInterface() and setInternalLabel() of ConnectionPoint call the functions below.
+    def addCrossConnect(self, source, sink):
+        sinks = self.crossconnects.setdefault(source, [])
+        if sink not in sinks:
+            sinks.append(sink)
+            self.reversecrossconnects.setdefault(sink, []).append(source)
+    def removeCrossConnect(self, source, sink):
+        sinks = self.crossconnects.get(source, [])
+        if sink in sinks:
+            sinks.remove(sink)
+            self.reversecrossconnects[sink].remove(source)
+    def hasCrossConnect(self, source, sink):
+        """Return True if an explicit cross connect from source to sink exists."""
+        if source not in self.interfaceindex:
+            return sink in source.getDirectlySwitchedInterfaces()
+        return sink in self.crossconnects.get(source, ())
+    def getCrossConnectSinks(self, interface):
+        """Return the sinks of the explicit cross connects from interface."""
+        return self.crossconnects.get(interface, [])[:]
+    def getCrossConnectSources(self, interface):
+        """Return the sources of the explicit cross connects to interface."""
+        return self.reversecrossconnects.get(interface, [])[:]
+    def updateLabelIndex(self, interface, oldlabel, newlabel):
+        if (interface not in self.interfaceindex) or (oldlabel == newlabel) or not isinstance(interface, SingleLabelCPMixIn):
+            return
+        interfaces = self.labelindex.get(oldlabel)
+        if interfaces and (interface in interfaces):
+            interfaces.remove(interface)
+            if not interfaces:
+                del self.labelindex[oldlabel]
+        interfaces = self.labelindex.setdefault(newlabel, [])
+        # insert in the order of getInterfaces(); bisect.insort() has no key function
+        position = self.interfaceindex[interface]
+        low, high = 0, len(interfaces)
+        while low < high:
+            middle = (low + high) // 2
+            if self.interfaceindex[interfaces[middle]] < position:
+                low = middle + 1
+            else:
+                high = middle
+        interfaces.insert(low, interface)
+    def getInterfacesWithLabel(self, label):
+        """Return the interfaces with the given internal label, in the order of getInterfaces()."""
+        return self.labelindex.get(label, [])[:]
     def isCompatibleLabel(self, label_or_set1, label_or_set2):
         # a "label matches" if and only if:
         # - if switchingcapability and swappingcapability: true
@@ -1908,13 +2321,17 @@ class SwitchMatrix(NetworkElement):
         #print "%s: isCompatibleLabel(%s, %s) = %s" % (self.getName(), label_or_set1, label_or_set2, result)
         return result
     def getLabelsInUse(self, exceptinterface=None):
-        labels = None
-        for interface in self.getOtherInterfaces(exceptinterface):
-            if labels == None:
-                labels = interface.getLabelSet()
-            else:
-                labels += interface.getLabels()
-            
+        """Return a RangeSet with the internal labels of the interfaces, except those of exceptinterface.
+        Only interfaces with a single label (SingleLabelCPMixIn) are taken into account."""
+        if self.layer:
+            labels = self.layer.newLabelSet()
+        else:
+            labels = pynt.rangeset.RangeSet(None)
+        for (label, interfaces) in self.labelindex.iteritems():
+            if (label != None) and (interfaces != [exceptinterface]):
+                labels.add(label)
+        return labels
+    
     def possibleLabelsAfterSwitch(self, curlabel_or_labelset):
         """Given a set of labels, return which (internal) labels can be used after switching
         Thus the same labels for switching, and all labels for swapping."""
@@ -1930,24 +2347,30 @@ class SwitchMatrix(NetworkElement):
         elif self.hasswitchingcapability:
             if isinstance(curlabel_or_labelset, pynt.rangeset.RangeSet):
                 return curlabel_or_labelset
+            elif self.layer:
+                return self.layer.newLabelSet(curlabel_or_labelset)
             else: # curlabel_or_labelset is a label, not a set.
-                return pynt.rangeset.RangeSet(curlabel_or_labelset)   #TODO: set itemtype from layer?
-        else: # neither switching nor swapping.
+                return pynt.rangeset.RangeSet(curlabel_or_labelset)
+        elif self.layer: # neither switching nor swapping.
+            return self.layer.newLabelSet()  # nothing available
+        else:
             return pynt.rangeset.RangeSet(None)  # nothing available
     
     
     def getActualSwitchedInterfaces(self, interface, bidirectional=False):
         """Given an interface, get a list of interface where the data is configured to switchedto.
         Get data from both self, as well as interface."""
-        def isBidirectional(peerinterface):
-            """Helper function. filter for reverse cross connects if bidirectional is set"""
-            return (peerinterface != interface) and (interface in peerinterface.getDirectlySwitchedInterfaces())
-        
         if not interface.actual:
             return []
         if self.canBroadcast():
             # return interfaces with matching label (based on the current label only)
             interfaces = []
+            if self.hasswitchingcapability and not self.hasswappingcapability:
+                # only interfaces with the same label are compatible: use the label index
+                for peerinterface in self.labelindex.get(interface.getInternalLabel(), ()):
+                    if peerinterface.actual and (peerinterface != interface):
+                        interfaces.append(peerinterface)
+                return interfaces
             for peerinterface in self.getOtherInterfaces(interface):
                 if not peerinterface.actual:
                     continue
@@ -1958,7 +2381,7 @@ class SwitchMatrix(NetworkElement):
             # return all explicitly set switchedTo interfaces.
             peerinterfaces = interface.getDirectlySwitchedInterfaces()
             if bidirectional:       # filter for reverse cross connects if bidirectional is set
-                peerinterfaces = filter(lambda peerinterface: isBidirectional(peerinterface), peerinterfaces)
+                peerinterfaces = [peerinterface for peerinterface in peerinterfaces if (peerinterface != interface) and self.hasCrossConnect(peerinterface, interface)]
             return peerinterfaces
     def getPotentialSwitchedInterfaces(self, interface, bidirectional=False, honourlabel=False):
         """Given an interface, find potential switchTo from the interface to other interfaces, and return the list 
@@ -1985,7 +2408,21 @@ class SwitchMatrix(NetworkElement):
         return interfaces
     def getAvailableSwitchedInterfaces(self, interface, bidirectional=False, breakself=False, allowmerge=False, honourlabel=False):
         """Given an interface, find available switchTo from the interface to other interfaces, and return the list 
-        of remote interfaces. The list is filtered for interfaces which are currently in use."""
+        of remote interfaces. The list is filtered for interfaces which are currently in use.
+        The result is cached until the version of the switch matrix changes."""
+        availablecache = self.availablecache
+        if (availablecache == None) or (availablecache[0] != self.version):
+            availablecache = (self.version, {})
+            self.availablecache = availablecache
+        key = (interface, bool(bidirectional), bool(breakself), bool(allowmerge), bool(honourlabel))
+        interfaces = availablecache[1].get(key)
+        if interfaces == None:
+            interfaces = self.determineAvailableSwitchedInterfaces(interface, bidirectional=bidirectional, 
+                    breakself=breakself, allowmerge=allowmerge, honourlabel=honourlabel)
+            availablecache[1][key] = interfaces
+        return interfaces[:]  # return a copy, so the cache can not be modified
+    def determineAvailableSwitchedInterfaces(self, interface, bidirectional=False, breakself=False, allowmerge=False, honourlabel=False):
+        """Uncached version of getAvailableSwitchedInterfaces()"""
         # Define two helper functions:
         def connectToOthers(peer):
             """Helper function. Return True if peer has cross connect to other interfaces beside interface"""
@@ -2084,6 +2521,31 @@ class SwitchMatrix(NetworkElement):
             # The conversion to a set removes all duplicates. Arguably, we should return a set anyway, not a list.
             return list(set(actualpeers + peers))
     
+    def isAvailableSwitchedInterface(self, interface, tointerface):
+        """Return True if tointerface is in getAvailableSwitchedInterfaces(interface), without the other 
+        modifiers. For unicast and multicast switch matrices, only interface and tointerface are checked."""
+        if self.canBroadcast():
+            return tointerface in self.getAvailableSwitchedInterfaces(interface)
+        actualpeers = interface.getDirectlySwitchedInterfaces()
+        if tointerface in actualpeers:
+            return True
+        if (not self.hasmulticast) and (len(actualpeers) > 0):
+            return False
+        if tointerface not in self.interfaceindex:
+            return False
+        # same as getPotentialSwitchedInterfaces() and the filter of getAvailableSwitchedInterfaces()
+        labels = []
+        for peer in (interface, tointerface):
+            if peer.configurable:
+                labels.append(peer.getInternalLabelSet())
+            else:
+                labels.append(peer.getInternalLabel())
+        if not self.isCompatibleLabel(labels[0], labels[1]):
+            return False
+        if (not self.canmerge) and [peer for peer in tointerface.getSwitchSourceInterfaces() if peer != interface]:
+            return False
+        return True
+    
     # Function to check compatible labels between two interfaces; returns labels before, after, and if the cross connecpossible
     
     def canSwitchTo(self, interface, tointerface, bidirectional=False, breakself=False, honourlabel=False):
@@ -2103,6 +2565,8 @@ class SwitchMatrix(NetworkElement):
         returns False if it already (implictly or explicitly) exists, and should not be created"""
         # Note: generic checks like equal layer, and check if interfaces are "actual" are already made 
         # in Interface.addSwitchedInterface(). These are are only switch-matrix specific checks.
+        if (self.pendingcrossconnects != None) and ((interface, tointerface) in self.pendingcrossconnects):
+            return True  # checked by Transaction.validate(), together with the other cross connects of the transaction
         if interface not in self.interfaces:
             raise pynt.ConsistencyException("Can not switch interface %s to %s, %s is not part of " \
                     "switch matrix %s." % (interface.getName(), tointerface.getName(), interface.getName(), self.getName()))
@@ -2137,22 +2601,26 @@ class BroadcastSegment(NetworkElement):
     A Link object is a special case of a BroadcastSegement with exactly two linked interfaces."""
     def __init__(self, identifier, namespace):
         NetworkElement.__init__(self, identifier, namespace=namespace)
-        self.interfaces = []
+        self.interfaces = OrderedSet()
         self.layer = None
         self.namespace.networkschema = True
         self.mask = None
     
     def getLayer(self):             return self.layer
-    def setLayer(self, layer):      self.layer = layer
+    def setLayer(self, layer):
+        self.layer = layer
+        self.recordChange("setLayer", layer)
     def getMask(self):              return self.mask
-    def setMask(self, mask):        self.mask = mask
+    def setMask(self, mask):
+        self.mask = mask
+        self.recordChange("setMask", mask)
     def removeConnectedInterface(self, interface):
-        if interface in self.interfaces:
-            self.interfaces.remove(interface)
+        if self.interfaces.discard(interface):
+            self.recordChange("removeConnectedInterface", interface)
         interface.linkedSegment = None
     def addConnectedInterface(self, interface):
-        if interface not in self.interfaces:
-            self.interfaces.append(interface)
+        if self.interfaces.add(interface):
+            self.recordChange("addConnectedInterface", interface)
         # If the interface already is in a broadcast segment,
         # it is removed from that segment.
         if interface.linkedSegment not in [None, self]:
@@ -2163,13 +2631,12 @@ class BroadcastSegment(NetworkElement):
             interface.linkedSegment = self
     
     def getConnectedInterfaces(self):
-        return self.interfaces
+        return self.interfaces.getView()
     def getOtherInterfaces(self, ignoreinterface):
-        interfaces = []
-        for interface in self.interfaces:
-            if interface != ignoreinterface:
-                interfaces.append(interface)
-        return interfaces
+        interfaces = self.interfaces.getView()
+        if ignoreinterface not in self.interfaces:
+            return interfaces[:]
+        return [interface for interface in interfaces if interface is not ignoreinterface]
 
 def GetCreateBroadcastSegment(identifier, namespace=None, klass=BroadcastSegment):
     """create a new property with given parameters, or return existing one if it already exists."""
@@ -2203,45 +2670,234 @@ class AdminDomain(NetworkElement):
     """This class is a container for devices in a network domain. Also see the
        NDL domain schema."""
 
-    interfaces = None
-    devices = None
+    interfaces = None   # OrderedSet (set in __init__)
+    devices = None      # OrderedSet (set in __init__)
     
     def __init__(self, identifier, namespace):
         NetworkElement.__init__(self, identifier, namespace=namespace)
-        self.interfaces = []
-        self.devices = []
+        self.interfaces = OrderedSet()
+        self.devices = OrderedSet()
     
     def addDevice(self, device):
-        if device not in self.devices:
-            self.devices.append(device)
+        if self.devices.add(device):
+            self.recordChange("addDevice", device)
             self.logger.debug("Added device %s to domain %s" % (device.getName(), self.getName()))
         else:
             self.logger.warning("Device %s is already in domain %s" % (device.getName(), self.getName()))
     def removeDevice(self, device):
-        if device in self.devices:
-            self.devices.remove(device)
+        if self.devices.discard(device):
+            self.recordChange("removeDevice", device)
             self.logger.debug("Removed device %s from domain %s" % (device.getName(), self.getName()))
         else:
             self.logger.warning("Device %s not found in domain %s when removing device" % (device.getName(), self.getName()))
 
     def getDevices(self):
-        return self.devices
+        return self.devices.getView()
 
     def addInterface(self, interface):
-        logger = logging.getLogger("pynt.elements")
-        if interface not in self.interfaces:
-            self.interfaces.append(interface)
+        if self.interfaces.add(interface):
+            self.recordChange("addInterface", interface)
             self.logger.debug("Added interface %s to domain %s" % (interface.getName(), self.getName()))
         else:
             self.logger.warning("interface %s is already in domain %s" % (interface.getName(), self.getName()))
 
     def removeInterface(self, interface):
-        if interface in self.interfaces:
-            self.interfaces.remove(interface)
+        if self.interfaces.discard(interface):
+            self.recordChange("removeInterface", interface)
             self.logger.debug("Removed interface %s from domain %s" % (interface.getName(), self.getName()))
         else:
             self.logger.warning("Interface %s not found in domain %s when removing interface" % (interface.getName(), self.getName()))
 
     def getInterfaces(self):
-        return self.interfaces
-
+        return self.interfaces.getView()
+
+
+
+# attributes which are caches, and are not restored by a Transaction
+transientattributes = ['logger', 'adjacency', 'adaptationcache', 'version', 'availablecache', 'pendingcrossconnects']
+
+def _copyContainer(value):
+    """Return a copy of a list, dict, set, OrderedSet or RangeSet (including nested containers). 
+    Other values, the shared empty containers and immutable (e.g. interned) sets are returned as is."""
+    if (value is pynt.xmlns.emptylist) or (value is pynt.xmlns.emptydict):
+        return value
+    elif isinstance(value, (frozenset, pynt.rangeset.InternedRangeSetMixIn)):
+        return value
+    elif isinstance(value, list):
+        return [_copyContainer(item) for item in value]
+    elif isinstance(value, dict):
+        return dict([(key, _copyContainer(item)) for (key, item) in value.iteritems()])
+    elif isinstance(value, (set, OrderedSet, pynt.rangeset.RangeSet)):
+        return value.copy()
+    return value
+
+def _getState(subject):
+    if isinstance(subject, pynt.xmlns.RDFObject):
+        state = subject.__getstate__()
+    else:
+        state = dict(subject.__dict__)
+    for name in transientattributes:
+        state.pop(name, None)
+    return state
+
+def _saveState(subject):
+    """Return a copy of the attributes of subject, which can be restored by _restoreState()."""
+    state = _getState(subject)
+    for (name, value) in state.items():
+        state[name] = _copyContainer(value)
+    return state
+
+def _restoreState(subject, state):
+    for name in _getState(subject):
+        if name not in state:
+            delattr(subject, name)
+    for (name, value) in state.iteritems():
+        setattr(subject, name, value)
+
+
+class Transaction(object):
+    """A batch of changes of network elements, which are applied together. A change is the name 
+    of a mutator and its arguments, e.g. transaction.add(interface, "setLabel", 12). 
+    commit() checks the cross connects of the transaction together, and applies all changes in 
+    order, while holding the writelock of the context; it waits for a fetch in another thread to 
+    finish. If a change raises an exception, the state of all involved objects is restored, and 
+    the exception is raised again. Objects created by a change (e.g. by getCreateNativeInterface) 
+    remain registered."""
+    context         = None  # TopologyContext of the changed objects
+    edits           = None  # list of (subject, change, args, kwargs) tuples
+    
+    def __init__(self, context=None):
+        self.context = pynt.xmlns.GetActiveContext(context)
+        self.edits = []
+    
+    def __str__(self):
+        return '<%s with %d changes>' % (type(self).__name__, len(self.edits))
+    def __repr__(self):
+        return '<%s with %d changes>' % (type(self).__name__, len(self.edits))
+    
+    def add(self, subject, change, *args, **kwargs):
+        """Add a call of the mutator change of subject, with the given arguments."""
+        if not callable(getattr(subject, change, None)):
+            raise AttributeError("%s has no method %s" % (subject, change))
+        self.edits.append((subject, change, args, kwargs))
+    def addSwitchedInterface(self, interface, peerinterface, bidirectional=False):
+        self.add(interface, "addSwitchedInterface", peerinterface, bidirectional=bidirectional)
+    def addClientInterface(self, interface, clientinterface, adaptationfunction):
+        self.add(interface, "addClientInterface", clientinterface, adaptationfunction)
+    def setLabel(self, interface, labelvalue):
+        self.add(interface, "setLabel", labelvalue)
+    def getEdits(self):
+        return self.edits[:]
+    
+    def getInvolvedObjects(self):
+        """Return the objects which may be changed by the edits: the subjects and arguments, and 
+        for connection points their device, switch matrix, broadcast segment and adaptations."""
+        involved = OrderedSet()
+        for (subject, change, args, kwargs) in self.edits:
+            for rdfobject in [subject] + list(args) + kwargs.values():
+                if not isinstance(rdfobject, NetworkElement):
+                    continue
+                involved.add(rdfobject)
+                if isinstance(rdfobject, ConnectionPoint):
+                    for related in [rdfobject.device, rdfobject.switchmatrix, rdfobject.linkedSegment]:
+                        if related != None:
+                            involved.add(related)
+                    for adaptation in rdfobject.clientadaptations.values() + rdfobject.serveradaptations.values():
+                        involved.add(adaptation)
+                elif isinstance(rdfobject, Device):
+                    for switchmatrix in rdfobject.getSwitchMatrices():
+                        involved.add(switchmatrix)
+        return involved.getView()
+    
+    def validate(self):
+        """Check the cross connects in the transaction, without applying them. Raises a 
+        ConsistencyException for the first cross connect that can not be made. 
+        Cross connects in a unicast or multicast switch matrix are checked against the state before 
+        the transaction with SwitchMatrix.isAvailableSwitchedInterface(), and against the other cross 
+        connects in the transaction. The mutators then skip the check of the switch matrix. Switch 
+        matrices with other changes, like labels, and broadcast switch matrices are checked by the 
+        mutators themselves.
+        Returns a dict switch matrix -> set of checked (source, sink) cross connects."""
+        crossconnects = []  # list of (switch matrix, source, sink)
+        otherchanges = set()   # switch matrices with other changes than cross connects
+        for (subject, change, args, kwargs) in self.edits:
+            if change == "addSwitchedInterface":
+                peerinterface = args[0]
+                switchmatrix = subject.getSwitchMatrix()
+                if (switchmatrix == None) or (peerinterface.getSwitchMatrix() is not switchmatrix):
+                    continue
+                crossconnects.append((switchmatrix, subject, peerinterface))
+                if (len(args) > 1 and args[1]) or kwargs.get("bidirectional"):
+                    crossconnects.append((switchmatrix, peerinterface, subject))
+                continue
+            for rdfobject in [subject] + list(args) + kwargs.values():
+                if isinstance(rdfobject, SwitchMatrix):
+                    otherchanges.add(rdfobject)
+                elif isinstance(rdfobject, ConnectionPoint) and (rdfobject.getSwitchMatrix() != None):
+                    otherchanges.add(rdfobject.getSwitchMatrix())
+        pending = {}    # dict switch matrix -> set of (source, sink)
+        sources = {}    # dict switch matrix -> set of sources of cross connects in this transaction
+        sinks = {}      # dict switch matrix -> set of sinks of cross connects in this transaction
+        for (switchmatrix, interface, tointerface) in crossconnects:
+            if (switchmatrix in otherchanges) or switchmatrix.canBroadcast():
+                continue
+            crosses = pending.setdefault(switchmatrix, set())
+            if ((interface, tointerface) in crosses) or switchmatrix.hasCrossConnect(interface, tointerface):
+                continue
+            if interface.getLayer() != switchmatrix.getLayer():
+                raise pynt.ConsistencyException("Can not switch interface %s to %s: layer %s does not match layer %s" \
+                        "of switch matrix %s" % (interface.getName(), tointerface.getName(), interface.getLayer(), \
+                        switchmatrix.getLayer(), switchmatrix.getName()))
+            if not switchmatrix.isAvailableSwitchedInterface(interface, tointerface):
+                peerinterfaces = switchmatrix.getAvailableSwitchedInterfaces(interface, bidirectional=False)
+                raise pynt.ConsistencyException("Can not switch interface %s to %s. Current capability and configuration " \
+                        "of switch matrix %s only allow cross connects to %s" % (interface.getName(), tointerface.getName(), \
+                        switchmatrix.getName(), ",".join([intf.getName() for intf in peerinterfaces])))
+            if (not switchmatrix.canMulticast()) and (interface in sources.get(switchmatrix, ())):
+                raise pynt.ConsistencyException("Can not switch interface %s to %s: the transaction already switches %s " \
+                        "to another interface, and switch matrix %s can not multicast." % (interface.getName(), \
+                        tointerface.getName(), interface.getName(), switchmatrix.getName()))
+            if (not switchmatrix.canmerge) and (tointerface in sinks.get(switchmatrix, ())):
+                raise pynt.ConsistencyException("Can not switch interface %s to %s: the transaction already switches " \
+                        "another interface to %s." % (interface.getName(), tointerface.getName(), tointerface.getName()))
+            crosses.add((interface, tointerface))
+            sources.setdefault(switchmatrix, set()).add(interface)
+            sinks.setdefault(switchmatrix, set()).add(tointerface)
+        return pending
+    
+    def commit(self):
+        """Check and apply all changes, or none. The changes are removed from the transaction 
+        if they are all applied, and are kept if one failed. Waits for the writelock of the 
+        context, so the changes are not mixed with those of a fetch or another transaction."""
+        self.context.writelock.acquire()
+        try:
+            pending = self.validate()
+            saved = [(subject, _saveState(subject)) for subject in self.getInvolvedObjects()]
+            for (switchmatrix, crosses) in pending.iteritems():
+                switchmatrix.pendingcrossconnects = crosses
+            try:
+                try:
+                    for (subject, change, args, kwargs) in self.edits:
+                        getattr(subject, change)(*args, **kwargs)
+                except:
+                    exc_info = sys.exc_info()
+                    self.rollback(saved)
+                    raise exc_info[0], exc_info[1], exc_info[2]
+            finally:
+                for switchmatrix in pending:
+                    switchmatrix.pendingcrossconnects = None
+            logger.debug("Committed %d changes of %d objects" % (len(self.edits), len(saved)))
+            self.edits = []
+        finally:
+            self.context.writelock.release()
+    
+    def rollback(self, saved):
+        """Restore the saved states, and record the restore in the change journal, so that 
+        caches and snapshots of the restored objects are updated."""
+        for (subject, state) in saved:
+            _restoreState(subject, state)
+        self.context.adaptationversion += 1
+        for (subject, state) in saved:
+            if isinstance(subject, pynt.xmlns.RDFObject):
+                subject.recordChange("rollback")
+        logger.debug("Rolled back %d changes of %d objects" % (len(self.edits), len(saved)))
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""The pynt.graph module compiles the connections between the network elements of a topology
+context into an immutable graph, so that path finding algorithms can follow arrays of integers,
+instead of calling methods of the network elements for each edge.
+
+CompiledGraph:
+    the nodes of a context, with an integer node id for each connection point, switch matrix,
+    device and broadcast segment, in order of objectid. For each kind of connection, the
+    adjacency is stored in compressed sparse row (CSR) form: the neighbours of node n are
+    targets[offsets[n]:offsets[n+1]], and the switch matrix, broadcast segment or adaptation
+    function of each connection is at the same position in vias. Side arrays, indexed by node
+    id, hold the layer, metric, capacity and available capacity, and a handle of the internal
+    label set.
+
+The kinds are those of pynt.elements.neighbourfunctions (linkTo, connectedTo, switchTo,
+adaptation and de-adaptation), which only connect connection points, and two kinds for the
+graph of pynt.algorithm.dijkstra:
+    "membership":       from an interface to its switch matrix and device, from a switch matrix
+                        to its interfaces and from a device to its native interfaces.
+    "mutualconnected":  connectedTo (excluding linkedTo) in both directions, from interfaces
+                        and broadcast segments.
+
+A value of None is stored as -inf in the side arrays, and NaN if the node has no such attribute,
+as in pynt.capacity. A compiled graph is never changed; GetCompiledGraph() compiles a new graph
+if the context has changed since the last one, and no writer holds the writelock (see
+pynt.xmlns.TopologyContext). Algorithms use a graph after setCompiledGraph(); they still read
+other properties, like labels and adaptation stacks, from the network elements.
+"""
+
+# built-in modules
+import logging
+import array
+# local modules
+import pynt.xmlns
+import pynt.elements
+
+
+# classes of network elements which are nodes of the graph
+nodeclasses = [pynt.elements.ConnectionPoint, pynt.elements.SwitchMatrix, pynt.elements.Device, pynt.elements.BroadcastSegment]
+
+# side array name -> name of the getter of the connection point
+getters = {
+    "metrics":              "getMetric",
+    "capacities":           "getCapacity",
+    "availablecapacities":  "getAvailableCapacity",
+}
+
+nan = float("nan")
+inf = float("inf")
+
+
+def _membershipNeighbours(element):
+    if isinstance(element, pynt.elements.ConnectionPoint):
+        return [(other, None) for other in (element.getSwitchMatrix(), element.getDevice()) if other != None]
+    elif isinstance(element, pynt.elements.SwitchMatrix):
+        return [(interface, None) for interface in element.getInterfaces()]
+    elif isinstance(element, pynt.elements.Device):
+        return [(interface, None) for interface in element.getNativeInterfaces()]
+    return []
+
+def _isConnectedTo(element, other):
+    if isinstance(element, pynt.elements.BroadcastSegment):
+        return other in element.interfaces
+    return other in element.getConnectedInterfaces()
+
+def _mutualConnectedNeighbours(element):
+    if isinstance(element, pynt.elements.ConnectionPoint):
+        others = element.getConnectedInterfacesOnly()
+    elif isinstance(element, pynt.elements.BroadcastSegment):
+        others = element.getConnectedInterfaces()
+    else:
+        return []
+    return [(other, None) for other in others if _isConnectedTo(other, element)]
+
+def _getNeighbourFunction(kind):
+    """Return a function which returns the neighbours of the given kind of a connection point."""
+    def neighbours(node):
+        if isinstance(node, pynt.elements.ConnectionPoint):
+            return node.getNeighbours(kind)
+        return ()
+    return neighbours
+
+elementfunctions = {
+    "membership":           _membershipNeighbours,
+    "mutualconnected":      _mutualConnectedNeighbours,
+}
+
+def GetKinds():
+    """Return the names of all kinds of connections in a graph."""
+    return pynt.elements.neighbourfunctions.keys() + elementfunctions.keys()
+
+
+class CompiledGraph(object):
+    """Immutable graph of the network elements of a context, at a given sequence number of its
+    change journal. Don't modify the lists and arrays."""
+    context         = None  # TopologyContext of this graph
+    sequence        = 0     # int, sequence number of the last change in the journal that is included
+    nodes           = None  # tuple of network elements, indexed by node id
+    nodeids         = None  # dict network element -> node id
+    offsets         = None  # dict kind -> array of ints, indexed by node id, with one extra item at the end
+    targets         = None  # dict kind -> array of ints, the node ids of the neighbours
+    vias            = None  # dict kind -> list of the switch matrix, broadcast segment, adaptation function or None
+    layers          = None  # array of ints, indexed by node id: handle of the layer in layertable, or -1
+    layertable      = None  # list of layers, indexed by handle
+    labelsets       = None  # array of ints, indexed by node id: handle of the internal label set in labelsettable, or -1
+    labelsettable   = None  # list of label sets, indexed by handle. Equal label sets have the same handle.
+    metrics         = None  # array of floats, indexed by node id
+    capacities      = None  # array of floats, indexed by node id
+    availablecapacities = None  # array of floats, indexed by node id
+
+    def __init__(self, context, sequence, nodes):
+        self.context = context
+        self.sequence = sequence
+        self.nodes = tuple(nodes)
+        self.nodeids = dict([(node, nodeid) for (nodeid, node) in enumerate(self.nodes)])
+        self.offsets = {}
+        self.targets = {}
+        self.vias = {}
+
+    def __str__(self):
+        return '<%s %s at %d>' % (type(self).__name__, self.context.getName(), self.sequence)
+    def __repr__(self):
+        return '<%s %s at %d>' % (type(self).__name__, self.context.getName(), self.sequence)
+
+    def getContext(self):                           return self.context
+    def getSequence(self):                          return self.sequence
+    def getNodeCount(self):                         return len(self.nodes)
+    def getNode(self, nodeid):                      return self.nodes[nodeid]
+    def getKinds(self):                             return self.offsets.keys()
+
+    def getNodeId(self, element):
+        """Return the node id of the given network element, or None if it is not part of the graph."""
+        return self.nodeids.get(element)
+
+    def getNeighbourIds(self, nodeid, kind):
+        """Return an array with the node ids of the neighbours of the given kind."""
+        offsets = self.getOffsets(kind)
+        return self.targets[kind][offsets[nodeid]:offsets[nodeid+1]]
+
+    def getNeighbours(self, element, kind):
+        """Return a tuple of (network element, via) pairs, like ConnectionPoint.getNeighbours().
+        Returns an empty tuple if element is not part of the graph."""
+        nodeid = self.nodeids.get(element)
+        if nodeid == None:
+            return ()
+        offsets = self.getOffsets(kind)
+        nodes = self.nodes
+        targets = self.targets[kind]
+        vias = self.vias[kind]
+        return tuple([(nodes[targets[i]], vias[i]) for i in xrange(offsets[nodeid], offsets[nodeid+1])])
+
+    def getOffsets(self, kind):
+        try:
+            return self.offsets[kind]
+        except KeyError:
+            raise KeyError("%s has no connections of kind %s; it was compiled with %s" % (self, kind, ", ".join(self.offsets.keys())))
+
+    def getLayer(self, nodeid):
+        handle = self.layers[nodeid]
+        if handle < 0:
+            return None
+        return self.layertable[handle]
+    def getLabelSet(self, nodeid):
+        handle = self.labelsets[nodeid]
+        if handle < 0:
+            return None
+        return self.labelsettable[handle]
+
+    def addAdjacency(self, kind, function):
+        """Store the neighbours of all nodes, as returned by function(node), as the given kind.
+        Only used while compiling. Neighbours which are not part of the graph are skipped."""
+        offsets = array.array('l', [0])
+        targets = array.array('l')
+        vias = []
+        nodeids = self.nodeids
+        for node in self.nodes:
+            for (neighbour, via) in function(node):
+                nodeid = nodeids.get(neighbour)
+                if nodeid != None:
+                    targets.append(nodeid)
+                    vias.append(via)
+            offsets.append(len(targets))
+        self.offsets[kind] = offsets
+        self.targets[kind] = targets
+        self.vias[kind] = vias
+
+    def addSideArrays(self):
+        """Store the layer, label set handle, metric and capacities of all nodes. Only used while compiling."""
+        self.layers = array.array('l')
+        self.layertable = []
+        self.labelsets = array.array('l')
+        self.labelsettable = []
+        layerhandles = {}       # dict layer -> handle
+        labelsethandles = {}    # dict string representation of a label set -> handle
+        for name in getters:
+            setattr(self, name, array.array('d'))
+        for node in self.nodes:
+            layer = getattr(node, "getLayer", lambda: None)()
+            if layer == None:
+                self.layers.append(-1)
+            else:
+                if layer not in layerhandles:
+                    layerhandles[layer] = len(self.layertable)
+                    self.layertable.append(layer)
+                self.layers.append(layerhandles[layer])
+            if isinstance(node, pynt.elements.ConnectionPoint):
+                labelset = node.getInternalLabelSet()
+            else:
+                labelset = None
+            if labelset == None:
+                self.labelsets.append(-1)
+            else:
+                key = str(labelset)
+                if key not in labelsethandles:
+                    labelsethandles[key] = len(self.labelsettable)
+                    self.labelsettable.append(labelset)
+                self.labelsets.append(labelsethandles[key])
+            for (name, getter) in getters.iteritems():
+                if isinstance(node, pynt.elements.ConnectionPoint) and hasattr(node, getter):
+                    value = getattr(node, getter)()
+                    if value == None:
+                        value = -inf
+                else:
+                    value = nan
+                getattr(self, name).append(value)
+
+
+def CompileGraph(context=None, kinds=None):
+    """Return a new CompiledGraph of the given (or else the active) context, with the given
+    kinds of connections, or all kinds. Holds the writelock of the context while compiling, 
+    so it waits for a fetch in another thread to finish."""
+    context = pynt.xmlns.GetActiveContext(context)
+    logger = logging.getLogger("pynt.graph")
+    if kinds == None:
+        kinds = GetKinds()
+    context.writelock.acquire()
+    try:
+        graph = None
+        # Asking for neighbours can create network elements, like the client interfaces of tagged 
+        # VLANs in pynt.technologies.ethernet. If so, compile again, so they are part of the graph.
+        while (graph == None) or (graph.sequence != context.getJournal().getSequence()):
+            sequence = context.getJournal().getSequence()
+            nodes = []
+            for klass in nodeclasses:
+                nodes.extend(pynt.xmlns.GetAllRDFObjects(klass=klass, context=context))
+            nodes.sort(key=lambda node: node.getObjectId())
+            graph = CompiledGraph(context, sequence, nodes)
+            for kind in kinds:
+                if kind in elementfunctions:
+                    graph.addAdjacency(kind, elementfunctions[kind])
+                else:
+                    graph.addAdjacency(kind, _getNeighbourFunction(kind))
+            graph.addSideArrays()
+        logger.debug("Compiled graph of %s at %d with %d nodes" % (context, graph.sequence, len(graph.nodes)))
+        return graph
+    finally:
+        context.writelock.release()
+
+def GetCompiledGraph(context=None):
+    """Return the latest compiled graph of the given (or else the active) context, with all kinds
+    of connections. A new graph is only compiled if the context has changed since the last one, 
+    and no other thread holds the writelock."""
+    context = pynt.xmlns.GetActiveContext(context)
+    graph = context.compiledgraph
+    if (graph == None) or (graph.sequence != context.getJournal().getSequence()):
+        if graph == None:
+            context.writelock.acquire()
+        elif not context.writelock.acquire(False):
+            logging.getLogger("pynt.graph").debug("Writelock of %s is busy; returning the graph at %d" % (context, graph.sequence))
+            return graph
+        try:
+            graph = CompileGraph(context)   # takes the writelock again, which is reentrant
+            context.compiledgraph = graph
+        finally:
+            context.writelock.release()
+    return graph
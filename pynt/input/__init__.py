@@ -110,7 +110,13 @@ class BaseFetcher(object):
             self.open()
             
             logger.debug("Parsing information using %s input" % (type(self).__name__))
-            self.retrieve()
+            # hold the writelock, so snapshots for readers never contain a partial fetch.
+            context = pynt.xmlns.GetActiveContext()
+            context.writelock.acquire()
+            try:
+                self.retrieve()
+            finally:
+                context.writelock.release()
             
             # We only record the fetching *after* storing all info in RDFobjects.
             # So AlreadyFetched() only returns True if all information is stored.
@@ -18,7 +18,7 @@ class OspfNetworkSegmentException(Exception):
 class OspfFetcher(pynt.input.BaseDeviceFetcher):
     def __init__(self, *args, **params):
         pynt.input.BaseDeviceFetcher.__init__(self, *args, **params)
-        self.subjectClass = pynt.elements.Domain
+        self.subjectClass = pynt.elements.AdminDomain
         self.iplayer      = pynt.technologies.ip.GetLayer("ip")
         self.connections  = {}
         self.ns           = self.namespace
@@ -31,10 +31,27 @@ class OspfFetcher(pynt.input.BaseDeviceFetcher):
     def setSourceFile(self, filename, hostname=None):
         self.io = pynt.protocols.ospfinput.OspfEmulatorInput(filename=filename)
     
+    # Identifiers of the network elements, shared by createRouterObjects() and the handle functions.
+    def getRouterIdentifier(self, router):
+        return "dev" + router
+    def getSwitchMatrixIdentifier(self, router):
+        return "dev" + router + "Switch"
+    def getPointToPointIdentifier(self, router, neighbour):
+        # To avoid nameclashes: we name our interface "p"+thisRouterID+"p"+otherRouterID
+        # This provides a unique reproducable ID
+        return "p" + router + "p" + neighbour
+    def getStubInterfaceIdentifier(self, router, network):
+        # To avoid nameclashes: we name our interface: "stub"+thisRouter+"net"+network
+        return "stub" + router + "net" + network
+    def getStubSegmentIdentifier(self, network):
+        return "stub" + network
+    def getTransitSegmentIdentifier(self, network):
+        return "bc" + network
+    
     def retrieve(self):
-        # if len(pynt.xmlns.rdfobjects) > 0:
+        # if len(pynt.xmlns.GetActiveContext().rdfobjects) > 0:
         #     raise RuntimeWarning("pynt.xmlns.rdfobjects is non-empty. Overwriting old information.")
-        # if len(pynt.xmlns.xmlnamespaces) > 0:
+        # if len(pynt.xmlns.GetActiveContext().xmlnamespaces) > 0:
         #     raise RuntimeWarning("pynt.xmlns.xmlnamespaces is non-empty. Overwriting old information.")
         ReadTechnologies()
         self.parseLSAs( self.io.getLSAs() )
@@ -46,6 +63,7 @@ class OspfFetcher(pynt.input.BaseDeviceFetcher):
             for lsa in lsas:
                 if lsa.type == 10: self.handleAreaOpaqueLSA(lsa)
         else:
+            self.createRouterObjects(lsas)
             for lsa in lsas:
                 if   lsa.type == 1:
                     self.handleRouterLSA(lsa)
@@ -63,9 +81,47 @@ class OspfFetcher(pynt.input.BaseDeviceFetcher):
         self.createConnections(self.connections)
         
     
+    def createRouterObjects(self, lsas):
+        """Create all devices, switch matrices, interfaces and broadcast segments of the router
+        and network LSAs in one batch. The handle functions below then find existing objects."""
+        routerclass = pynt.technologies.ip.RouterDevice
+        segmentclass = pynt.technologies.ip.IPBroadcastSegment
+        interfaceclass = pynt.technologies.ip.IPInterface
+        specifications = []
+        interfaces = []     # list of (device identifier, interface identifier)
+        for lsa in lsas:
+            if lsa.type == 1:
+                router = lsa.getAdvertisingRouter()
+                device = self.getRouterIdentifier(router)
+                specifications.append((device, self.ns, routerclass, None))
+                specifications.append((self.getSwitchMatrixIdentifier(router), self.ns, pynt.elements.SwitchMatrix, None))
+                for link in lsa.links:
+                    if link.getType() == 1:
+                        neighbour = self.getRouterIdentifier(link.getLinkId())
+                        specifications.append((neighbour, self.ns, routerclass, None))
+                        interfaces.append((device, self.getPointToPointIdentifier(router, link.getLinkId())))
+                        interfaces.append((neighbour, self.getPointToPointIdentifier(link.getLinkId(), router)))
+                    elif link.getType() == 2:
+                        interfaces.append((device, link.getLinkData()))
+                        specifications.append((self.getTransitSegmentIdentifier(link.getLinkId()), self.ns, segmentclass, None))
+                    elif (link.getType() == 3) and not self._ignoreStubs:
+                        interfaces.append((device, self.getStubInterfaceIdentifier(router, link.getLinkId())))
+                        specifications.append((self.getStubSegmentIdentifier(link.getLinkId()), self.ns, segmentclass, None))
+            elif lsa.type == 2:
+                specifications.append((self.getTransitSegmentIdentifier(lsa.getLinkStateId()), self.ns, segmentclass, None))
+                for routerId in lsa.getAttachedRouters():
+                    specifications.append((self.getRouterIdentifier(routerId), self.ns, routerclass, None))
+        created = pynt.xmlns.GetCreateRDFObjects(specifications)
+        objects = dict([(specification[0], rdfobject) for (specification, rdfobject) in zip(specifications, created)])
+        # interfaces are created after their device, as they need to be added to it.
+        specifications = [(identifier, self.ns, interfaceclass, None) for (devidentifier, identifier) in interfaces]
+        created = pynt.xmlns.GetCreateRDFObjects(specifications)
+        for ((devidentifier, identifier), interface) in zip(interfaces, created):
+            objects[devidentifier].setNewNativeInterfaceProperties(interface)
+    
     def handleRouterLSA(self, lsa):
-        dev = pynt.elements.GetCreateDevice("dev"+lsa.getAdvertisingRouter(), self.ns, klass=pynt.technologies.ip.RouterDevice)
-        devSwitch = pynt.elements.GetCreateSwitchMatrix("dev"+lsa.getAdvertisingRouter()+"Switch", self.ns)
+        dev = pynt.elements.GetCreateDevice(self.getRouterIdentifier(lsa.getAdvertisingRouter()), self.ns, klass=pynt.technologies.ip.RouterDevice)
+        devSwitch = pynt.elements.GetCreateSwitchMatrix(self.getSwitchMatrixIdentifier(lsa.getAdvertisingRouter()), self.ns)
         devSwitch.setLayer(self.iplayer)
         devSwitch.setDevice(dev)
         devSwitch.setSwitchingCapability(True)
@@ -74,17 +130,15 @@ class OspfFetcher(pynt.input.BaseDeviceFetcher):
                 # Point-to-Point connection
                 # Annoying kind of connection, because the only information we have is the
                 # address of the *connected* interface.
-                # To avoid nameclashes: we name our interface "p"+thisRouterID+"p"+otherRouterID
-                # This provides a unique reproducable ID
-                intf = dev.getCreateNativeInterface("p"+lsa.getAdvertisingRouter()+"p"+link.getLinkId(), self.ns)
+                intf = dev.getCreateNativeInterface(self.getPointToPointIdentifier(lsa.getAdvertisingRouter(), link.getLinkId()), self.ns)
                 intf.setLayer(self.iplayer)
                 intf.setIPAddress(link.getLinkData())
                 # intf.setOSPFP2PInterface()
                 devSwitch.addInterface(intf)
                 # We would like to do the following, but to do that requires a rewrite of addConnectedInterface.
                 # intf.addConnectedInterface("p"+link.getLinkId()+"p"+lsa.getAdvertisingRouter())
-                connectedDev = pynt.elements.GetCreateDevice("dev"+link.getLinkId(), self.ns, klass=pynt.technologies.ip.RouterDevice)
-                connectedInterface = connectedDev.getCreateNativeInterface("p"+link.getLinkId()+"p"+lsa.getAdvertisingRouter(), self.ns)
+                connectedDev = pynt.elements.GetCreateDevice(self.getRouterIdentifier(link.getLinkId()), self.ns, klass=pynt.technologies.ip.RouterDevice)
+                connectedInterface = connectedDev.getCreateNativeInterface(self.getPointToPointIdentifier(link.getLinkId(), lsa.getAdvertisingRouter()), self.ns)
                 connectedInterface.setLayer(self.iplayer)
                 intf.addConnectedInterface(connectedInterface)
                 intf.setMetric(link.getMetric())
@@ -94,18 +148,17 @@ class OspfFetcher(pynt.input.BaseDeviceFetcher):
                 intf.setLayer(self.iplayer)
                 intf.setTEAddress(link.getLinkData())
                 devSwitch.addInterface(intf)
-                bc = pynt.elements.GetCreateBroadcastSegment("bc"+link.getLinkId(), self.ns, klass=pynt.technologies.ip.IPBroadcastSegment)
+                bc = pynt.elements.GetCreateBroadcastSegment(self.getTransitSegmentIdentifier(link.getLinkId()), self.ns, klass=pynt.technologies.ip.IPBroadcastSegment)
                 bc.setLayer(self.iplayer)
                 intf.addConnectedInterface(bc)
                 intf.setMetric(link.getMetric())
             elif link.getType() == 3:
                 # Stub Network
-                # To avoid nameclashes: we name our interface: "stub"+thisRouter+"net"+network
                 if not self._ignoreStubs:
-                    intf = dev.getCreateNativeInterface("stub"+lsa.getAdvertisingRouter()+"net"+link.getLinkId())
+                    intf = dev.getCreateNativeInterface(self.getStubInterfaceIdentifier(lsa.getAdvertisingRouter(), link.getLinkId()))
                     intf.setLayer(self.iplayer)
                     devSwitch.addInterface(intf)
-                    bc = pynt.elements.GetCreateBroadcastSegment("stub"+link.getLinkId(), self.ns, klass=pynt.technologies.ip.IPBroadcastSegment)
+                    bc = pynt.elements.GetCreateBroadcastSegment(self.getStubSegmentIdentifier(link.getLinkId()), self.ns, klass=pynt.technologies.ip.IPBroadcastSegment)
                     bc.setMask(link.getLinkData())
                     bc.setLayer(self.iplayer)
                     intf.addConnectedInterface(bc)
@@ -121,12 +174,12 @@ class OspfFetcher(pynt.input.BaseDeviceFetcher):
         
     def handleNetworkLSAs(self, lsas):
         for lsa in lsas:
-            bc = pynt.elements.GetCreateBroadcastSegment("bc"+lsa.getLinkStateId(), self.ns, klass=pynt.technologies.ip.IPBroadcastSegment)
+            bc = pynt.elements.GetCreateBroadcastSegment(self.getTransitSegmentIdentifier(lsa.getLinkStateId()), self.ns, klass=pynt.technologies.ip.IPBroadcastSegment)
             bc.setMask(lsa.getNetworkMask())
             # Now that we have the broadcast segment, we want to get the other routers connected to it.
             # That way we can independently confirm the connection to this broadcast segment.
             for routerId in lsa.getAttachedRouters():
-                router = pynt.elements.GetCreateDevice("dev"+routerId, self.ns, klass=pynt.technologies.ip.RouterDevice)
+                router = pynt.elements.GetCreateDevice(self.getRouterIdentifier(routerId), self.ns, klass=pynt.technologies.ip.RouterDevice)
                 routerIntfs = router.getNativeInterfaces()
                 connectedIntfs = [x for x in routerIntfs if bc in x.getConnectedInterfacesOnly()]
                 if len(connectedIntfs) == 1:
@@ -140,7 +193,7 @@ class OspfFetcher(pynt.input.BaseDeviceFetcher):
         pass
     
     def handleAreaOpaqueLSA(self, lsa):
-        router = pynt.elements.GetCreateDevice("dev"+lsa.getAdvertisingRouter(), self.ns)
+        router = pynt.elements.GetCreateDevice(self.getRouterIdentifier(lsa.getAdvertisingRouter()), self.ns)
         if lsa.tlvtype == 1:
             intf = pynt.elements.GetCreateInterface(lsa.routerAddress, self.ns, klass=pynt.technologies.ip.IPInterface)
             intf.setDevice(router)
@@ -164,7 +217,7 @@ class OspfFetcher(pynt.input.BaseDeviceFetcher):
             # multi-access link
             if lsa.subtlvs["Link type"] == 2:
                 intfaddr = lsa.subtlvs["Local interface"][0]
-                bcname = "bc" + lsa.subtlvs["Link ID"]
+                bcname = self.getTransitSegmentIdentifier(lsa.subtlvs["Link ID"])
             # layering information
             if lsa.subtlvs.has_key("ISCD"):
                 encoding = lsa.subtlvs["ISCD"].encoding
@@ -173,7 +226,7 @@ class OspfFetcher(pynt.input.BaseDeviceFetcher):
                 if encoding:            intfname = intfaddr + getLayerNameEncoding(encoding)
                 else:                   intfname = intfaddr
             else:
-                intfname = "p%sp%s" % (lsa.getAdvertisingRouter(), lsa.subtlvs["Link ID"])
+                intfname = self.getPointToPointIdentifier(lsa.getAdvertisingRouter(), lsa.subtlvs["Link ID"])
             intf = pynt.elements.Interface(intfname, self.ns)
             intf.setDevice(router)
             # Add some extra properties and connections.
@@ -447,6 +447,17 @@ class RDFFetcher(pynt.input.BaseRecursiveFetcher):
         logger.debug("retrieving %s %s" % (objectClass.__name__, objecturi))
         return objectClass(identifier, namespace)
     
+    def retrieveObjects(self, objecturis, objectClass):
+        """Return the objects for a list of URIs, creating them in one batch if they don't exist yet."""
+        assert(issubclass(objectClass, pynt.xmlns.RDFObject))
+        logger = logging.getLogger("pynt.input")
+        logger.debug("retrieving %d %s objects" % (len(objecturis), objectClass.__name__))
+        specifications = []
+        for objecturi in objecturis:
+            (namespace, identifier) = pynt.xmlns.splitURI(objecturi)
+            specifications.append((identifier, namespace, objectClass, None))
+        return pynt.xmlns.GetCreateRDFObjects(specifications)
+    
     def retrieveAndSetObject(self, objecturi, objectClass):
         theobject = self.retrieveObject(objecturi, objectClass)
         # self.SetRDFProperties(layer)
@@ -812,8 +823,8 @@ class RDFSchemaFetcher(RDFFetcher):
         # FIXME: This doesn't work, because retrieveAndSetObject can't handle more than two arguments.
         #labelset = self.retrieveAndSetObject(labeltypeuri, pynt.layers.LabelSet, rangeset=rangeset)
         if (mininclusive != None) and (maxinclusive != None):
-            labelset.rangeset.add(mininclusive, maxinclusive)
-            logger.debug("Set range of labelset %s to %s." % (labeltypeuri, rangeset))
+            labelset.addRange(mininclusive, maxinclusive)
+            logger.debug("Set range of labelset %s to %s." % (labeltypeuri, labelset.rangeset))
         else:
             logger.warning("Could not find a valid (mininclusive-maxinclusive = %s-%s) range for labelset %s" % (mininclusive, maxinclusive, labeltypeuri))
         
@@ -1332,21 +1343,30 @@ class RDFSchemaFetcher(RDFFetcher):
         for subject in subjects:
             self.retrieveProperty(subject)
 
+        # Create all locations, networks, devices and their interfaces in one batch.
+        # The retrieve functions below find the existing objects, and only set their properties.
+        locations = list(self.graph.subjects(rdf["type"], ndl["Location"]))
+        domains = list(self.graph.subjects(rdf["type"], ndl["NetworkDomain"]))
+        devices = list(self.graph.subjects(rdf["type"], ndl["Device"]))
+        self.retrieveObjects(locations, pynt.elements.Location)
+        self.retrieveObjects(domains, pynt.elements.Domain)
+        domaindevices = [deviceuri for domainuri in domains for deviceuri in self.graph.objects(domainuri, ndl["hasDevice"])]
+        self.retrieveObjects(devices + domaindevices, pynt.elements.Device)
+        deviceinterfaces = [interfaceuri for deviceuri in devices for interfaceuri in self.graph.objects(deviceuri, ndl["hasInterface"])]
+        self.retrieveObjects(deviceinterfaces, pynt.elements.Interface)
+
         # Retrieve all locations
         logger.debug("Retrieving locations from source %s" % self.url)
-        locations = list(self.graph.subjects(rdf["type"], ndl["Location"]))
         for locationuri in locations:
             self.retrieveLoction(locationuri)
 
         # Retrieve all networks
         logger.debug("Retrieving networks from source %s" % self.url)
-        domains = list(self.graph.subjects(rdf["type"], ndl["NetworkDomain"]))
         for domainuri in domains:
             self.retrieveNetwork(domainuri)
 
         # Retrieve all devices
         logger.debug("Retrieving devices from source %s" % self.url)
-        devices = list(self.graph.subjects(rdf["type"], ndl["Device"]))
         for deviceuri in devices:
             self.retrieveDevice(deviceuri)
 
@@ -1554,8 +1574,8 @@ class RDFLayerSchemaFetcher(RDFFetcher):
         (namespace, identifier) = pynt.xmlns.splitURI(labeltypeuri)
         labelset = pynt.layers.GetCreateLabelSet(identifier, namespace, rangeset=rangeset)
         if (mininclusive != None) and (maxinclusive != None):
-            labelset.rangeset.add(mininclusive, maxinclusive)
-            logger.debug("Set range of labelset %s to %s." % (labeltypeuri, rangeset))
+            labelset.addRange(mininclusive, maxinclusive)
+            logger.debug("Set range of labelset %s to %s." % (labeltypeuri, labelset.rangeset))
         else:
             logger.warning("Could not find a valid (mininclusive-maxinclusive = %s-%s) range for labelset %s" % (mininclusive, maxinclusive, labeltypeuri))
         
@@ -29,11 +29,13 @@ class SerialInput(pynt.input.BaseFetcher):
         self.io.close()
     
     def retrieve(self):
-        if len(pynt.xmlns.rdfobjects) > 0:
-            raise RuntimeWarning("pynt.xmlns.rdfobjects is non-empty. Overwriting old information.")
-        if len(pynt.xmlns.xmlnamespaces) > 0:
-            raise RuntimeWarning("pynt.xmlns.xmlnamespaces is non-empty. Overwriting old information.")
+        context = pynt.xmlns.GetActiveContext()
+        if len(context.rdfobjects) > 0:
+            raise RuntimeWarning("The rdfobjects of %s are non-empty. Overwriting old information." % context)
+        if len(context.xmlnamespaces) > 0:
+            raise RuntimeWarning("The xmlnamespaces of %s are non-empty. Overwriting old information." % context)
         data = pickle.load(self.io)
-        pynt.xmlns.rdfobjects    = data['rdfobjects']
-        pynt.xmlns.xmlnamespaces = data['namespaces']
+        context.rdfobjects    = data['rdfobjects']
+        context.xmlnamespaces = data['namespaces']
+        pynt.xmlns.ReindexRDFObjects(context)
         self.subject                = data['subject']
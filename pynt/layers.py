@@ -236,6 +236,15 @@ class Layer(pynt.xmlns.RDFObject):
             return self.labelprop.range.rangeset
         else:  # layer has no labels defined.
             return pynt.rangeset.RangeSet(None)
+    def hasBitmapLabels(self):
+        return isinstance(self.getLabelSet(), pynt.rangeset.BitmapRangeSet)
+    def newLabelSet(self, labels=None):
+        """Return a new set with the given labels (None, a label, list or RangeSet), with the item type and 
+        interval of the label set of this layer. This is a BitmapRangeSet if the label set is one."""
+        labelset = self.getLabelSet()
+        if isinstance(labelset, pynt.rangeset.BitmapRangeSet):
+            return pynt.rangeset.BitmapRangeSet(labels, offset=labelset.offset)
+        return pynt.rangeset.RangeSet(labels, itemtype=labelset.itemtype, interval=labelset.interval)
     def getIngressLabelSet(self):
         labelprop = self.getIngressLabelProp()
         if labelprop:
@@ -426,13 +435,25 @@ class LabelSet(pynt.xmlns.RDFObject):
     For example, #VLAN tag, which are a subset of integers, in the 0...4095 range."""
     # WARNING: do not make LabelSet a direct subclass of RangeSet. Otherwise, comparing two
     # LabelSet which accidentially have the same values are considered equal.
-    rangeset     = None   # the rangeset
+    rangeset     = None   # the rangeset. A BitmapRangeSet if the labels are integers in a bounded range.
     def __init__(self, identifier, namespace, rangeset):
         pynt.xmlns.RDFObject.__init__(self, identifier, namespace=namespace)
-        self.rangeset = rangeset
+        self.setRangeSet(rangeset)
         # not sure where a LabelSet belongs.
         # self.namespace.networkschema = True
         # self.namespace.layerschema = True
+    def setRangeSet(self, rangeset):
+        """Set the allowed labels. Integers in a bounded range, like VLAN tags, are stored as a 
+        BitmapRangeSet, so that the label sets of interfaces on this layer can be bitmaps too.
+        The rangeset is interned, and shared with the interfaces which allow all labels."""
+        if pynt.rangeset.IsBitmapDomain(rangeset) and not isinstance(rangeset, pynt.rangeset.BitmapRangeSet):
+            rangeset = pynt.rangeset.BitmapRangeSet(rangeset, offset=rangeset[0].min)
+        self.rangeset = pynt.rangeset.Intern(rangeset)
+    def addRange(self, min, max):
+        """Add the labels min...max (inclusive) to the allowed labels."""
+        rangeset = self.rangeset.copy()
+        rangeset.add(min, max)
+        self.setRangeSet(rangeset)
 
 
 def GetCreateResourceClass(identifier, namespace=None):
@@ -46,6 +46,21 @@ def GetLogger(name):
         InitLogger()
     return logging.getLogger(name)
 
+# Debug tracing in hot paths, like the path finding algorithms and object creation.
+# These functions call IsTracing() once, and skip their debug and info messages (including the
+# formatting of paths and interfaces) if it returns False. SetTracing(False) turns tracing off,
+# regardless of the log level. Tracing is off by default if python runs with -O.
+tracing = __debug__
+
+def SetTracing(enabled=True):
+    global tracing
+    tracing = bool(enabled)
+
+def IsTracing(logger, loglevel=logging.DEBUG):
+    """Return True if tracing is on, and logger logs messages of the given level.
+    Hot functions should call this once, and not per message."""
+    return tracing and logger.isEnabledFor(loglevel)
+
 def VerbosityToLogLevel(verbosity):
     # loglevel default is ERROR, it is increased for each verbosity, and decreased for quietness
     # verbosity loglevel
@@ -7,6 +7,7 @@ import types
 import logging
 # local modules
 import pynt.xmlns
+import pynt.elements
 import pynt.output
 
 
@@ -40,6 +41,8 @@ class DebugOutput(pynt.output.BaseOutput):
             if var[:2] == "__":
                 continue
             value = getattr(subject, var)
+            if isinstance(value, pynt.elements.OrderedSet):
+                value = value.getView()
             if isinstance(value, types.MethodType):
                 continue
             elif isinstance(value, types.NoneType):
@@ -25,8 +25,9 @@ class SerialOutput(pynt.output.BaseOutput):
         self.openfile()
         data = {}
         data['time']       = time.time()
-        data['rdfobjects'] = pynt.xmlns.rdfobjects
-        data['namespaces'] = pynt.xmlns.xmlnamespaces
+        context = pynt.xmlns.GetActiveContext()
+        data['rdfobjects'] = context.rdfobjects
+        data['namespaces'] = context.xmlnamespaces
         data['subject']    = subject
         pickle.dump(data,self.outfile)
         self.closefile()
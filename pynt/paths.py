@@ -260,6 +260,9 @@ class LayerProperty(pynt.elements.MultiLabelCPMixIn, pynt.elements.MultiProperty
         return self.layer
     def getInterfaceCount(self):
         return self.interfacecount
+    def recordChange(self, change, value=None):
+        # called by the mix-ins. A layer property is part of a path, not of the topology, so there is no journal.
+        pass
     def issubset(self, layerprop):
         """Returns True if (labels of) this layerproperty (self) is complete covered by the given layerproperty."""
         if self.adaptationfunction != layerprop.adaptationfunction:
@@ -3,10 +3,23 @@
 RangeSet are very efficient in storage, as they store ranges, e.g. [6,8-15,24-32,48]
 
 Note: this module is still used, although a newer version is written (datatype + rangeset2)
+
+IntersectAll() and UnionAll() combine many RangeSets in one call, for example the label sets of 
+all hops of a batch of paths. They use an IntervalMatrix if NumPy is installed. NumPy is optional; 
+without it, the sets are combined one by one.
 """
 
 import re
 import math
+import bisect
+import weakref
+import threading
+import collections
+# optional modules
+try:
+    import numpy
+except ImportError:
+    numpy = None
 # local module
 #import datatype
 
@@ -557,6 +570,7 @@ class RangeSet(object):
     interval        = None   # If interval == 0: ContinuousRange, interval > 0: DiscreteRange
     """Individual items in the RangeSet. E.g. int, float, long, str or unicode. Read only."""
     itemtype        = None
+    stringcache     = None  # the string representation, or None. Reset by _changed() on every modification.
     def __init__(self, string_or_array=None, interval=None, itemtype=None):
         """Create a new RangeSet. Examples: RangeSet("6,8-15,24-32,48",interval=1), 
         RangeSet(["[6]","[8-16>","[24-32]","48"]),
@@ -577,12 +591,13 @@ class RangeSet(object):
             for range in string_or_array: # we can loop through RangeSets to get the Range objects
                 self.ranges.append(self._Range(range, alwayscopy=True))
         elif (type(string_or_array) in [str, unicode]) and (itemtype not in [str, unicode]):
-            string_or_array = self._stringToList(string_or_array)
-            for item in string_or_array:
-                self.add(item)
+            if (self.itemtype in [int, long]) and (self.interval > 0):
+                # use the single-pass parser of SortedRangeSet, instead of creating a Range object for each item
+                self.ranges = SortedRangeSet(string_or_array, interval=self.interval, itemtype=self.itemtype).ranges
+            else:
+                self._addRanges(self._stringToList(string_or_array))
         elif isinstance(string_or_array, list):
-            for item in string_or_array:
-                self.add(item)
+            self._addRanges(string_or_array)
         else:
             self.add(string_or_array)
     def _stringToList(self, rangestring):
@@ -656,26 +671,22 @@ class RangeSet(object):
     def __copy__(self):
         """Return a copy of this set. The individual ranges are copied as well, the individual items are not."""
         return type(self)(self)
+    def _changed(self):
+        self.stringcache = None
     def _simplify(self):
         """Merge the ranges in the set, if possible"""
-        # before = "%s" % self
-        # delete empty ranges
-        i = 0
-        while i < len(self.ranges):
-            if self.ranges[i].isempty():
-                del self.ranges[i]
+        # delete empty ranges, and sort by minimum, so a range can only be merged with the previous one.
+        # (Sorting by __cmp__, which compares the maximum first, does not merge ranges like [1-2], [5-6], [0-10].)
+        ranges = [range for range in self.ranges if not range.isempty()]
+        ranges.sort(key=lambda range: (range.min, not range.mininclusive))
+        merged = []
+        for range in ranges:
+            if merged and merged[-1].connected(range):
+                merged[-1].extend(range)
             else:
-                i += 1
-        # merge continuous ranges
-        i = 0
-        self.ranges.sort(cmp=cmp)  # sort in place; require elaborate __cmp__, instead of default __lt__.
-        while i < len(self.ranges)-1:
-            if self.ranges[i].connected(self.ranges[i+1]):
-                self.ranges[i].extend(self.ranges[i+1])
-                del self.ranges[i+1]
-            else:
-                i += 1
-        # print "simplify: %s ==> %s" % (before, self)
+                merged.append(range)
+        self.ranges = merged
+        self._changed()
     def add(self, item, item2=None):
         """Add an element to the RangeSet. The element may be an item, Range or min,max"""
         # Make sure item is of the same type (DiscreteRange or ContinuousRange as the other elements)
@@ -687,6 +698,17 @@ class RangeSet(object):
             self._setinterval(item.interval)
         self.ranges.append(item)
         self._simplify()
+    def _addRanges(self, items):
+        """Add a list of elements (items or Ranges), and merge the ranges once, instead of after each element."""
+        for item in items:
+            item = self._Range(item, alwayscopy=True)
+            if item.isempty():
+                continue
+            if not self.itemtype:
+                self._setitemtype(item.itemtype)
+                self._setinterval(item.interval)
+            self.ranges.append(item)
+        self._simplify()
     def _setitemtype(self, itemtype):
         if self.itemtype:
             return
@@ -705,8 +727,7 @@ class RangeSet(object):
         self.add(item)
     def update(self, rangeset):
         """Update the RangeSet to the union of itself and the given rangeset"""
-        for range in rangeset:
-            self.add(range)
+        self._addRanges(list(rangeset))
     def union(self, rangeset):
         """Return a new rangeset, consisting of all elements in either this rangeset or the given rangeset."""
         newrangeset = self.copy()
@@ -740,6 +761,7 @@ class RangeSet(object):
         """Update a set with the intersection of itself and another."""
         newrangeset = self.intersection(rangeset)
         self.ranges = newrangeset.ranges
+        self._changed()
     def intersection(self, rangeset):
         """Return the intersection of two sets as a new rangeset. (i.e. all elements that are in both sets.)"""
         newrangeset = type(self)(None, itemtype=self.itemtype, interval=self.interval)
@@ -753,6 +775,7 @@ class RangeSet(object):
         """Return the symmetric difference of two sets as a new rangeset. (i.e. all elements that are in exactly one of the sets.)"""
         newrangeset = self.symmetric_difference(rangeset)
         self.ranges = newrangeset.ranges
+        self._changed()
     def symmetric_difference(self, rangeset):
         """Update this rangeset with the symmetric difference of itself and another."""
         # Sym_diff(a,b) := (a - b) + (b - a)
@@ -796,8 +819,12 @@ class RangeSet(object):
         self.intersection_update(rangeset)
         return self
     def __getitem__(self, i): return self.ranges[i]
-    def __setitem__(self, i, item): self.ranges[i] = item
-    def __delitem__(self, i): del self.ranges[i]
+    def __setitem__(self, i, item):
+        self.ranges[i] = item
+        self._changed()
+    def __delitem__(self, i):
+        del self.ranges[i]
+        self._changed()
     def isempty(self):
         """Returns True if there are no elements in the given range."""
         return len(self.ranges) == 0
@@ -807,6 +834,7 @@ class RangeSet(object):
     def clear(self):
         """Removes all elements from this rangeset"""
         self.ranges = []
+        self._changed()
     def __contains__(self, value):
         for range in self.ranges:
             if value in range:
@@ -866,6 +894,11 @@ class RangeSet(object):
             length += len(range)
         return length
     def __str__(self):
+        """Return the items as a string like "{6, 8-15, 24-32, 48}". The string is cached until the set is modified."""
+        if self.stringcache == None:
+            self.stringcache = self._toString()
+        return self.stringcache
+    def _toString(self):
         itemlist = []
         for item in self.ranges:
             itemlist.append(item.__str__())
@@ -877,3 +910,900 @@ class RangeSet(object):
         return "%s([%s], interval=%s)" % (type(self).__name__, ", ".join(itemlist), self.interval)
 
 
+class SortedRangeSet(RangeSet):
+    """A RangeSet of discrete items (e.g. VLAN tags or wavelength channels), stored as two parallel 
+    sorted lists with the minimum and maximum of each range, instead of a list of Range objects. 
+    Lookups use bisect, and union, intersection and difference merge the two lists in linear time. 
+    The ranges attribute is still available, but creates the Range objects on first use."""
+    mins            = None  # sorted list of the minimum of each range (inclusive)
+    maxs            = None  # sorted list of the maximum of each range (inclusive), in the same order
+    rangecache      = None  # list of DiscreteRange objects, made from mins and maxs, or None
+    rebounds        = re.compile("^\s*(\-?\d+(?:\.\d*)?)(?:\s*\-\s*(\-?\d+(?:\.\d*)?))?\s*$")  # shared object among all instances
+    # rebounds matches "4", "4-5", "-3--1" and "1.4-4.5". Other ranges, like "<3-8]", are parsed by Range._stringToRange()
+    def __init__(self, string_or_array=None, interval=None, itemtype=None):
+        self.mins = []
+        self.maxs = []
+        if itemtype:
+            self._setitemtype(itemtype)
+        if interval != None:
+            self._setinterval(interval)
+        elif not isinstance(string_or_array, RangeSet):
+            self._setinterval(1)    # the items are discrete
+        if isinstance(string_or_array, RangeSet):
+            if not self.itemtype:
+                self._setitemtype(string_or_array.itemtype)
+            if not self.interval:
+                self._setinterval(string_or_array.interval)
+            (self.mins, self.maxs) = self._getBounds(string_or_array)
+        elif (type(string_or_array) in [str, unicode]) and (itemtype not in [str, unicode]):
+            self._setBounds(self._stringToBounds(string_or_array))
+        elif isinstance(string_or_array, list):
+            self._setBounds([self._itemBounds(item) for item in string_or_array])
+        elif string_or_array != None:
+            self.add(string_or_array)
+    
+    @classmethod
+    def FromBounds(cls, bounds, interval=1, itemtype=int):
+        """Return a new SortedRangeSet with the given (min, max) pairs, which may be unsorted and may 
+        overlap. E.g. SortedRangeSet.FromBounds([(100,199), (1,10), (150,300)])"""
+        rangeset = cls(None, interval=interval, itemtype=itemtype)
+        rangeset._setBounds([rangeset._itemBounds(itemtype(min), itemtype(max)) for (min, max) in bounds if min <= max])
+        return rangeset
+    
+    @classmethod
+    def FromItems(cls, items, interval=1, itemtype=int):
+        """Return a new SortedRangeSet with the given items. E.g. SortedRangeSet.FromItems([4,5,6,8])"""
+        return cls.FromBounds([(item, item) for item in items], interval=interval, itemtype=itemtype)
+    
+    def _getranges(self):
+        if self.rangecache == None:
+            self.rangecache = [DiscreteRange(min, max, itemtype=self.itemtype, interval=self.interval) for (min, max) in zip(self.mins, self.maxs)]
+        return self.rangecache
+    def _setranges(self, ranges):
+        self._setBounds([self._itemBounds(range) for range in ranges])
+    ranges = property(_getranges, _setranges)
+    
+    def _changed(self):
+        self.rangecache = None
+        self.stringcache = None
+    def _stringToBounds(self, rangestring):
+        """Return the list of (min, max) pairs of a string like "6,8-15,24-32,48", in one pass, 
+        without creating a Range object for each item. Same result as _itemBounds() of each item."""
+        match = self.rebounds.match
+        itemtype = self.itemtype
+        interval = self.interval
+        bounds = []
+        for item in self._stringToList(rangestring):
+            found = match(item)
+            try:
+                (min, max) = (itemtype(found.group(1)), itemtype(found.group(2) or found.group(1)))
+            except (AttributeError, ValueError):
+                bounds.append(self._itemBounds(item))   # not a plain number or range; raises a ValueError if invalid
+                continue
+            # round to a multiple of interval, as DiscreteRange does
+            if (min % interval) > 0:
+                min = itemtype(interval*(math.ceil(float(min)/interval)))
+            if (max % interval) > 0:
+                max = itemtype(interval*(math.floor(float(max)/interval)))
+            if min <= max:
+                bounds.append((min, max))
+        return bounds
+    def _itemBounds(self, item, item2=None):
+        """Return the (min, max) pair of an item, Range or min,max, or None if it is empty."""
+        if (type(item) == self.itemtype) and (self.interval == 1) and ((item2 == None) or (type(item2) == self.itemtype)):
+            if item2 == None:
+                return (item, item)
+            return (item, item2)
+        range = self._Range(item, item2=item2, alwayscopy=True)
+        if not isinstance(range, DiscreteRange):
+            raise ValueError("%s only stores discrete items, not %s" % (type(self).__name__, range))
+        if not self.itemtype:
+            self._setitemtype(range.itemtype)
+            self._setinterval(range.interval)
+        if range.isempty():
+            return None
+        return (range.min, range.max)
+    def _getBounds(self, rangeset):
+        """Return the lists of minima and maxima of another RangeSet."""
+        if isinstance(rangeset, SortedRangeSet):
+            return (rangeset.mins[:], rangeset.maxs[:])
+        if not isinstance(rangeset, RangeSet):
+            rangeset = [rangeset]
+        bounds = [self._itemBounds(range) for range in rangeset]
+        return self._mergeBounds(sorted([bound for bound in bounds if bound != None]))
+    def _setBounds(self, bounds):
+        """Set the ranges from a list of (min, max) pairs, which may be unsorted and overlapping."""
+        (self.mins, self.maxs) = self._mergeBounds(sorted([bound for bound in bounds if bound != None]))
+        self._changed()
+    def _mergeBounds(self, bounds):
+        """Merge a sorted list of (min, max) pairs into lists of minima and maxima of disjoint ranges."""
+        mins = []
+        maxs = []
+        interval = self.interval
+        for (min, max) in bounds:
+            if maxs and (min <= maxs[-1] + interval):
+                if max > maxs[-1]:
+                    maxs[-1] = max
+            else:
+                mins.append(min)
+                maxs.append(max)
+        return (mins, maxs)
+    
+    def copy(self):
+        """Return a copy of this set."""
+        newrangeset = type(self)(None, itemtype=self.itemtype, interval=self.interval)
+        newrangeset.mins = self.mins[:]
+        newrangeset.maxs = self.maxs[:]
+        return newrangeset
+    def __copy__(self):
+        return self.copy()
+    def _new(self, mins, maxs):
+        newrangeset = type(self)(None, itemtype=self.itemtype, interval=self.interval)
+        newrangeset.mins = mins
+        newrangeset.maxs = maxs
+        return newrangeset
+    def _simplify(self):
+        pass    # the bounds are always merged
+    
+    def add(self, item, item2=None):
+        """Add an element to the RangeSet. The element may be an item, Range or min,max"""
+        bound = self._itemBounds(item, item2)
+        if bound == None:
+            return
+        (min, max) = bound
+        mins = self.mins
+        maxs = self.maxs
+        interval = self.interval
+        # first range that ends at or after min - interval, and first range that starts after max + interval
+        first = bisect.bisect_left(maxs, min - interval)
+        last = bisect.bisect_right(mins, max + interval)
+        if first < last:
+            if mins[first] < min:
+                min = mins[first]
+            if maxs[last-1] > max:
+                max = maxs[last-1]
+        mins[first:last] = [min]
+        maxs[first:last] = [max]
+        self._changed()
+    def discard(self, item):
+        """Remove the given element from this RangeSet. The element may be an item or a Range.
+        Does nothing if the item does not exist."""
+        bound = self._itemBounds(item)
+        if bound == None:
+            return
+        (min, max) = bound
+        mins = self.mins
+        maxs = self.maxs
+        first = bisect.bisect_left(maxs, min)
+        last = bisect.bisect_right(mins, max)
+        if first >= last:
+            return
+        newmins = []
+        newmaxs = []
+        if mins[first] < min:
+            newmins.append(mins[first])
+            newmaxs.append(min - self.interval)
+        if maxs[last-1] > max:
+            newmins.append(max + self.interval)
+            newmaxs.append(maxs[last-1])
+        mins[first:last] = newmins
+        maxs[first:last] = newmaxs
+        self._changed()
+    def update(self, rangeset):
+        """Update the RangeSet to the union of itself and the given rangeset"""
+        (othermins, othermaxs) = self._getBounds(rangeset)
+        (self.mins, self.maxs) = self._mergeBounds(_mergeSorted(zip(self.mins, self.maxs), zip(othermins, othermaxs)))
+        self._changed()
+    def union(self, rangeset):
+        """Return a new rangeset, consisting of all elements in either this rangeset or the given rangeset."""
+        (othermins, othermaxs) = self._getBounds(rangeset)
+        return self._new(*self._mergeBounds(_mergeSorted(zip(self.mins, self.maxs), zip(othermins, othermaxs))))
+    def difference(self, rangeset):
+        """Return a new rangeset, consisting of all elements of this rangeset, except for those present in the given rangeset."""
+        (othermins, othermaxs) = self._getBounds(rangeset)
+        mins = []
+        maxs = []
+        interval = self.interval
+        j = 0
+        for i in xrange(len(self.mins)):
+            (min, max) = (self.mins[i], self.maxs[i])
+            while (j < len(othermaxs)) and (othermaxs[j] < min):
+                j += 1
+            k = j
+            while (k < len(othermins)) and (othermins[k] <= max):
+                if othermins[k] > min:
+                    mins.append(min)
+                    maxs.append(othermins[k] - interval)
+                if othermaxs[k] + interval > min:
+                    min = othermaxs[k] + interval
+                if othermaxs[k] > max:
+                    break
+                k += 1
+            if min <= max:
+                mins.append(min)
+                maxs.append(max)
+        return self._new(mins, maxs)
+    def difference_update(self, rangeset):
+        """Remove all elements from the given rangeset from this rangeset."""
+        newrangeset = self.difference(rangeset)
+        (self.mins, self.maxs) = (newrangeset.mins, newrangeset.maxs)
+        self._changed()
+    def intersection(self, rangeset):
+        """Return the intersection of two sets as a new rangeset. (i.e. all elements that are in both sets.)"""
+        (othermins, othermaxs) = self._getBounds(rangeset)
+        mins = []
+        maxs = []
+        i = 0
+        j = 0
+        while (i < len(self.mins)) and (j < len(othermins)):
+            min = self.mins[i]
+            if othermins[j] > min:
+                min = othermins[j]
+            max = self.maxs[i]
+            if othermaxs[j] < max:
+                max = othermaxs[j]
+            if min <= max:
+                mins.append(min)
+                maxs.append(max)
+            if self.maxs[i] < othermaxs[j]:
+                i += 1
+            else:
+                j += 1
+        return self._new(mins, maxs)
+    def intersection_update(self, rangeset):
+        """Update a set with the intersection of itself and another."""
+        newrangeset = self.intersection(rangeset)
+        (self.mins, self.maxs) = (newrangeset.mins, newrangeset.maxs)
+        self._changed()
+    def symmetric_difference(self, rangeset):
+        """Return the symmetric difference of two sets as a new rangeset. (i.e. all elements that are in exactly one of the sets.)"""
+        other = self._new(*self._getBounds(rangeset))
+        return self.difference(other).union(other.difference(self))
+    def symmetric_difference_update(self, rangeset):
+        """Update this rangeset with the symmetric difference of itself and another."""
+        newrangeset = self.symmetric_difference(rangeset)
+        (self.mins, self.maxs) = (newrangeset.mins, newrangeset.maxs)
+        self._changed()
+    
+    def __setitem__(self, i, item):
+        ranges = self.ranges[:]
+        ranges[i] = item
+        self.ranges = ranges
+    def __delitem__(self, i):
+        del self.mins[i]
+        del self.maxs[i]
+        self._changed()
+    def isempty(self):
+        """Returns True if there are no elements in the given range."""
+        return len(self.mins) == 0
+    def clear(self):
+        """Removes all elements from this rangeset"""
+        self.mins = []
+        self.maxs = []
+        self._changed()
+    def __contains__(self, value):
+        i = bisect.bisect_right(self.mins, value) - 1
+        return (i >= 0) and (value <= self.maxs[i])
+    def issubset(self, rangeset):
+        """Report whether another set contains this set. (this < rangeset)"""
+        return self.difference(rangeset).isempty()
+    def issuperset(self, rangeset):
+        """Report whether this set contains another set. (rangeset < this)"""
+        return self._new(*self._getBounds(rangeset)).difference(self).isempty()
+    def overlaps(self, value):
+        """returns True if this rangeset overlaps with range or rangeset value"""
+        return not self.intersection(value).isempty()
+    def __eq__(self, value):
+        """value. x.__eq__(y) <==> x==y"""
+        if not isinstance(value, RangeSet):
+            return False
+        if not isinstance(value, SortedRangeSet):
+            return RangeSet.__eq__(self, value)
+        return (self.mins == value.mins) and (self.maxs == value.maxs) and (self.itemtype == value.itemtype)
+    def __len__(self):
+        """Returns the number of items in the set."""
+        interval = self.interval
+        length = 0
+        for (min, max) in zip(self.mins, self.maxs):
+            length += int((max - min)/interval) + 1
+        return length
+    def _toString(self):
+        itemlist = []
+        for (min, max) in zip(self.mins, self.maxs):
+            if min == max:
+                itemlist.append(repr(min))
+            else:
+                itemlist.append("%s-%s" % (repr(min), repr(max)))
+        return "{" + ", ".join(itemlist) + "}"
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('rangecache', None)
+        state.pop('stringcache', None)
+        return state
+
+def _mergeSorted(bounds1, bounds2):
+    """Merge two sorted lists of (min, max) pairs into one sorted list."""
+    merged = []
+    i = 0
+    j = 0
+    while (i < len(bounds1)) and (j < len(bounds2)):
+        if bounds1[i] <= bounds2[j]:
+            merged.append(bounds1[i])
+            i += 1
+        else:
+            merged.append(bounds2[j])
+            j += 1
+    merged.extend(bounds1[i:])
+    merged.extend(bounds2[j:])
+    return merged
+
+
+class BitmapRangeSet(SortedRangeSet):
+    """A RangeSet of integers, stored as a bitmap in a (long) integer: bit i is set if item offset+i 
+    is in the set. Union, intersection, difference, len() and issubset() are bitwise operations on 
+    the whole bitmap. Best suited for small and dense label spaces, like VLAN tags 0-4095. 
+    The mins, maxs and ranges attributes are still available, but are created on first use."""
+    bits            = 0     # int or long, the bitmap
+    offset          = 0     # int, the item of bit 0. Lowered if a smaller item is added.
+    boundcache      = None  # tuple (mins, maxs), made from bits, or None
+    maxdomainsize   = 65536 # int, the largest label space that IsBitmapDomain() accepts
+    def __init__(self, string_or_array=None, interval=None, itemtype=None, offset=None):
+        self.bits = 0
+        if isinstance(string_or_array, RangeSet) and not itemtype:
+            itemtype = string_or_array.itemtype
+        self._setitemtype(itemtype or int)
+        if interval == None:
+            interval = 1
+        self._setinterval(interval)
+        if (self.itemtype not in [int, long]) or (self.interval != 1):
+            raise ValueError("%s only stores integers with interval 1, not %s with interval %s" % (type(self).__name__, self.itemtype.__name__, interval))
+        if offset != None:
+            self.offset = self.itemtype(offset)
+        if isinstance(string_or_array, RangeSet):
+            (self.bits, self.offset) = self._getBits(string_or_array)
+        elif (type(string_or_array) in [str, unicode]) and (itemtype not in [str, unicode]):
+            self._setBounds(self._stringToBounds(string_or_array))
+        elif isinstance(string_or_array, list):
+            self._setBounds([self._itemBounds(item) for item in string_or_array])
+        elif string_or_array != None:
+            self.add(string_or_array)
+    
+    @classmethod
+    def FromBounds(cls, bounds, interval=1, itemtype=int, offset=None):
+        """Return a new BitmapRangeSet with the given (min, max) pairs, which may be unsorted and may 
+        overlap. E.g. BitmapRangeSet.FromBounds([(100,199), (1,10), (150,300)])"""
+        rangeset = cls(None, interval=interval, itemtype=itemtype, offset=offset)
+        rangeset._setBounds([(itemtype(min), itemtype(max)) for (min, max) in bounds if min <= max])
+        return rangeset
+    
+    @classmethod
+    def FromItems(cls, items, interval=1, itemtype=int, offset=None):
+        """Return a new BitmapRangeSet with the given items. E.g. BitmapRangeSet.FromItems([4,5,6,8])"""
+        return cls.FromBounds([(item, item) for item in items], interval=interval, itemtype=itemtype, offset=offset)
+    
+    def _getBoundCache(self):
+        if self.boundcache == None:
+            mins = []
+            maxs = []
+            itemtype = self.itemtype
+            bits = self.bits
+            position = self.offset
+            while bits:
+                zeros = (bits & -bits).bit_length() - 1         # number of trailing zeros
+                bits >>= zeros
+                position += zeros
+                ones = (~bits & (bits + 1)).bit_length() - 1    # number of trailing ones
+                mins.append(itemtype(position))
+                maxs.append(itemtype(position + ones - 1))
+                bits >>= ones
+                position += ones
+            self.boundcache = (mins, maxs)
+        return self.boundcache
+    mins = property(lambda self: self._getBoundCache()[0])
+    maxs = property(lambda self: self._getBoundCache()[1])
+    
+    def _changed(self):
+        self.rangecache = None
+        self.boundcache = None
+        self.stringcache = None
+    def _boundsToBits(self, bounds, offset):
+        """Return the bitmap of a list of (min, max) pairs, which are all at or above offset."""
+        bits = 0
+        for (min, max) in bounds:
+            bits |= ((1 << (max - min + 1)) - 1) << (min - offset)
+        return bits
+    def _getBits(self, rangeset):
+        """Return the (bits, offset) of another RangeSet, Range or item."""
+        if isinstance(rangeset, BitmapRangeSet):
+            return (rangeset.bits, rangeset.offset)
+        (mins, maxs) = self._getBounds(rangeset)
+        offset = self.offset
+        if mins and (mins[0] < offset):
+            offset = mins[0]
+        return (self._boundsToBits(zip(mins, maxs), offset), offset)
+    def _aligned(self, rangeset):
+        """Return (bits, otherbits, offset): the bitmaps of self and of the given rangeset, shifted to the same offset."""
+        (otherbits, otheroffset) = self._getBits(rangeset)
+        bits = self.bits
+        offset = self.offset
+        if otheroffset < offset:
+            bits <<= offset - otheroffset
+            offset = otheroffset
+        elif otheroffset > offset:
+            otherbits <<= otheroffset - offset
+        return (bits, otherbits, offset)
+    def _setBits(self, bits, offset):
+        (self.bits, self.offset) = (bits, offset)
+        self._changed()
+    def _setBounds(self, bounds):
+        """Set the items from a list of (min, max) pairs, which may be unsorted and overlapping."""
+        bounds = [bound for bound in bounds if bound != None]
+        offset = self.offset
+        if bounds:
+            offset = min(offset, min([bound[0] for bound in bounds]))
+        self._setBits(self._boundsToBits(bounds, offset), offset)
+    def _newBits(self, bits, offset):
+        newrangeset = type(self)(None, itemtype=self.itemtype, interval=self.interval, offset=offset)
+        newrangeset.bits = bits
+        return newrangeset
+    def _new(self, mins, maxs):
+        newrangeset = type(self)(None, itemtype=self.itemtype, interval=self.interval, offset=self.offset)
+        newrangeset._setBounds(zip(mins, maxs))
+        return newrangeset
+    
+    def copy(self):
+        """Return a copy of this set."""
+        return self._newBits(self.bits, self.offset)
+    def __copy__(self):
+        return self.copy()
+    
+    def add(self, item, item2=None):
+        """Add an element to the RangeSet. The element may be an item, Range or min,max"""
+        bound = self._itemBounds(item, item2)
+        if bound == None:
+            return
+        offset = self.offset
+        if bound[0] < offset:
+            offset = bound[0]
+        self._setBits((self.bits << (self.offset - offset)) | self._boundsToBits([bound], offset), offset)
+    def discard(self, item):
+        """Remove the given element from this RangeSet. The element may be an item or a Range.
+        Does nothing if the item does not exist."""
+        self.difference_update(item)
+    def update(self, rangeset):
+        """Update the RangeSet to the union of itself and the given rangeset"""
+        (bits, otherbits, offset) = self._aligned(rangeset)
+        self._setBits(bits | otherbits, offset)
+    def union(self, rangeset):
+        """Return a new rangeset, consisting of all elements in either this rangeset or the given rangeset."""
+        (bits, otherbits, offset) = self._aligned(rangeset)
+        return self._newBits(bits | otherbits, offset)
+    def difference(self, rangeset):
+        """Return a new rangeset, consisting of all elements of this rangeset, except for those present in the given rangeset."""
+        (bits, otherbits, offset) = self._aligned(rangeset)
+        return self._newBits(bits & ~otherbits, offset)
+    def difference_update(self, rangeset):
+        """Remove all elements from the given rangeset from this rangeset."""
+        (bits, otherbits, offset) = self._aligned(rangeset)
+        self._setBits(bits & ~otherbits, offset)
+    def intersection(self, rangeset):
+        """Return the intersection of two sets as a new rangeset. (i.e. all elements that are in both sets.)"""
+        (bits, otherbits, offset) = self._aligned(rangeset)
+        return self._newBits(bits & otherbits, offset)
+    def intersection_update(self, rangeset):
+        """Update a set with the intersection of itself and another."""
+        (bits, otherbits, offset) = self._aligned(rangeset)
+        self._setBits(bits & otherbits, offset)
+    def symmetric_difference(self, rangeset):
+        """Return the symmetric difference of two sets as a new rangeset. (i.e. all elements that are in exactly one of the sets.)"""
+        (bits, otherbits, offset) = self._aligned(rangeset)
+        return self._newBits(bits ^ otherbits, offset)
+    def symmetric_difference_update(self, rangeset):
+        """Update this rangeset with the symmetric difference of itself and another."""
+        (bits, otherbits, offset) = self._aligned(rangeset)
+        self._setBits(bits ^ otherbits, offset)
+    
+    def __delitem__(self, i):
+        ranges = self.ranges[:]
+        del ranges[i]
+        self.ranges = ranges
+    def isempty(self):
+        """Returns True if there are no elements in the given range."""
+        return self.bits == 0
+    def clear(self):
+        """Removes all elements from this rangeset"""
+        self._setBits(0, self.offset)
+    def __contains__(self, value):
+        if type(value) not in [int, long]:
+            return SortedRangeSet.__contains__(self, value)
+        position = value - self.offset
+        return (position >= 0) and bool((self.bits >> position) & 1)
+    def issubset(self, rangeset):
+        """Report whether another set contains this set. (this < rangeset)"""
+        (bits, otherbits, offset) = self._aligned(rangeset)
+        return (bits & ~otherbits) == 0
+    def issuperset(self, rangeset):
+        """Report whether this set contains another set. (rangeset < this)"""
+        (bits, otherbits, offset) = self._aligned(rangeset)
+        return (otherbits & ~bits) == 0
+    def overlaps(self, value):
+        """returns True if this rangeset overlaps with range or rangeset value"""
+        (bits, otherbits, offset) = self._aligned(value)
+        return (bits & otherbits) != 0
+    def __eq__(self, value):
+        """value. x.__eq__(y) <==> x==y"""
+        if not isinstance(value, BitmapRangeSet):
+            return SortedRangeSet.__eq__(self, value)
+        (bits, otherbits, offset) = self._aligned(value)
+        return (bits == otherbits) and (self.itemtype == value.itemtype)
+    def __len__(self):
+        """Returns the number of items in the set."""
+        return bin(self.bits).count("1")
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('rangecache', None)
+        state.pop('boundcache', None)
+        state.pop('stringcache', None)
+        return state
+
+def IsBitmapDomain(rangeset):
+    """Return True if the given RangeSet is a bounded set of integers, small enough to store 
+    subsets of it as a BitmapRangeSet. An empty RangeSet is unbounded."""
+    if (rangeset.itemtype not in [int, long]) or (rangeset.interval != 1) or rangeset.isempty():
+        return False
+    return (rangeset[-1].max - rangeset[0].min) < BitmapRangeSet.maxdomainsize
+
+
+class InternedRangeSetMixIn(object):
+    """Mix-in for interned RangeSets, as returned by Intern(). There is at most one interned set with 
+    the same type and items, so it can be shared by all interfaces and paths that use these labels. 
+    Interned sets are immutable; copy() returns a regular, mutable RangeSet. The results of union, 
+    intersection and difference of two interned sets are interned, and kept in an LRU cache."""
+    mutableclass    = None  # the class returned by copy()
+    internkey       = None  # hashable tuple of the class and items, or None while the set is created
+    internhash      = None  # int, hash of internkey
+    def __hash__(self):
+        return self.internhash
+    def __reduce__(self):
+        return (Intern, (self.copy(),))
+    def _checkMutable(self):
+        if self.internkey != None:
+            raise TypeError("%s is immutable. Use copy() to get a mutable copy." % type(self).__name__)
+    def copy(self):
+        """Return a mutable copy of this set."""
+        return self.mutableclass(self)
+    def __copy__(self):
+        return self.copy()
+    def _operation(self, operation, rangeset):
+        if (self.internkey != None) and (getattr(rangeset, "internkey", None) != None):
+            return _CachedOperation(operation, self, rangeset)
+        return getattr(self.copy(), operation)(rangeset)
+    def union(self, rangeset):
+        """Return a new rangeset, consisting of all elements in either this rangeset or the given rangeset."""
+        return self._operation("union", rangeset)
+    def difference(self, rangeset):
+        """Return a new rangeset, consisting of all elements of this rangeset, except for those present in the given rangeset."""
+        return self._operation("difference", rangeset)
+    def intersection(self, rangeset):
+        """Return the intersection of two sets as a new rangeset. (i.e. all elements that are in both sets.)"""
+        return self._operation("intersection", rangeset)
+    def symmetric_difference(self, rangeset):
+        """Return the symmetric difference of two sets as a new rangeset. (i.e. all elements that are in exactly one of the sets.)"""
+        return self._operation("symmetric_difference", rangeset)
+    def add(self, item, item2=None):
+        self._checkMutable()
+        super(InternedRangeSetMixIn, self).add(item, item2)
+    def discard(self, item):
+        self._checkMutable()
+        super(InternedRangeSetMixIn, self).discard(item)
+    def update(self, rangeset):
+        self._checkMutable()
+        super(InternedRangeSetMixIn, self).update(rangeset)
+    def difference_update(self, rangeset):
+        self._checkMutable()
+        super(InternedRangeSetMixIn, self).difference_update(rangeset)
+    def intersection_update(self, rangeset):
+        self._checkMutable()
+        super(InternedRangeSetMixIn, self).intersection_update(rangeset)
+    def symmetric_difference_update(self, rangeset):
+        self._checkMutable()
+        super(InternedRangeSetMixIn, self).symmetric_difference_update(rangeset)
+    def clear(self):
+        self._checkMutable()
+        super(InternedRangeSetMixIn, self).clear()
+    def __setitem__(self, i, item):
+        self._checkMutable()
+        super(InternedRangeSetMixIn, self).__setitem__(i, item)
+    def __delitem__(self, i):
+        self._checkMutable()
+        super(InternedRangeSetMixIn, self).__delitem__(i)
+    def _setranges(self, ranges):
+        self._checkMutable()
+        super(InternedRangeSetMixIn, self)._setranges(ranges)
+    ranges = property(lambda self: self._getranges(), lambda self, ranges: self._setranges(ranges))
+
+
+class InternedSortedRangeSet(InternedRangeSetMixIn, SortedRangeSet):
+    """Interned, immutable SortedRangeSet. Created by Intern()."""
+    mutableclass    = SortedRangeSet
+    def _getInternKey(self):
+        return (type(self), self.itemtype, self.interval, tuple(self.mins), tuple(self.maxs))
+
+
+class InternedBitmapRangeSet(InternedRangeSetMixIn, BitmapRangeSet):
+    """Interned, immutable BitmapRangeSet. Created by Intern()."""
+    mutableclass    = BitmapRangeSet
+    def _getInternKey(self):
+        if self.bits == 0:
+            return (type(self), self.itemtype, 0, 0)
+        zeros = (self.bits & -self.bits).bit_length() - 1   # the key does not depend on the offset
+        return (type(self), self.itemtype, self.offset + zeros, self.bits >> zeros)
+
+
+# interned sets by internkey. Sets which are no longer used are removed.
+_internedsets = weakref.WeakValueDictionary()
+# LRU cache of (operation, interned set, interned set) -> interned result, oldest first
+_operationcache = collections.OrderedDict()
+operationcachesize = 4096   # maximum number of results in the operation cache
+_internlock = threading.Lock()
+
+def Intern(rangeset):
+    """Return the interned, immutable RangeSet with the same items as the given RangeSet: an 
+    InternedBitmapRangeSet for a BitmapRangeSet, and an InternedSortedRangeSet for other sets of 
+    discrete items. Sets of continuous or untyped items can not be interned; a copy is returned."""
+    if isinstance(rangeset, InternedRangeSetMixIn):
+        return rangeset
+    if isinstance(rangeset, BitmapRangeSet):
+        candidate = InternedBitmapRangeSet(rangeset)
+    elif rangeset.itemtype and rangeset.interval:
+        candidate = InternedSortedRangeSet(rangeset)
+    else:
+        return rangeset.copy()
+    internkey = candidate._getInternKey()
+    _internlock.acquire()
+    try:
+        interned = _internedsets.get(internkey)
+        if interned == None:
+            candidate.internkey = internkey
+            candidate.internhash = hash(internkey)
+            _internedsets[internkey] = candidate
+            interned = candidate
+    finally:
+        _internlock.release()
+    return interned
+
+def _CachedOperation(operation, rangeset1, rangeset2):
+    """Return the interned result of rangeset1.operation(rangeset2), for two interned sets."""
+    key = (operation, rangeset1, rangeset2)
+    _internlock.acquire()
+    try:
+        result = _operationcache.pop(key, None)
+        if result != None:
+            _operationcache[key] = result   # most recently used
+            return result
+    finally:
+        _internlock.release()
+    result = Intern(getattr(rangeset1.copy(), operation)(rangeset2))
+    _internlock.acquire()
+    try:
+        _operationcache[key] = result
+        while len(_operationcache) > operationcachesize:
+            _operationcache.popitem(last=False)
+    finally:
+        _internlock.release()
+    return result
+
+def ClearOperationCache():
+    """Remove all results from the LRU cache of operations on interned sets."""
+    _internlock.acquire()
+    try:
+        _operationcache.clear()
+    finally:
+        _internlock.release()
+
+
+def IsIntervalMatrixAvailable():
+    """Return True if NumPy is installed, and an IntervalMatrix can be used."""
+    return numpy != None
+
+
+class IntervalMatrix(object):
+    """The ranges of a batch of groups of discrete RangeSets, for example the label sets of all hops 
+    of N paths, stored in NumPy arrays. The intersection or union of every group is computed from 
+    the coverage of each item, the cumulative sum of the starts and ends of all ranges, instead of 
+    with one set operation per pair of sets. The coverage is a dense matrix of groups by items if it 
+    has at most maxcells cells, and otherwise computed by sorting the starts and ends of all ranges.
+    All RangeSets must have the same interval, and either all store floats, or all integers. Requires NumPy."""
+    groupcount      = 0     # int, number of groups
+    setcounts       = None  # numpy array of ints, indexed by group: the number of sets in the group
+    groups          = None  # numpy array of ints, indexed by range: the group of the range
+    mins            = None  # numpy array, indexed by range: the minimum of the range (inclusive)
+    maxs            = None  # numpy array, indexed by range: the maximum of the range (inclusive)
+    itemtype        = None
+    interval        = None
+    bitmapoffsets   = None  # list, indexed by group: offset of the first set if it is a BitmapRangeSet, else None
+    maxcells        = 1 << 22   # int, maximum size of the dense coverage matrix; larger batches are sorted instead
+    def __init__(self, groups):
+        """Create a matrix of groups, a list of lists of RangeSets."""
+        if numpy == None:
+            raise ImportError("Module numpy is not available. It can be downloaded from http://numpy.scipy.org/\n")
+        self.groupcount = len(groups)
+        self.setcounts = numpy.zeros(self.groupcount, dtype=int)
+        self.bitmapoffsets = [None] * self.groupcount
+        rangecounts = numpy.zeros(self.groupcount, dtype=int)
+        mins = []
+        maxs = []
+        for (groupid, group) in enumerate(groups):
+            self.setcounts[groupid] = len(group)
+            if group and isinstance(group[0], BitmapRangeSet):
+                self.bitmapoffsets[groupid] = group[0].offset
+            for rangeset in group:
+                if isinstance(rangeset, BitmapRangeSet):
+                    self._setType(rangeset)     # even if empty: the result of the group is a BitmapRangeSet
+                if rangeset.isempty():
+                    continue
+                self._setType(rangeset)
+                if isinstance(rangeset, SortedRangeSet):
+                    mins.extend(rangeset.mins)
+                    maxs.extend(rangeset.maxs)
+                else:
+                    mins.extend([range.min for range in rangeset.ranges])
+                    maxs.extend([range.max for range in rangeset.ranges])
+            rangecounts[groupid] = len(mins)
+        if self.itemtype == None:
+            (self.itemtype, self.interval) = (int, 1)
+        dtype = (self.itemtype == float) and float or numpy.int64
+        self.groups = numpy.repeat(numpy.arange(self.groupcount), numpy.diff(numpy.concatenate([[0], rangecounts])))
+        # fromiter() is faster than array() for long lists
+        self.mins = numpy.fromiter(mins, dtype=dtype, count=len(mins))
+        self.maxs = numpy.fromiter(maxs, dtype=dtype, count=len(maxs))
+    
+    def _setType(self, rangeset):
+        if (rangeset.itemtype not in [int, long, float]) or not (rangeset.interval > 0):
+            raise ValueError("%s only stores discrete numbers, not %s" % (type(self).__name__, repr(rangeset)))
+        if self.interval == None:
+            (self.itemtype, self.interval) = (rangeset.itemtype, rangeset.interval)
+        elif (rangeset.itemtype == float) != (self.itemtype == float):
+            raise ValueError("All sets in a %s must have the same item type, not %s and %s" % (type(self).__name__, self.itemtype.__name__, rangeset.itemtype.__name__))
+        elif rangeset.interval != self.interval:
+            raise ValueError("All sets in a %s must have the same interval, not %s and %s" % (type(self).__name__, self.interval, rangeset.interval))
+    
+    def _getPositions(self):
+        """Return the arrays with the position of the first item of each range, and the position 
+        after its last item. Position p is the item p * interval."""
+        if self.itemtype == float:
+            starts = numpy.rint(self.mins / self.interval).astype(numpy.int64)
+            ends = numpy.rint(self.maxs / self.interval).astype(numpy.int64) + 1
+        else:
+            starts = self.mins // self.interval
+            ends = self.maxs // self.interval + 1
+        return (starts, ends)
+    
+    def _getDenseRuns(self, starts, ends, base, width, select):
+        """Return the arrays (groups, first positions, last positions) of the runs of positions where 
+        select(coverage, setcounts) is True. The coverage of each group is a row of a dense matrix, 
+        with one column per position from base, which is the cumulative sum of +1 at each start and -1 
+        at each end. The last column has no coverage, so every run ends in the matrix."""
+        size = self.groupcount * width
+        rows = self.groups * width - base
+        deltas = numpy.bincount(rows + starts, minlength=size) - numpy.bincount(rows + ends, minlength=size)
+        coverage = numpy.cumsum(deltas.reshape(self.groupcount, width), axis=1)
+        selected = select(coverage, self.setcounts[:, numpy.newaxis]).astype(numpy.int8)
+        edges = numpy.diff(numpy.hstack([numpy.zeros((self.groupcount, 1), dtype=numpy.int8), selected]), axis=1)
+        (groups, firsts) = numpy.nonzero(edges == 1)
+        lasts = numpy.nonzero(edges == -1)[1] - 1
+        return (groups, firsts + base, lasts + base)
+    
+    def _getSortedRuns(self, starts, ends, select):
+        """Return the same as _getDenseRuns(), by sorting the start and end events of all ranges by 
+        group and position, instead of making a dense matrix. Ends come before starts at the same position."""
+        count = len(starts)
+        positions = numpy.concatenate([starts, ends])
+        deltas = numpy.concatenate([numpy.ones(count, dtype=int), -numpy.ones(count, dtype=int)])
+        groups = numpy.concatenate([self.groups, self.groups])
+        order = numpy.lexsort((deltas, positions, groups))
+        (groups, positions, deltas) = (groups[order], positions[order], deltas[order])
+        # The events of each group add up to 0, so the cumulative sum is the coverage within the group.
+        after = numpy.cumsum(deltas)
+        setcounts = self.setcounts[groups]
+        (selectedbefore, selectedafter) = (select(after - deltas, setcounts), select(after, setcounts))
+        firstindices = numpy.nonzero(selectedafter & ~selectedbefore)[0]
+        lastindices = numpy.nonzero(selectedbefore & ~selectedafter)[0]
+        return (groups[firstindices], positions[firstindices], positions[lastindices] - 1)
+    
+    def _getValues(self, positions, starts, ends, table=None):
+        """Return a list with the item at each of the given positions, which are the first or last 
+        position of a range. table is None, or a tuple (base, array) with the item at each position from base."""
+        if (self.itemtype != float) and (self.interval == 1):
+            return positions.tolist()
+        # Look up the original bounds, rather than multiply, to avoid rounding errors (e.g. 7 * 0.1)
+        if table != None:
+            (base, values) = table
+            return values[positions - base].tolist()
+        (keys, indices) = numpy.unique(numpy.concatenate([starts, ends - 1]), return_index=True)
+        values = numpy.concatenate([self.mins, self.maxs])[indices]
+        return values[numpy.searchsorted(keys, positions)].tolist()
+    
+    def _getRangeSets(self, select):
+        """Return a list with a RangeSet for each group, with the items for which select(coverage, setcounts) 
+        is True, where coverage is the number of sets in the group which contain the item."""
+        if len(self.mins) == 0:
+            (groups, mins, maxs) = (numpy.zeros(0, dtype=int), [], [])
+        else:
+            (starts, ends) = self._getPositions()
+            (base, width) = (starts.min(), int(ends.max() - starts.min()) + 1)
+            if self.groupcount * width <= self.maxcells:
+                (groups, firsts, lasts) = self._getDenseRuns(starts, ends, base, width, select)
+                table = numpy.zeros(width, dtype=self.mins.dtype)
+                table[starts - base] = self.mins
+                table[ends - 1 - base] = self.maxs
+                table = (base, table)
+            else:
+                (groups, firsts, lasts) = self._getSortedRuns(starts, ends, select)
+                table = None
+            mins = self._getValues(firsts, starts, ends, table)
+            maxs = self._getValues(lasts, starts, ends, table)
+        boundaries = numpy.searchsorted(groups, numpy.arange(self.groupcount + 1)).tolist()
+        rangesets = []
+        for groupid in range(self.groupcount):
+            if self.bitmapoffsets[groupid] != None:
+                rangeset = BitmapRangeSet(None, itemtype=self.itemtype, offset=self.bitmapoffsets[groupid])
+            else:
+                rangeset = SortedRangeSet(None, itemtype=self.itemtype, interval=self.interval)
+            (first, last) = (boundaries[groupid], boundaries[groupid+1])
+            if first < last:
+                rangeset._setBounds(zip(mins[first:last], maxs[first:last]))
+            rangesets.append(rangeset)
+        return rangesets
+    
+    def intersection(self):
+        """Return a list with the intersection of the sets of each group. The intersection of an empty group is empty."""
+        return self._getRangeSets(lambda coverage, setcounts: (coverage == setcounts) & (setcounts > 0))
+    
+    def union(self):
+        """Return a list with the union of the sets of each group."""
+        return self._getRangeSets(lambda coverage, setcounts: coverage > 0)
+
+
+def _useIntervalMatrix(groups):
+    """Return True if the groups can be combined with an IntervalMatrix, and it is likely faster."""
+    if numpy == None:
+        return False
+    intervals = set()
+    floats = set()      # True for sets of floats, False for sets of integers
+    allbitmaps = True
+    for group in groups:
+        for rangeset in group:
+            if not isinstance(rangeset, BitmapRangeSet):
+                allbitmaps = False
+                if rangeset.isempty():
+                    continue
+            if (rangeset.itemtype not in [int, long, float]) or not (rangeset.interval > 0):
+                return False
+            intervals.add(rangeset.interval)
+            floats.add(rangeset.itemtype == float)
+    # BitmapRangeSets are faster on their own
+    return (len(intervals) <= 1) and (len(floats) <= 1) and not allbitmaps
+
+def _combine(operation, group):
+    if not group:
+        return RangeSet(None)
+    result = group[0]
+    for rangeset in group[1:]:
+        result = getattr(result, operation)(rangeset)
+    if result is group[0]:
+        result = result.copy()
+    return result
+
+def IntersectAll(groups):
+    """Return a list with the intersection of the RangeSets in each group, given a list of lists of 
+    RangeSets. E.g. given the label sets of all hops in N paths, return the common labels of each path."""
+    if _useIntervalMatrix(groups):
+        return IntervalMatrix(groups).intersection()
+    return [_combine("intersection", group) for group in groups]
+
+def UnionAll(groups):
+    """Return a list with the union of the RangeSets in each group, given a list of lists of RangeSets."""
+    if _useIntervalMatrix(groups):
+        return IntervalMatrix(groups).union()
+    return [_combine("union", group) for group in groups]
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""The pynt.snapshot module keeps immutable views of a topology context, so that a path
+computation can read a consistent topology while a fetcher changes the live objects.
+
+Snapshot:
+    the registered objects of a context and the frozen state of each object, as it was
+    at a given sequence number of the change journal.
+
+ObjectState:
+    the frozen attributes of one object. Lists and ordered sets become tuples, dicts become tuples of
+    (key, value) pairs, label sets are copied (interned label sets are immutable, and shared). Other
+    objects are referenced, not copied.
+
+A new snapshot is built from the previous one, and only refreezes the objects in the
+change journal. The states of the other objects are shared with the previous snapshot.
+
+Readers call GetSnapshot() and keep using the returned snapshot, without any locking.
+Writers should hold the writelock of the context while they make changes that belong
+together, so a snapshot never contains a half-applied change. pynt.input.BaseFetcher.fetch()
+does this for all fetchers. GetSnapshot() does not wait for a writer; see pynt.xmlns.TopologyContext.
+"""
+
+# built-in modules
+import logging
+# local modules
+import pynt.xmlns
+import pynt.elements
+import pynt.rangeset
+
+
+class ObjectState(object):
+    """The frozen attributes of an object. Attributes can be read as obj.attribute, but not changed."""
+    def __init__(self, subject):
+        attributes = {}
+        for (name, value) in _getAttributes(subject):
+            if name not in ignoredattributes:
+                attributes[name] = _freeze(value)
+        object.__setattr__(self, 'attributes', attributes)
+
+    def __getattr__(self, name):
+        try:
+            return self.attributes[name]
+        except KeyError:
+            raise AttributeError("%s has no attribute %s" % (type(self).__name__, name))
+
+    def __setattr__(self, name, value):
+        raise TypeError("%s is immutable" % type(self).__name__)
+
+    def get(self, name, default=None):
+        return self.attributes.get(name, default)
+
+    def getAttributeNames(self):
+        return self.attributes.keys()
+
+
+# attributes which are not part of the state of an object
+ignoredattributes = ['logger', 'uridentifier', 'rdfobject_initfunction_wascalled', 'adjacency', 'adaptationcache',
+        'interfacekeys', 'interfaceset', 'interfacesequence', 'logicalinterfaceset',
+        'version', 'availablecache', 'interfaceindex', 'crossconnects', 'reversecrossconnects', 'labelindex',
+        'pendingcrossconnects']
+
+def _getAttributes(subject):
+    """Return the (name, value) pairs of the instance attributes of subject, in __dict__ or __slots__."""
+    attributes = getattr(subject, '__dict__', {}).items()
+    for klass in type(subject).__mro__:
+        for name in klass.__dict__.get('__slots__', ()):
+            if (name not in ('__dict__', '__weakref__')) and hasattr(subject, name):
+                attributes.append((name, getattr(subject, name)))
+    return attributes
+
+def _freeze(value):
+    """Return an immutable copy of value. RDF objects, layers and other shared objects are not copied."""
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple([_freeze(item) for item in value])
+    elif isinstance(value, dict):
+        return tuple([(key, _freeze(item)) for (key, item) in value.iteritems()])
+    elif isinstance(value, pynt.elements.OrderedSet):
+        return tuple([_freeze(item) for item in value.getView()])
+    elif isinstance(value, pynt.rangeset.InternedRangeSetMixIn):
+        return value    # immutable
+    elif isinstance(value, pynt.rangeset.RangeSet):
+        return value.copy()
+    elif isinstance(value, pynt.elements.Adaptation):
+        # Adaptations are owned by the interfaces, and changed with them
+        return ObjectState(value)
+    return value
+
+
+class Snapshot(object):
+    """Immutable view of the objects in a topology context at a given sequence number of its
+    change journal. The states are stored in chunks of objects with nearby objectids, so that
+    a new snapshot only has to copy the chunks with changed objects."""
+    context         = None  # TopologyContext of this snapshot
+    sequence        = 0     # int, sequence number of the last change in the journal that is included
+    generation      = 0     # int, generation of the context at the time of the snapshot
+    chunks          = None  # dict, sorted by objectid / chunksize, pointing to a dict objectid -> (rdfobject, ObjectState)
+    objectlists     = None  # cache: dict, sorted by class, pointing to the sorted list of objects of that class
+    chunksize       = 256
+
+    def __init__(self, context, sequence, generation, chunks):
+        self.context = context
+        self.sequence = sequence
+        self.generation = generation
+        self.chunks = chunks
+        self.objectlists = {}
+
+    def __str__(self):
+        return '<%s %s at %d>' % (type(self).__name__, self.context.getName(), self.sequence)
+    def __repr__(self):
+        return '<%s %s at %d>' % (type(self).__name__, self.context.getName(), self.sequence)
+
+    def getContext(self):                           return self.context
+    def getSequence(self):                          return self.sequence
+    def getGeneration(self):                        return self.generation
+
+    def hasObject(self, rdfobject):
+        chunk = self.chunks.get(rdfobject.getObjectId() // self.chunksize)
+        return (chunk != None) and (rdfobject.getObjectId() in chunk)
+
+    def getState(self, rdfobject):
+        """Return the ObjectState of the given object. Raises an UndefinedNamespaceException if
+        the object was not registered at the time of the snapshot."""
+        chunk = self.chunks.get(rdfobject.getObjectId() // self.chunksize)
+        if (chunk == None) or (rdfobject.getObjectId() not in chunk):
+            raise pynt.xmlns.UndefinedNamespaceException("%s %s is not part of %s" % (type(rdfobject).__name__, rdfobject.getURIdentifier(), self))
+        return chunk[rdfobject.getObjectId()][1]
+
+    def getAttribute(self, rdfobject, name):
+        return getattr(self.getState(rdfobject), name)
+
+    def getObjects(self, klass=pynt.xmlns.RDFObject):
+        """Return a list of all objects of the given class (including subclasses) in the snapshot,
+        sorted by rdfObjectKey. Don't modify the list."""
+        objectlist = self.objectlists.get(klass)
+        if objectlist == None:
+            objectlist = []
+            for chunk in self.chunks.itervalues():
+                objectlist.extend([rdfobject for (rdfobject, state) in chunk.itervalues() if isinstance(rdfobject, klass)])
+            objectlist.sort(key=pynt.xmlns.rdfObjectKey)
+            self.objectlists[klass] = objectlist
+        return objectlist
+
+    def getObjectCount(self):
+        return sum([len(chunk) for chunk in self.chunks.itervalues()])
+
+
+def _freezeObjects(chunks, rdfobjects, chunksize):
+    """Store the state of the given objects in chunks, which is modified."""
+    for rdfobject in rdfobjects:
+        chunks.setdefault(rdfobject.getObjectId() // chunksize, {})[rdfobject.getObjectId()] = (rdfobject, ObjectState(rdfobject))
+
+def _isRegistered(rdfobject):
+    namespace = rdfobject.getNamespace()
+    return (namespace != None) and (namespace.elements.get(rdfobject.getIdentifier()) is rdfobject)
+
+def TakeSnapshot(context=None, previous=None, wait=True):
+    """Return a new Snapshot of the given (or else the active) context. If a previous snapshot
+    is given, only the objects which changed since are frozen again; the others are shared.
+    If wait is False and another thread holds the writelock, the previous snapshot is returned."""
+    context = pynt.xmlns.GetActiveContext(context)
+    logger = logging.getLogger("pynt.snapshot")
+    journal = context.getJournal()
+    chunksize = Snapshot.chunksize
+    if wait or (previous == None) or (previous.context is not context):
+        context.writelock.acquire()
+    elif not context.writelock.acquire(False):
+        logger.debug("Writelock of %s is busy; returning the snapshot at %d" % (context, previous.sequence))
+        return previous
+    try:
+        sequence = journal.getSequence()
+        changes = None
+        if (previous != None) and (previous.context is context):
+            try:
+                changes = journal.getChanges(previous.sequence)
+            except pynt.xmlns.ChangesUnavailableException:
+                changes = None
+        if changes != None and [change for change in changes if change[1] == None]:
+            changes = None  # a change of the whole registry, like a "deleteAll"
+        if changes == None:
+            chunks = {}
+            _freezeObjects(chunks, pynt.xmlns.GetAllRDFObjects(context=context), chunksize)
+            logger.debug("Took full snapshot of %s at %d" % (context, sequence))
+        else:
+            changed = {}    # dict objectid -> rdfobject
+            for (changesequence, subject, change, value) in changes:
+                changed[subject.getObjectId()] = subject
+                if isinstance(value, (pynt.xmlns.RDFObject, pynt.xmlns.CollectedRDFObject)):
+                    changed[value.getObjectId()] = value
+            # copy the top level, and only those chunks which contain a changed object
+            chunks = previous.chunks.copy()
+            for chunkno in set([objectid // chunksize for objectid in changed]):
+                if chunkno in chunks:
+                    chunks[chunkno] = chunks[chunkno].copy()
+            for rdfobject in changed.itervalues():
+                chunk = chunks.get(rdfobject.getObjectId() // chunksize)
+                if chunk and not _isRegistered(rdfobject):
+                    chunk.pop(rdfobject.getObjectId(), None)
+            _freezeObjects(chunks, [rdfobject for rdfobject in changed.itervalues() if _isRegistered(rdfobject)], chunksize)
+            logger.debug("Took snapshot of %s at %d with %d changed objects" % (context, sequence, len(changed)))
+        return Snapshot(context, sequence, context.getGeneration(), chunks)
+    finally:
+        context.writelock.release()
+
+def GetSnapshot(context=None):
+    """Return the latest snapshot of the given (or else the active) context. A new snapshot is
+    only taken if the context has changed since the last one, and no other thread holds the 
+    writelock. This function is thread-safe."""
+    context = pynt.xmlns.GetActiveContext(context)
+    snapshot = context.snapshot
+    if (snapshot == None) or (snapshot.sequence != context.getJournal().getSequence()):
+        snapshot = TakeSnapshot(context, previous=snapshot, wait=False)
+        context.snapshot = snapshot
+    return snapshot
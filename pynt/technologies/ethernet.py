@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 """The ethernet module defines a few Ethernet specific network element classes: EthernetDevice, EthernetInterface and Vlan"""
 
+# built-in modules
+import types
 # local modules
 import pynt.elements
 import pynt.layers
 import pynt.xmlns
+import pynt.rangeset
 import pynt.technologies.ip
 
 # ns and layers variables and GetCreateWellKnownAdaptationFunction() functions are always present in the pynt.technologies.* files.
@@ -75,7 +78,10 @@ class EthernetInterface(pynt.elements.Interface):
     linespeed           = None  # float or None (unknown) = capacity?
     egressbandwidth     = None  # float or None (unknown) -> layer egress Property
     ingressbandwidth    = None  # float or None (unknown) -> layer ingress Property
-    tagged_vlanids      = None  # None or list of ints -> client MultiplexInterfaces
+    tagged_vlanids      = None  # None or RangeSet of ints -> client MultiplexInterfaces, created on first use
+    taggedinterfaces    = None  # dict vlanid -> client interface, for the tagged VLANs which are created
+    potentialtagged     = None  # PotentialMuxInterface with the tagged VLANs which are not created yet (or None)
+    potentialstale      = False # True if the labels of potentialtagged must be updated from tagged_vlanids
     
     def __init__(self, *args, **params):
         pynt.elements.Interface.__init__(self, *args, **params)
@@ -160,7 +166,17 @@ class EthernetInterface(pynt.elements.Interface):
             return None
         else:
             return self.internallabel
-    def getTaggedVLANids(self):                     return self.tagged_vlanids
+    def getTaggedVLANids(self):
+        """Return a sorted list of the tagged VLAN ids, or None if the interface is not tagged."""
+        if self.tagged_vlanids == None:
+            return None
+        vlanids = []
+        for vlanrange in self.tagged_vlanids:
+            vlanids.extend(range(vlanrange.min, vlanrange.max + 1))
+        return vlanids
+    def getTaggedVLANRangeSet(self):                return self.tagged_vlanids
+    def hasTaggedVLANid(self, vlanid):
+        return (self.tagged_vlanids != None) and (int(vlanid) in self.tagged_vlanids)
     def getMTU(self):                               return self.mtu
     def getMACaddress(self):                        return self.MACaddress
     def getLineSpeed(self):                         return self.linespeed
@@ -182,17 +198,25 @@ class EthernetInterface(pynt.elements.Interface):
     
     def addTaggedVLANid(self,vlanid):
         if (None == self.tagged_vlanids):
-            self.tagged_vlanids = []
-        self.tagged_vlanids.append(vlanid)
+            self.tagged_vlanids = pynt.rangeset.SortedRangeSet(None, itemtype=int, interval=1)
+        self.tagged_vlanids.add(int(vlanid))
+        self.potentialstale = True
+        self.resetAdaptationCache()    # the client interfaces change
+        self.recordChange("addTaggedVLANid", None)
     
     def setTaggedVLANids(self,vlanidlist):
         if vlanidlist == None:
             self.tagged_vlanids = None
+        elif isinstance(vlanidlist, pynt.rangeset.RangeSet):
+            self.tagged_vlanids = pynt.rangeset.SortedRangeSet(vlanidlist, itemtype=int, interval=1)
         elif type(vlanidlist) == types.ListType:
-            self.tagged_vlanids = vlanidlist
+            self.tagged_vlanids = pynt.rangeset.SortedRangeSet.FromItems([int(vlanid) for vlanid in vlanidlist])
         else:
             raise TypeError ("Ignoring setTaggedVLANids(list) as the argument is a %s instead of a list" % str(type(vlanidlist)))
-            self.tagged_vlanids = []
+        self.taggedinterfaces = None
+        self.potentialstale = True
+        self.resetAdaptationCache()
+        self.recordChange("setTaggedVLANids", None)
     
     def setUntaggedInterface(self, vlanid):
         """Assigns the given vlanid to an internal list, returning the current interface.
@@ -208,20 +232,105 @@ class EthernetInterface(pynt.elements.Interface):
     
     def addTaggedInterface(self, vlanid):
         """Assigns the interface to the given VLAN id, returning the created internal client interface."""
+        self.addTaggedVLAN(vlanid)
+        return self.getCreateTaggedInterface(vlanid)
+    
+    def addTaggedVLAN(self, vlanid):
+        """Assigns the interface to the given VLAN id, without creating the internal client interface. 
+        It is created by getCreateTaggedInterface() when the VLAN is used. Until then, the VLAN is 
+        one of the labels of the potential client interface."""
         if self.getUntaggedVLANid() != None:
             self.createUntaggedClientInterface() # raises an exception
         self.addTaggedVLANid(vlanid)
-        logicalinterface = self.getTaggedInterface(vlanid)
-        if not logicalinterface:
-            # Doesn't exist. Create subinterface.
-            logicalinterface = self.createTaggedClientInterface(vlanid)
-            adaptation = GetCreateWellKnownAdaptationFunction("Tagged-Ethernet")
+    
+    def getCreateTaggedInterface(self, vlanid):
+        """Return the internal client interface of the given tagged VLAN id, creating it if it does not exist yet."""
+        vlanid = int(vlanid)
+        if not self.hasTaggedVLANid(vlanid):
+            raise pynt.ConsistencyException("Interface %s is not tagged with VLAN %d." % (self.getName(), vlanid))
+        logicalinterface = self.getCreatedTaggedInterfaces().get(vlanid)
+        if logicalinterface:
+            return logicalinterface
+        # Doesn't exist. Create subinterface.
+        logicalinterface = self.createTaggedClientInterface(vlanid)
+        adaptation = GetCreateWellKnownAdaptationFunction("Tagged-Ethernet")
         self.addClientInterface(logicalinterface, adaptation)
         # TODO: check if MAC address is set, and if so, add clientinterface to 
         # the logicalinterface
         # logicalinterface.addMACInterface()
+        self.taggedinterfaces[vlanid] = logicalinterface
+        self.potentialstale = True
         return logicalinterface
     
+    def getCreatedTaggedInterfaces(self):
+        """Return a dict vlanid -> internal client interface, for the tagged VLANs which are created."""
+        if self.taggedinterfaces == None:
+            # Client interfaces may have been added before, e.g. by an input module.
+            self.taggedinterfaces = {}
+            if self.tagged_vlanids != None:
+                for interface in pynt.elements.Interface.getClientInterfaces(self):
+                    if interface.getEgressLabel() in self.tagged_vlanids:
+                        self.taggedinterfaces[interface.getEgressLabel()] = interface
+        return self.taggedinterfaces
+    
+    def hasUncreatedTaggedInterfaces(self):
+        """Return True if there are tagged VLANs without an internal client interface."""
+        if self.tagged_vlanids == None:
+            return False
+        return len(self.getCreatedTaggedInterfaces()) < len(self.tagged_vlanids)
+    
+    def createTaggedInterfaces(self):
+        """Create the internal client interfaces of all tagged VLANs, if they do not exist yet."""
+        if self.hasUncreatedTaggedInterfaces():
+            for vlanid in self.getTaggedVLANids():
+                self.getCreateTaggedInterface(vlanid)
+    
+    def getPotentialTaggedInterface(self):
+        """Return the potential client interface, whose labels are the tagged VLANs without an internal 
+        client interface, or None if there are no such VLANs."""
+        if self.potentialstale:
+            self.updatePotentialTaggedInterface()
+        if self.hasUncreatedTaggedInterfaces():
+            return self.potentialtagged
+        return None
+    
+    def updatePotentialTaggedInterface(self):
+        """Set the labels of the potential client interface to the tagged VLANs without an internal 
+        client interface. Creates the potential interface the first time, and removes it from the 
+        adaptation if all VLANs are created."""
+        self.potentialstale = False
+        adaptationfunction = GetCreateWellKnownAdaptationFunction("Tagged-Ethernet")
+        attached = (self.potentialtagged != None) and (adaptationfunction in self.potentialtagged.serveradaptations)
+        if not self.hasUncreatedTaggedInterfaces():
+            if attached:
+                self.removeClientInterface(self.potentialtagged, adaptationfunction)
+            return
+        created = pynt.rangeset.SortedRangeSet.FromItems(self.getCreatedTaggedInterfaces().keys())
+        labels = self.tagged_vlanids.difference(created)
+        if self.potentialtagged == None:
+            self.potentialtagged = self.getCreateAdaptationInterface(pynt.elements.PotentialMuxInterface, \
+                    identifier=self.getIdentifier() + ":vlans", name=self.getName() + " vlans")
+            self.potentialtagged.setLayer(self.getLayer())
+        self.potentialtagged.setLabelSet(labels)
+        if not attached:
+            self.addClientInterface(self.potentialtagged, adaptationfunction)
+    
+    # The client interfaces of tagged VLANs are only created when a specific VLAN is used. The other 
+    # tagged VLANs are the labels of one potential client interface, which is created when the client 
+    # interfaces are first requested. Note that getClientInterfaces() only returns the created ones.
+    def getClientAdaptationFunction(self):
+        potential = self.getPotentialTaggedInterface()
+        for (adaptationfunction, adaptation) in self.clientadaptations.items():
+            if potential and (adaptation.getPotentialClientInterface() == potential):
+                return adaptationfunction
+        return pynt.elements.Interface.getClientAdaptationFunction(self)
+    def getAllClientTuples(self):
+        self.getPotentialTaggedInterface()
+        return pynt.elements.Interface.getAllClientTuples(self)
+    def getPotentialClientTuples(self):
+        self.getPotentialTaggedInterface()
+        return pynt.elements.Interface.getPotentialClientTuples(self)
+    
     def createUntaggedClientInterface(self):
         """Create an internal client interface in the current untagged_vlan. Keep the untagged_vlanid value, 
         but removes the current interface from the VLAN, and adds the client interface to the VLAN."""
@@ -249,11 +358,10 @@ class EthernetInterface(pynt.elements.Interface):
     
     # Function is a bit obsolete, but still used a couple of times, so we keep it
     def getTaggedInterface(self,vlanid):
-        """Returns the logical interface with the given tag. Returns None if it does not exist"""
-        for interface in self.getClientInterfaces():
-            if interface.getInternalLabel() == vlanid:
-                return interface
-        return None
+        """Returns the logical interface with the given tag. Returns None if the interface is not tagged with vlanid"""
+        if not self.hasTaggedVLANid(vlanid):
+            return None
+        return self.getCreateTaggedInterface(vlanid)
     
     def getTaggedIdentifier(self,vlanid):
         return self.getIdentifier() + ":vlan" + str(vlanid)
@@ -297,6 +405,7 @@ class Vlan(pynt.xmlns.RDFObject):
     "VLAN entry: (number, ports, active)"
     vlanid              = 0     # int
     interfaces          = None  # None  # list (set in __init__) all (logical) interfaces in this VLAN
+    taggedports         = None  # list (set in __init__) tagged interfaces, whose client interface in this VLAN is not created yet
     adminstatus         = None  # string "up" or "down" or None (unknown)
     
     def __init__(self, identifier, namespace, vlanid):
@@ -305,6 +414,7 @@ class Vlan(pynt.xmlns.RDFObject):
         pynt.xmlns.RDFObject.__init__(self, identifier=identifier, namespace=namespace)
         self.setVlanId(vlanid)
         self.interfaces = []
+        self.taggedports = []
     
     def setVlanId(self,vlanid):
         self.vlanid         = int(vlanid)
@@ -327,18 +437,31 @@ class Vlan(pynt.xmlns.RDFObject):
             self.interfaces = []
     
     def getAdminStatus(self):                       return self.adminstatus
-    def getAllPorts(self):                          return self.interfaces
+    def getAllPorts(self):
+        self.createTaggedInterfaces()
+        return self.interfaces
     
     def addInterface(self,interface):
         if interface not in self.interfaces:
             self.interfaces.append(interface)
     
+    def addTaggedPort(self,interface):
+        """Add a tagged interface to this VLAN. Its client interface in this VLAN is created when the 
+        interfaces of the VLAN are requested."""
+        if interface not in self.taggedports:
+            self.taggedports.append(interface)
+    
+    def createTaggedInterfaces(self):
+        for interface in self.taggedports:
+            self.addInterface(interface.getCreateTaggedInterface(self.vlanid))
+        self.taggedports = []
+    
     def getOtherPorts(self, curinterface=None):
         """returns a list of all interface in of this VLAN, excluding the given interface"""
         # Please note: we create a NEW LIST with all the elements of self.identifiers.
         # This is different from "identifiers = self.identifiers" which really creates a shallow copy
         # (only copies the pointer to the list). Since we delete an element in the list, it MUST NOT be shallow
-        interfaces = self.interfaces[:]
+        interfaces = self.getAllPorts()[:]
         try:
             interfaces.remove(curinterface)
         except ValueError:
@@ -395,6 +518,13 @@ class EthernetDevice(pynt.elements.Device):
         """return all vlan objects"""
         return self.vlans
     
+    def getLogicalInterfaces(self, ordered=False):
+        # update the potential client interfaces of tagged VLANs first
+        for interface in self.getNativeInterfaces():
+            if isinstance(interface, EthernetInterface):
+                interface.getPotentialTaggedInterface()
+        return pynt.elements.Device.getLogicalInterfaces(self, ordered=ordered)
+    
     # Note: this model does not support combination of tagged and untagged VLANs at the same
     # interface. If we want to support it, all "untagged" data should be represented as a channel
     # (an internal client interface to be exact), just like each tagged data.
@@ -420,11 +550,11 @@ class EthernetDevice(pynt.elements.Device):
     
     def AddTaggedInterface(self, vlan, interface):
         """Assigns an interface to a VLAN, and add the tagged VLAN as an internal client interface to the interface
-        Produces a warning if interface is already untagged"""
+        Produces a warning if interface is already untagged. The client interface is only created when it is used."""
         if None != interface.getUntaggedVLANid():
             raise pynt.ConsistencyException ("Interface %s is both tagged (VLANs %s) as well as untagged (VLAN %s). This is not supported by the model." % (interface.getName(),  vlan.getVlanId(), interface.getUntaggedVLANid()))
-        logicalinterface = interface.addTaggedInterface(vlan.getVlanId())
-        vlan.addInterface(logicalinterface)
+        interface.addTaggedVLAN(vlan.getVlanId())
+        vlan.addTaggedPort(interface)
     
     def getSwitchMatrix(self, layer=None):
         if layer == None:
@@ -88,7 +88,6 @@ class FiberInterface(pynt.elements.Interface):
     transceiver         = None  # string or None
     egresspower         = None  # float (transmitted power level in dBm, with 0 dBm = 1 mWatt) or None (unknown)
     ingresspower        = None  # float (received power level in dBm, with 0 dBm = 1 mWatt) or None (unknown)
-    device              = None
     def __init__(self, *args, **params):
         pynt.elements.Interface.__init__(self, *args, **params)
         self.layer          = GetLayer('fiber')
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 """
 A helper module for XML stuff, handling identifiers, namespaces, and prefixes.
-xmlns keeps a global repository of all RDFObject instances (e.g. Devices, Interfaces)
+xmlns keeps a repository of all RDFObject instances (e.g. Devices, Interfaces)
 and makes sure the namespace + identifier combination is unique. The module is thread-safe,
 as long as RDFObject (or their subclasses) are never directly created, but only 
 using the functions GetRDFObjcet, GetCreateRDFObject, CreateObject and GetCreateNamespace.
+The repository is kept in a TopologyContext. Each namespace belongs to one context, and 
+each RDFObject belongs to the context of its namespace. By default, everything is stored
+in the global default context. Use "with context:" or SetActiveContext() to work in another.
 """
 
 # built-in modules
@@ -12,11 +15,17 @@ import types
 import re
 import threading    # for lock object for thread safety
 import logging
-import time
+import bisect       # for sorted object indexes
+import heapq        # for merging sorted object indexes
+import itertools
+import weakref      # for collection of unreferenced objects
+import collections  # for the change journal
+import gc
 # import sys          # for sys.referencecount()
 # import distutils.version
 # local modules
 import pynt
+import pynt.logger
 
 
 # This file should explicitly does not depend on the rdflib.* classes.
@@ -36,14 +45,19 @@ class DuplicateNamespaceException(Exception):
     pass
 
 
+class ChangesUnavailableException(Exception):
+    "Raised when changes are requested which are no longer in the change journal"
+    pass
+
+
 # global lock object for this module, shared among all threads.
-# object creation
+# used for namespace creation and for updates of the object indexes
 threadlock = threading.Lock()
 logger = logging.getLogger("pynt.xmlns")
 logger.debug("Created global lock object %s" % threadlock)
 
 
-def splitURI(uri):
+def splitURI(uri, context=None):
     """Split the URI of a subject into a namespace and a identifier part"""
     pos = uri.rfind('#')
     if pos >= 0:
@@ -59,23 +73,287 @@ def splitURI(uri):
         # else:
         #     base = uri
         #     identifier = ""
-    namespace = GetCreateNamespace(base)
+    namespace = GetCreateNamespace(base, context=context)
     return (namespace,identifier)
 
 
-# singleton design pattern
+class ChangeJournal(object):
+    """Journal of all changes in a topology context. Each change is a tuple (sequence, subject, 
+    change, value), with subject the changed object, change the name of the mutator (e.g. 
+    "addSwitchedInterface") and value its argument, if any. Consumers can read all changes after 
+    a given sequence number with getChanges(), or subscribe a function, which is called with 
+    each new change. Only the last maxlength changes are kept."""
+    sequence        = 0     # int, sequence number of the last change
+    changes         = None  # deque of the last change tuples (set in __init__)
+    subscribers     = None  # list of functions, called with each new change tuple (set in __init__)
+    lock            = None  # lock for sequence and changes (set in __init__)
+    
+    def __init__(self, maxlength=100000):
+        self.changes = collections.deque(maxlen=maxlength)
+        self.subscribers = []
+        self.lock = threading.Lock()
+    
+    def __getstate__(self):
+        # locks can't be pickled, and subscribers are local to this process.
+        # The changes are not stored either: they may refer to objects which are no longer in the registry.
+        state = self.__dict__.copy()
+        del state['lock']
+        state['subscribers'] = []
+        state['changes'] = collections.deque(maxlen=self.changes.maxlen)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+    
+    def getSequence(self):                          return self.sequence
+    
+    def record(self, subject, change, value=None):
+        """Append a change to the journal, and notify the subscribers. Returns the sequence number."""
+        self.lock.acquire()
+        try:
+            self.sequence += 1
+            entry = (self.sequence, subject, change, value)
+            self.changes.append(entry)
+        finally:
+            self.lock.release()
+        for subscriber in self.subscribers[:]:
+            subscriber(entry)
+        return entry[0]
+    
+    def getChanges(self, since=0):
+        """Return a list of all changes with a sequence number higher than since. Raises a 
+        ChangesUnavailableException if some of these changes are no longer in the journal; 
+        the consumer should then start from scratch and continue from getSequence()."""
+        self.lock.acquire()
+        try:
+            first = self.sequence - len(self.changes)  # sequence number of the last dropped change
+            if since < first:
+                raise ChangesUnavailableException("Changes after %d are no longer available; the journal starts after %d" % (since, first))
+            return list(itertools.islice(self.changes, since - first, None))
+        finally:
+            self.lock.release()
+    
+    def truncate(self):
+        """Drop all changes, so they no longer refer to any objects. Readers who did not yet read 
+        all changes get a ChangesUnavailableException."""
+        self.lock.acquire()
+        try:
+            self.changes.clear()
+        finally:
+            self.lock.release()
+    
+    def replaceObjects(self, replacements):
+        """Replace the subject and value of each change which are a key in replacements, a dict 
+        id(object) -> (object, replacement). Used to drop the references to collected objects."""
+        def replace(item):
+            if (id(item) in replacements) and (replacements[id(item)][0] is item):
+                return replacements[id(item)][1]
+            return item
+        if not replacements:
+            return
+        self.lock.acquire()
+        try:
+            self.changes = collections.deque([(sequence, replace(subject), change, replace(value)) \
+                    for (sequence, subject, change, value) in self.changes], maxlen=self.changes.maxlen)
+        finally:
+            self.lock.release()
+    
+    def subscribe(self, subscriber):
+        if subscriber not in self.subscribers:
+            self.subscribers.append(subscriber)
+    
+    def unsubscribe(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+
+# singleton design pattern, per topology context
+
+class TopologyContext(object):
+    """Registry of all namespaces and RDF objects of one topology. Multiple contexts can exist 
+    side by side, e.g. for the current and a proposed topology. Within a context, there can be 
+    only one RDF Object with a given namespace URI and identifier.
+    A context can be used as context manager: "with context:" makes it the active context of 
+    the current thread.
+    Writers hold the writelock while they make changes that belong together, like a fetch or 
+    a Transaction. The views derived from a context (the snapshot, compiled graph and capacity 
+    store) do not wait for it: while another thread holds the writelock, the last view is used 
+    instead of an updated one. Only the first view of a context waits for the writelock."""
+    name            = ""    # string, only used for display
+    rdfobjects      = None  # dict, sorted by class, pointing to a list of RDF objects of that class, ordered by rdfObjectKey
+    rdfobjectkeys   = None  # dict, sorted by class, pointing to the rdfObjectKey of each object in rdfobjects[class]
+    rdfsubclasses   = None  # cache: dict, sorted by class, pointing to the list of classes in rdfobjects which are a subclass
+    xmlnamespaces   = None  # dict, sorted by URI, pointing to a XMLNamespace
+    generation      = 0     # int, current generation. Objects created or retrieved are marked with the current generation.
+    journal         = None  # ChangeJournal of all changes in this context (set in __init__)
+    writelock       = None  # RLock held by writers while they make related changes (set in __init__)
+    snapshot        = None  # latest pynt.snapshot.Snapshot of this context
+    capacitystore   = None  # pynt.capacity.CapacityStore of this context, if it is used
+    compiledgraph   = None  # latest pynt.graph.CompiledGraph of this context, if it is used
+    adaptationversion = 0   # int, incremented by each change of an adaptation; see pynt.elements.ConnectionPoint.getClientStack()
+    
+    def __init__(self, name=""):
+        self.name = name
+        self.rdfobjects = {}
+        self.rdfobjectkeys = {}
+        self.rdfsubclasses = {}
+        self.xmlnamespaces = {}
+        self.journal = ChangeJournal()
+        self.writelock = threading.RLock()
+    
+    def __str__(self):
+        return '<%s %s>' % (type(self).__name__, self.name)
+    def __repr__(self):
+        return '<%s %s>' % (type(self).__name__, self.name)
+    
+    def __getstate__(self):
+        # The lock, snapshot, capacity store and compiled graph are not stored in a pickle.
+        state = self.__dict__.copy()
+        state.pop('writelock', None)
+        state.pop('snapshot', None)
+        state.pop('capacitystore', None)
+        state.pop('compiledgraph', None)
+        return state
+    
+    def __setstate__(self, state):
+        state.pop('previouscontexts', None)    # stored by older versions
+        self.__dict__.update(state)
+        self.writelock = threading.RLock()
+    
+    def __enter__(self):
+        # The stack of previous contexts is local to the thread, as two threads may enter the same context.
+        _getPreviousContexts().append(SetActiveContext(self))
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        SetActiveContext(_getPreviousContexts().pop())
+        return False
+    
+    def getName(self):                              return self.name
+    def getGeneration(self):                        return self.generation
+    def getJournal(self):                           return self.journal
+    
+    def newGeneration(self):
+        """Start a new generation, e.g. before a new poll of the network. Returns the new generation number.
+        Objects which are not created or retrieved in the new generation can be removed with CollectRDFObjects()"""
+        self.generation += 1
+        return self.generation
+
+
+defaultcontext = TopologyContext("default")
+localcontext = threading.local()    # localcontext.context is the active context of a thread, if not the default context
+# localcontext.previouscontexts is the list of contexts that were active before each "with context:" of a thread
+
+def _getPreviousContexts():
+    previouscontexts = getattr(localcontext, 'previouscontexts', None)
+    if previouscontexts == None:
+        previouscontexts = localcontext.previouscontexts = []
+    return previouscontexts
+
+def GetActiveContext(context=None):
+    """Return the given context, or if it is None, the active context of the current thread."""
+    if context != None:
+        return context
+    return getattr(localcontext, 'context', None) or defaultcontext
+
+def SetActiveContext(context):
+    """Make the given context the active context of the current thread. 
+    None makes the default context active again. Returns the previous active context."""
+    assert(isinstance(context, (types.NoneType, TopologyContext)))
+    previous = getattr(localcontext, 'context', None)
+    localcontext.context = context
+    return previous
+
+def GetDefaultContext():
+    return defaultcontext
+
+def GetChangeJournal(context=None):
+    """Return the change journal of the given (or else the active) context."""
+    return GetActiveContext(context).journal
+
+objectids = itertools.count(1) # generator of unique integer ids for RDF objects
+pendingobjects = {} # dict, sorted by (namespace, identifier), pointing to a threading.Event which is set once the object is created
+
+# striped locks for object creation. The same namespace+identifier always maps to the same lock.
+creationlocks = [threading.Lock() for i in range(64)]
+
+def _getCreationLock(namespace, identifier):
+    return creationlocks[hash((namespace.uri, identifier)) % len(creationlocks)]
+
+def _isClaimed(namespace, identifier):
+    """Return True if the object exists, or an other thread is creating it."""
+    return (identifier in namespace.elements) or ((namespace, identifier) in pendingobjects)
+
+def _waitForRDFObject(namespace, identifier, timeout=10.0):
+    """Wait till another thread finished creation of the given object, and return it."""
+    logger.debug("Wait for other thread to create object %s in namespacce %s", identifier, namespace.getURI())
+    created = pendingobjects.get((namespace, identifier))
+    if created != None:
+        created.wait(timeout)
+        if not created.isSet():
+            raise DuplicateNamespaceException("An other thread claims to create object %s in namespace %s, but after %d seconds, it still doesn't exist." % (identifier, namespace.getURI(), timeout))
+    xmlobject = namespace.elements.get(identifier)
+    if xmlobject is None:
+        raise DuplicateNamespaceException("An other thread failed to create object %s in namespace %s." % (identifier, namespace.getURI()))
+    logger.debug("Got newly created object %s in namespace %s", identifier, namespace.getURI())
+    return xmlobject
+
+
+class EmptyList(list):
+    """Empty list which can not be changed. Shared by all objects as the default of a rarely
+    used list, so that an object only allocates its own list when the first item is added."""
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("%s can not be changed. Use RDFObject.getOwnContainer() first." % type(self).__name__)
+    append = extend = insert = remove = pop = sort = reverse = _readonly
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = __iadd__ = __imul__ = _readonly
+    def __reduce__(self):
+        return 'emptylist'  # pickle and copy as the shared instance
+
+
+class EmptyDict(dict):
+    """Empty dict which can not be changed. Shared by all objects as the default of a rarely
+    used dict, so that an object only allocates its own dict when the first item is added."""
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("%s can not be changed. Use RDFObject.getOwnContainer() first." % type(self).__name__)
+    update = setdefault = pop = popitem = clear = __setitem__ = __delitem__ = _readonly
+    def __reduce__(self):
+        return 'emptydict'  # pickle and copy as the shared instance
+
+
+emptylist = EmptyList()
+emptydict = EmptyDict()
 
-rdfobjects = {}     # dict, sorted by class, pointing to a list of RDF objects of that class
+
+def _constructRDFObject(klass, identifier, namespace, *args, **kwargs):
+    """Create a new object of the given class, and call __init__. Does not register the object."""
+    xmlobject = object.__new__(klass)
+    xmlobject.__init__(identifier, namespace, *args, **kwargs)
+    if not hasattr(xmlobject, 'rdfobject_initfunction_wascalled'):
+        raise pynt.ConsistencyException("The __init__ function of %s did not call the parent __init__ function in RDFObject" % (klass.__name__))
+    del xmlobject.rdfobject_initfunction_wascalled
+    return xmlobject
 
 
 class RDFObject(object):
     """XML/RDF object, identified by a namespace+identifier"""
-    identifier          = ""    # string, MUST be non empty (set in __init__); local to namespace
-    name                = ""    # string, with rdfs:label
-    namespace           = None  # namespace object; MUST be non empty (set in __init__)
-    description         = ""    # string
-    sources             = None  # list of seeAlso URIs
-    
+    # The attributes are slots, set in __init__, to save memory for the millions of objects in large
+    # topologies. Subclasses may still use other attributes; their __dict__ is only allocated on first use.
+    # A subclass with its own __slots__ MUST NOT define a class attribute with the name of a slot.
+    __slots__ = (
+        'identifier',       # string, MUST be non empty; local to namespace
+        'name',             # string, with rdfs:label
+        'namespace',        # namespace object; MUST be non empty
+        'description',      # string
+        'sources',          # list of seeAlso URIs (emptylist until the first is attached)
+        'rdfProperties',    # dict (emptydict until the first is added)
+        'generation',       # int, generation of the context when the object was last created or retrieved
+        'objectid',         # int, unique within this process. Use as key in tables instead of the object itself
+        'uridentifier',     # cache of getURIdentifier(). Reset if the identifier or namespace changes.
+        'rdfobject_initfunction_wascalled',
+        '__dict__', '__weakref__',
+    )
+
     class __metaclass__(type):
         def __call__(cls, *args, **kwargs):
             # override the metaclass to only call __new__ (default is __new__ and __init__)
@@ -88,53 +366,55 @@ class RDFObject(object):
         assert(isinstance(namespace, XMLNamespace))
         identifier = UTF8(identifier)
         if identifier not in namespace.elements:
-            logger = logging.getLogger("pynt.xmlns")
-            logger.debug("Creating %s object %s in namespace %s" % (klass.__name__, identifier, namespace.getURI()))
-            global threadlock
+            trace = pynt.logger.IsTracing(logger, logging.INFO)
+            if trace:
+                logger.debug("Creating %s object %s in namespace %s", klass.__name__, identifier, namespace.getURI())
             # we do the thread-safe part in two stages:
-            # first we do a quick global lock, and create a "lock" for this object only
-            # we then release the global lock, and create the new object using the object-specific lock.
-            # start global lock (only called if identifier did not exist, so not too often)
-            threadlock.acquire()
-            # check if it still doesn't exist (another thread may have created it in the last few miliseconds)
-            if identifier not in namespace.elements:
-                # None means: it's not there yet, but we're creating it. Other threads: stay off and wait till we assign it
+            # first we take the creation lock for this identifier, and register an event for this object only
+            # we then release the lock, and create the new object. Other threads wait for the event.
+            # The creation locks are striped, so threads creating different objects rarely wait for each other.
+            creationlock = _getCreationLock(namespace, identifier)
+            creationlock.acquire()
+            # check if it still doesn't exist (another thread may have created or claimed it in the last few miliseconds)
+            if not _isClaimed(namespace, identifier):
+                # None means: it's not there yet, but we're creating it. Other threads: stay off and wait for the event
                 namespace.elements[identifier] = None
-                threadlock.release() # end global lock.
-                # create a new object, and call __init__.
-                xmlobject = object.__new__(klass)
-                #klass.__init__(xmlobject, identifier, namespace, *args, **kwargs)
-                xmlobject.__init__(identifier, namespace, *args, **kwargs)
-                if not hasattr(xmlobject, 'rdfobject_initfunction_wascalled'):
-                    raise pynt.ConsistencyException("The __init__ function of %s did not call the parent __init__ function in RDFObject" % (klass.__name__))
-                del xmlobject.rdfobject_initfunction_wascalled
-                global rdfobjects
-                if klass not in rdfobjects:
-                    rdfobjects[klass] = []
-                threadlock.acquire() # second short global lock; probably not needed though
-                if xmlobject not in rdfobjects[klass]:
-                    rdfobjects[klass].append(xmlobject)
-                namespace.elements[identifier] = xmlobject
-                threadlock.release() # end lock
-                logger.info("Created  %s object %s in namespace %s" % (type(xmlobject).__name__, identifier, namespace.getURI()))
+                created = threading.Event()
+                pendingobjects[(namespace, identifier)] = created
+                creationlock.release()
+                try:
+                    # create a new object, and call __init__.
+                    xmlobject = _constructRDFObject(klass, identifier, namespace, *args, **kwargs)
+                    global threadlock
+                    threadlock.acquire() # short global lock for the object indexes
+                    try:
+                        _indexRDFObject(xmlobject)
+                    finally:
+                        threadlock.release()
+                    namespace.elements[identifier] = xmlobject
+                except:
+                    # remove the placeholder, so a later call can try again.
+                    if (identifier in namespace.elements) and (namespace.elements[identifier] is None):
+                        del namespace.elements[identifier]
+                    raise
+                finally:
+                    # wake up waiting threads
+                    del pendingobjects[(namespace, identifier)]
+                    created.set()
+                xmlobject.recordChange("create")
+                if trace:
+                    logger.info("Created  %s object %s in namespace %s", type(xmlobject).__name__, identifier, namespace.getURI())
             else:
-                threadlock.release()
-                logger.debug("Object creation lock released")
-        xmlobject = namespace.elements[identifier]
-        if xmlobject == None:
+                creationlock.release()
+                if trace:
+                    logger.debug("Object creation lock released")
+        xmlobject = namespace.elements.get(identifier)
+        if xmlobject is None:
             # Another thread is in the process of creating the object
-            logger = logging.getLogger("pynt.xmlns")
-            logger.debug("Wait for other thread to create object %s in namespacce %s" % (identifier, namespace.getURI()))
-            end_time = time.time() + 10 # 10 second time-out
-            while namespace.elements[identifier] == None:
-                if time.time() > end_time:
-                    raise DuplicateNamespaceException("An other thread claims to create object %s in namespace %s, but after 10 seconds, it still doesn't exist." % (identifier, namespace.getURI()))
-                    break
-                time.sleep(0.05)
-            logger.debug("Got newly created object %s in namespace %s" % (identifier, namespace.getURI()))
-            xmlobject = namespace.elements[identifier]
+            xmlobject = _waitForRDFObject(namespace, identifier)
         if klass and not isinstance(xmlobject,klass):
             raise UndefinedNamespaceException("Object %s in namespace %s is a %s, instead of a %s" % (identifier, namespace.getURI(), type(xmlobject).__name__, klass.__name__))
+        xmlobject.generation = namespace.context.generation
         return xmlobject
     
     def __init__(self, identifier, namespace):
@@ -142,10 +422,39 @@ class RDFObject(object):
         assert (isinstance(namespace, XMLNamespace))
         self.identifier = identifier
         self.namespace  = namespace
-        self.sources = []
-        self.rdfProperties = {}
+        self.name = ""
+        self.description = ""
+        self.sources = emptylist
+        self.rdfProperties = emptydict
+        self.generation = namespace.context.generation
+        self.objectid = objectids.next()
+        self.uridentifier = None
         self.rdfobject_initfunction_wascalled = True
-    
+
+    def __getstate__(self):
+        """Return the attributes in __dict__ and __slots__, for pickle."""
+        state = dict(getattr(self, '__dict__', {}))
+        for klass in type(self).__mro__:
+            for name in klass.__dict__.get('__slots__', ()):
+                if (name not in ('__dict__', '__weakref__')) and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+    def __setstate__(self, state):
+        for (name, value) in state.iteritems():
+            setattr(self, name, value)
+
+    def getOwnContainer(self, name):
+        """Return the list or dict in the given attribute, to add items to. If the attribute
+        is the shared emptylist or emptydict, a new list or dict is assigned first."""
+        container = getattr(self, name)
+        if container is emptylist:
+            container = []
+            setattr(self, name, container)
+        elif container is emptydict:
+            container = {}
+            setattr(self, name, container)
+        return container
+
     def __str__(self): # normal program output (no "" around strings)
         return '<%s %s>' % (type(self).__name__, self.identifier)
     def __repr__(self): # debugging output ("" around string to distinguish "2" from 2)
@@ -166,31 +475,58 @@ class RDFObject(object):
         identifier = UTF8(identifier)
         if identifier != self.identifier:
             assert (self.namespace != None)
-            if self.identifier:
-                del self.namespace.elements[self.identifier]
-            self.identifier = identifier
             if identifier in self.namespace.elements:
                 raise DuplicateNamespaceException("An other %s object with identifier %s already exists in namespace %s" % 
                         (type(self.namespace.elements[identifier]).__name__, identifier, self.namespace.getURI()))
-            self.namespace.elements[identifier] = self
+            global threadlock
+            threadlock.acquire()
+            try:
+                indexed = _unindexRDFObject(self)
+                if self.identifier:
+                    del self.namespace.elements[self.identifier]
+                self.identifier = identifier
+                self.uridentifier = None
+                self.namespace.elements[identifier] = self
+                if indexed:
+                    _indexRDFObject(self)
+            finally:
+                threadlock.release()
+            self.recordChange("setIdentifier", identifier)
     
     def setNamespace(self,namespace):
         if namespace == self.namespace:
             return
         if not isinstance(namespace, XMLNamespace):
             raise TypeError("Namespace must be of type pynt.xmlns.XMLNamespace")
+        elif self.namespace and (namespace.context is not self.namespace.context):
+            raise pynt.ConsistencyException("Can not move %s from namespace %s in %s to namespace %s in %s" % 
+                    (self, self.namespace.uri, self.namespace.context, namespace.uri, namespace.context))
         else:
-            if self.identifier:
-                if self.namespace:
-                    del self.namespace.elements[self.identifier]
-                if self.identifier in namespace.elements:
-                    raise DuplicateNamespaceException("An other %s object with identifier %s already exists in namespace %s" % 
-                        (type(namespace.elements[self.identifier]).__name__, self.identifier, namespace.uri))
-                namespace.elements[self.identifier] = self
-            self.namespace = namespace
-    
-    def setName(self,name):                         self.name = UTF8(name)
-    def setDescription(self,description):           self.description = UTF8(description)
+            if self.identifier and (self.identifier in namespace.elements):
+                raise DuplicateNamespaceException("An other %s object with identifier %s already exists in namespace %s" % 
+                    (type(namespace.elements[self.identifier]).__name__, self.identifier, namespace.uri))
+            global threadlock
+            threadlock.acquire()
+            try:
+                indexed = _unindexRDFObject(self)
+                if self.identifier:
+                    if self.namespace:
+                        del self.namespace.elements[self.identifier]
+                    namespace.elements[self.identifier] = self
+                self.namespace = namespace
+                self.uridentifier = None
+                if indexed:
+                    _indexRDFObject(self)
+            finally:
+                threadlock.release()
+            self.recordChange("setNamespace", namespace)
+    
+    def setName(self,name):
+        self.name = UTF8(name)
+        self.recordChange("setName", self.name)
+    def setDescription(self,description):
+        self.description = UTF8(description)
+        self.recordChange("setDescription", self.description)
     def getIdentifier(self):                        return self.identifier
     def getNamespace(self):                         return self.namespace
     def getName(self): # the rdfs:label
@@ -199,18 +535,26 @@ class RDFObject(object):
         else:
             return self.name
     def getDescription(self):                       return self.description
-    def getURIdentifier(self):                      return self.namespace.getURI()+self.getIdentifier()
+    def getObjectId(self):                          return self.objectid
+    def getURIdentifier(self):
+        if self.uridentifier == None:
+            self.uridentifier = self.namespace.getURI()+self.getIdentifier()
+        return self.uridentifier
     def getXMLEltIdentifier(self):                  return self.namespace.getPrefix()+':'+self.getIdentifier()
     
+    def recordChange(self, change, value=None):
+        """Add a change of this object to the change journal of its context. Returns the sequence number."""
+        return self.namespace.context.journal.record(self, change, value)
+    
     def attachSource(self, url):
         """Add a related (seeAlso) source to a subject. The given URL will NOT be fetched automatically."""
         if url not in self.sources:
-            self.sources.append(url)
+            self.getOwnContainer('sources').append(url)
     def getSources(self):
         return self.sources
     
     def addRDFProperty(self, ns, predicate, value):
-        self.rdfProperties[(ns,predicate)] = value
+        self.getOwnContainer('rdfProperties')[(ns,predicate)] = value
     def getRDFProperty(self,ns,predicate):
         return self.rdfProperties[(ns,predicate)]
     def hasRDFProperty(self,ns,predicate):
@@ -247,15 +591,15 @@ class RDFObject(object):
     #         raise UndefinedNamespaceException("predicate %s unknown for %s %s." % (predicate, type(self), self.getURIdentifier()))
 
 
-def RDFObjectExists(identifier, namespace=None):
+def RDFObjectExists(identifier, namespace=None, context=None):
     try:
-        GetRDFObject(identifier=identifier, namespace=namespace)
+        GetRDFObject(identifier=identifier, namespace=namespace, context=context)
     except UndefinedNamespaceException:
         return False
     else: 
         return True
 
-def GetCreateRDFObject(identifier, namespace=None, klass=None, mayCreate=True, mayExist=True, verifyAttributes=False, initfunction=None, **arguments):
+def GetCreateRDFObject(identifier, namespace=None, klass=None, mayCreate=True, mayExist=True, verifyAttributes=False, initfunction=None, context=None, **arguments):
     """Returns the object with given identifier in the given namespace. 
     Verifies that it is of the correct class. If no object is found, creates a new object of the given class
     Two initialization functions are called while remaining in thread-safe mode:
@@ -263,15 +607,16 @@ def GetCreateRDFObject(identifier, namespace=None, klass=None, mayCreate=True, m
     - initfunction(newobject, **arguments)
     initfunction can be a method inside a class, e.g. self.initfunction calls initfunction(self, newobject, **arguments)
     Additional named arguments (**arguments) are passed to both functions. Make sure they can accept that.
+    If no namespace is given, the default namespace of the given (or else the active) context is used.
     This function is thread-safe."""
     ## NOTE: please replace this function with:
     ##    xmlobject = klass(identifier=identifier, namespace=namespace, **arguments)
     ## only if you use mayCreate, mayExist, initfunction or verifyattributes you should use this function.
     if namespace == None:
-        namespace = GetDefaultNamespace()
+        namespace = GetDefaultNamespace(context=context)
     assert(isinstance(namespace, XMLNamespace))
     identifier = UTF8(identifier)
-    if identifier not in namespace.elements:
+    if not _isClaimed(namespace, identifier):
         if not mayCreate:
             raise UndefinedNamespaceException("No object with identifier %s in namespace %s" % (identifier, namespace.getURI()))
         if klass == None:
@@ -284,82 +629,252 @@ def GetCreateRDFObject(identifier, namespace=None, klass=None, mayCreate=True, m
             initfunction(xmlobject, **arguments)
     elif not mayExist:
         raise DuplicateNamespaceException("An other %s object with identifier %s already exists in namespace %s" % (klass.__name__, identifier, namespace.getURI()))
-    xmlobject = namespace.elements[identifier]
-    assert xmlobject != None    # None is an intermediate state in RDFObject.__new__(), but should be resolved before it returns
+    xmlobject = namespace.elements.get(identifier)
+    if xmlobject is None:
+        # None (or no object) is an intermediate state in RDFObject.__new__() or GetCreateRDFObjects(): an other thread is creating the object.
+        xmlobject = _waitForRDFObject(namespace, identifier)
     if klass and not isinstance(xmlobject,klass):
         raise UndefinedNamespaceException("Object %s in namespace %s is a %s, instead of a %s" % (identifier, namespace.getURI(), type(xmlobject).__name__, klass.__name__))
     if verifyAttributes:
         VerifyEqualAttributes(xmlobject, ignoreNone=False, **arguments)
+    xmlobject.generation = namespace.context.generation
     return xmlobject
 
 
-def GetRDFObject(identifier, namespace=None, klass=None, mayCreate=False, mayExist=True, verifyAttributes=False, initfunction=None, **arguments):
+def GetCreateRDFObjects(specifications, context=None):
+    """Returns a list of objects, one for each (identifier, namespace, klass, arguments) tuple
+    in specifications. Existing objects are returned, the others are created with
+    klass(identifier, namespace, **arguments). namespace, klass and arguments may be None.
+    All new objects are added to the object indexes at once, which is much faster than 
+    calling GetCreateRDFObject for each object if a fetcher creates many objects. Until then, 
+    the new objects are only claimed in pendingobjects, and not visible in the namespace.
+    This function is thread-safe."""
+    logger = logging.getLogger("pynt.xmlns")
+    defaultnamespace = None
+    requested = []  # list of (identifier, namespace, klass)
+    claimed = []    # list of (identifier, namespace, klass, arguments, event) of objects created by this thread
+    for (identifier, namespace, klass, arguments) in specifications:
+        if namespace == None:
+            if defaultnamespace == None:
+                defaultnamespace = GetDefaultNamespace(context=context)
+            namespace = defaultnamespace
+        assert(isinstance(namespace, XMLNamespace))
+        if klass == None:
+            klass = RDFObject
+        identifier = UTF8(identifier)
+        requested.append((identifier, namespace, klass))
+        if identifier in namespace.elements:
+            continue
+        if not issubclass(klass, RDFObject):
+            raise TypeError("GetCreateRDFObjects: klass %s is not an %s subclass." % (klass, RDFObject))
+        creationlock = _getCreationLock(namespace, identifier)
+        creationlock.acquire()
+        try:
+            if not _isClaimed(namespace, identifier):
+                # other threads wait for the event, see _waitForRDFObject()
+                created = threading.Event()
+                pendingobjects[(namespace, identifier)] = created
+                claimed.append((identifier, namespace, klass, arguments or {}, created))
+        finally:
+            creationlock.release()
+    newobjects = []
+    try:
+        for (identifier, namespace, klass, arguments, created) in claimed:
+            newobjects.append(_constructRDFObject(klass, identifier, namespace, **arguments))
+    finally:
+        # register all new objects in one go, and release the claims of all objects.
+        global threadlock
+        threadlock.acquire()
+        try:
+            _indexRDFObjects(newobjects)
+        finally:
+            threadlock.release()
+        for xmlobject in newobjects:
+            xmlobject.namespace.elements[xmlobject.identifier] = xmlobject
+            xmlobject.recordChange("create")
+        for (identifier, namespace, klass, arguments, created) in claimed:
+            del pendingobjects[(namespace, identifier)]
+            created.set()
+    xmlobjects = []
+    for (identifier, namespace, klass) in requested:
+        xmlobject = namespace.elements.get(identifier)
+        if xmlobject is None:
+            xmlobject = _waitForRDFObject(namespace, identifier)
+        if not isinstance(xmlobject, klass):
+            raise UndefinedNamespaceException("Object %s in namespace %s is a %s, instead of a %s" % (identifier, namespace.getURI(), type(xmlobject).__name__, klass.__name__))
+        xmlobject.generation = namespace.context.generation
+        xmlobjects.append(xmlobject)
+    logger.info("Created %d and retrieved %d objects", len(newobjects), len(xmlobjects) - len(newobjects))
+    return xmlobjects
+
+
+def GetRDFObject(identifier, namespace=None, klass=None, mayCreate=False, mayExist=True, verifyAttributes=False, initfunction=None, context=None, **arguments):
     """Returns the object with given identifier in the given namespace. 
     Verifies that it is of the correct class. Raises an UndefinedNamespaceException
     if the object is not found, or of the wrong class."""
     # mayCreate, mayExist are ignored (they are specified as argument to prevent that they end up in **arguments)
-    return GetCreateRDFObject(identifier=identifier, namespace=namespace, klass=klass, mayCreate=False, mayExist=True, verifyAttributes=verifyAttributes, initfunction=initfunction, **arguments)
+    return GetCreateRDFObject(identifier=identifier, namespace=namespace, klass=klass, mayCreate=False, mayExist=True, verifyAttributes=verifyAttributes, initfunction=initfunction, context=context, **arguments)
 
 
-def CreateRDFObject(identifier, namespace=None, klass=None, mayCreate=True, mayExist=False, verifyAttributes=False, initfunction=None, **arguments):
+def CreateRDFObject(identifier, namespace=None, klass=None, mayCreate=True, mayExist=False, verifyAttributes=False, initfunction=None, context=None, **arguments):
     """Verifies that the existing object does not yet exist. 
     Creates a new object of the given class and calls __init__ with identifier, namespace, and **arguments as arguments.
     In addition, a , and calls the initializer code: initfunction(newobject, **arguments).
     This function is thread-safe."""
     # mayCreate, mayExist are ignored (they are specified as argument to prevent that they end up in **arguments)
-    return GetCreateRDFObject(identifier=identifier, namespace=namespace, klass=klass, mayCreate=True, mayExist=False, verifyAttributes=verifyAttributes, initfunction=initfunction, **arguments)
+    return GetCreateRDFObject(identifier=identifier, namespace=namespace, klass=klass, mayCreate=True, mayExist=False, verifyAttributes=verifyAttributes, initfunction=initfunction, context=context, **arguments)
 
 
 def DeleteRDFObject(rdfobject):
-    """Delete the given rdfobject from the global repository. Note that you are responsible yourself to make sure the given RDFObject is really not referenced anymore."""
-    pass
-    global rdfobjects
-    klass = type(rdfobject)
-    if klass in rdfobjects:
-        if rdfobject in rdfobjects[klass]:
-            rdfobjects[klass].remove(rdfobject)
+    """Delete the given rdfobject from the repository of its context. Note that you are responsible yourself to make sure the given RDFObject is really not referenced anymore."""
+    global threadlock
+    threadlock.acquire()
+    try:
+        _unindexRDFObject(rdfobject)
+    finally:
+        threadlock.release()
     namespace = rdfobject.namespace
     identifier = rdfobject.identifier
     if namespace and identifier in namespace.elements:
         del namespace.elements[identifier]
+        rdfobject.recordChange("delete")
     # print "reference count of %s is %d" % (rdfobject, sys.getrefcount(rdfobject))
     # TODO: use sys.getrefcount to give warning if reference count >= 2
 
-def DeleteAllRDFObjects():
+def DeleteAllRDFObjects(context=None):
     """Delete all known RDF Objects. Similar to DeleteAllNamespaces(), which also removes all known namespaces."""
-    # method 1:
-    for rdfobject in GetAllRDFObjects():
-        DeleteRDFObject(rdfobject)
-    # method 2:
-    global rdfobjects
-    rdfobjects = {}
-    for namespace in GetNamespaces():
+    # Deleting the objects one by one is quadratic, since each removal shifts the sorted indexes.
+    context = GetActiveContext(context)
+    context.rdfobjects = {}
+    context.rdfobjectkeys = {}
+    context.rdfsubclasses = {}
+    for namespace in GetNamespaces(context=context):
         namespace.elements = {}
+        namespace.rdfobjects = {}
+        namespace.rdfobjectkeys = {}
+    context.journal.truncate()
+    context.journal.record(None, "deleteAll")
 
 
-def GetAllRDFObjects(klass=RDFObject, exactclass=False, namespace=None):
+def GetAllRDFObjects(klass=RDFObject, exactclass=False, namespace=None, context=None):
     """Return a list of all RDF objects of the given class. 
     If exactclass is False (the default), including objects of a subclass
-    If a namespace is provided, then we search only in that namespace."""
-    if not namespace:
-        global rdfobjects
-        objectlist = []
-        for rdfklass in GetRDFClasses():
-            if (klass == rdfklass) or ((not exactclass) and issubclass(rdfklass, klass)):
-                objectlist.extend(rdfobjects[rdfklass])
+    If a namespace is provided, then we search only in that namespace, 
+    otherwise in the given (or else the active) context.
+    The list is sorted by rdfObjectKey."""
+    if namespace:
+        context     = namespace.context
+        objectindex = namespace.rdfobjects
+        keyindex    = namespace.rdfobjectkeys
     else:
-        objectlist = []
-        for obj in namespace.getElements():
-            if (obj.__class__ == klass) or ((not exactclass) and issubclass(obj.__class__, klass)):
-                objectlist.append(obj)
-    objectlist.sort(key=rdfObjectKey)
-    return objectlist
-
-
-
-def GetRDFClasses(sortkey=None):
-    global rdfobjects
-    classes = rdfobjects.keys()
+        context     = GetActiveContext(context)
+        objectindex = context.rdfobjects
+        keyindex    = context.rdfobjectkeys
+    if exactclass:
+        classes = [klass]
+    else:
+        classes = GetRDFSubclasses(klass, context=context)
+    classes = [rdfklass for rdfklass in classes if objectindex.get(rdfklass)]
+    if len(classes) == 0:
+        return []
+    elif len(classes) == 1:
+        return list(objectindex[classes[0]])
+    # each list is already sorted; merge them instead of sorting the result again
+    merged = heapq.merge(*[itertools.izip(keyindex[rdfklass], objectindex[rdfklass]) for rdfklass in classes])
+    return [rdfobject for (key, rdfobject) in merged]
+
+
+class CollectedRDFObject(object):
+    """Stand-in for a collected RDF object in the change journal. It has the object id, namespace 
+    and identifier of the collected object, but is not registered, and does not keep it alive."""
+    __slots__ = ('objectid', 'namespace', 'identifier', 'klass')
+    def __init__(self, rdfobject):
+        self.objectid   = rdfobject.getObjectId()
+        self.namespace  = rdfobject.getNamespace()
+        self.identifier = rdfobject.getIdentifier()
+        self.klass      = type(rdfobject)   # class of the collected object
+    def __str__(self):
+        return '<collected %s %s>' % (self.klass.__name__, self.identifier)
+    def __repr__(self):
+        return '<collected %s %s>' % (self.klass.__name__, self.identifier)
+    def getObjectId(self):                          return self.objectid
+    def getNamespace(self):                         return self.namespace
+    def getIdentifier(self):                        return self.identifier
+    def getURIdentifier(self):                      return self.namespace.getURI()+self.identifier
+
+
+def CollectRDFObjects(generation=None, klass=RDFObject, context=None):
+    """Remove all objects of the given class, which were not created or retrieved since the given 
+    generation (default: the current generation of the context), from the registry, provided that 
+    they are no longer referenced by other objects. Records a "delete" change for each removed 
+    object, with a CollectedRDFObject as subject. Returns the number of removed objects.
+    Do not call this function while other threads create objects in the same context."""
+    context = GetActiveContext(context)
+    if generation == None:
+        generation = context.generation
+    logger = logging.getLogger("pynt.xmlns")
+    # Only keep weak references to the candidates, and remove them from the registry. 
+    # Objects which are still referenced survive the garbage collection, and are registered again.
+    # The journal refers to the candidates with a stand-in, until they survived.
+    candidates = []     # list of (weak reference, CollectedRDFObject)
+    global threadlock
+    context.writelock.acquire()
+    try:
+        threadlock.acquire()
+        try:
+            staleobjects = [rdfobject for rdfobject in GetAllRDFObjects(klass, context=context) if rdfobject.generation < generation]
+            _unindexRDFObjects(staleobjects)
+            replacements = {}   # dict id(object) -> (object, CollectedRDFObject)
+            for rdfobject in staleobjects:
+                del rdfobject.namespace.elements[rdfobject.identifier]
+                replacements[id(rdfobject)] = (rdfobject, CollectedRDFObject(rdfobject))
+                candidates.append((weakref.ref(rdfobject), replacements[id(rdfobject)][1]))
+            context.journal.replaceObjects(replacements)
+            staleobjects = None
+            replacements = None
+            rdfobject = None
+        finally:
+            threadlock.release()
+        gc.collect()
+        survivors = [(reference(), collectedobject) for (reference, collectedobject) in candidates]
+        survivors = [(rdfobject, collectedobject) for (rdfobject, collectedobject) in survivors if rdfobject != None]
+        context.journal.replaceObjects(dict([(id(collectedobject), (collectedobject, rdfobject)) for (rdfobject, collectedobject) in survivors]))
+        threadlock.acquire()
+        try:
+            registered = []
+            for (rdfobject, collectedobject) in survivors:
+                if rdfobject.identifier in rdfobject.namespace.elements:
+                    logger.warning("%s %s was recreated while it was collected. Keeping the new object.", type(rdfobject).__name__, rdfobject.getURIdentifier())
+                    continue
+                rdfobject.namespace.elements[rdfobject.identifier] = rdfobject
+                registered.append(rdfobject)
+            _indexRDFObjects(registered)
+        finally:
+            threadlock.release()
+        survivors = set([id(collectedobject) for (rdfobject, collectedobject) in survivors])
+        collected = 0
+        for (reference, collectedobject) in candidates:
+            if id(collectedobject) not in survivors:
+                context.journal.record(collectedobject, "delete")
+                collected += 1
+    finally:
+        context.writelock.release()
+    logger.info("Collected %d of %d objects older than generation %d in %s", collected, len(candidates), generation, context)
+    return collected
+
+
+def GetRDFObjectStatistics(context=None):
+    """Return a dict, sorted by class, with the number of registered objects of exactly that class."""
+    context = GetActiveContext(context)
+    statistics = {}
+    for (klass, objectlist) in context.rdfobjects.items():
+        if len(objectlist) > 0:
+            statistics[klass] = len(objectlist)
+    return statistics
+
+
+def GetRDFClasses(sortkey=None, context=None):
+    classes = GetActiveContext(context).rdfobjects.keys()
     # alternative, use inspect.getclasstree to create a logical sort order.
     # classtree = inspect.getclasstree(classes, True)
     if sortkey: # classKey
@@ -367,6 +882,158 @@ def GetRDFClasses(sortkey=None):
     return classes
 
 
+def GetRDFSubclasses(klass=RDFObject, context=None):
+    """Return the classes with known RDF objects which are klass or a subclass of klass.
+    The result is cached until an object of a new class is created."""
+    context = GetActiveContext(context)
+    if klass not in context.rdfsubclasses:
+        context.rdfsubclasses[klass] = [rdfklass for rdfklass in context.rdfobjects.keys() if issubclass(rdfklass, klass)]
+    return context.rdfsubclasses[klass]
+
+
+def ReindexRDFObjects(context=None):
+    """Rebuild the sorted class and namespace indexes from the objects in context.rdfobjects.
+    Must be called after rdfobjects is replaced, e.g. after unpickling it."""
+    context = GetActiveContext(context)
+    allobjects = []
+    for objectlist in context.rdfobjects.values():
+        allobjects.extend(objectlist)
+    context.rdfobjects = {}
+    context.rdfobjectkeys = {}
+    context.rdfsubclasses = {}
+    for namespace in context.xmlnamespaces.values():
+        namespace.context = context
+        namespace.rdfobjects = {}
+        namespace.rdfobjectkeys = {}
+    for rdfobject in allobjects:
+        # objects from a pickle may have an objectid which is already in use
+        rdfobject.objectid = objectids.next()
+        rdfobject.uridentifier = None
+        _indexRDFObject(rdfobject)
+
+
+# object indexes. The caller must hold threadlock.
+
+def _insertSorted(objectindex, keyindex, klass, key, rdfobject):
+    if klass not in objectindex:
+        objectindex[klass] = []
+        keyindex[klass] = []
+    objectlist = objectindex[klass]
+    keylist = keyindex[klass]
+    pos = bisect.bisect_right(keylist, key)
+    if (pos > 0) and (keylist[pos-1] == key) and (objectlist[pos-1] is rdfobject):
+        return # already indexed
+    keylist.insert(pos, key)
+    objectlist.insert(pos, rdfobject)
+
+def _removeSorted(objectindex, keyindex, klass, key, rdfobject):
+    """Remove rdfobject from the sorted index. Returns True if it was found."""
+    if klass not in objectindex:
+        return False
+    objectlist = objectindex[klass]
+    keylist = keyindex[klass]
+    pos = bisect.bisect_left(keylist, key)
+    while (pos < len(keylist)) and (keylist[pos] == key):
+        if objectlist[pos] is rdfobject:
+            del keylist[pos]
+            del objectlist[pos]
+            return True
+        pos += 1
+    return False
+
+def _indexRDFObject(rdfobject):
+    """Add the rdfobject to the class index and the namespace index."""
+    klass = type(rdfobject)
+    namespace = rdfobject.namespace
+    context = namespace.context
+    if klass not in context.rdfobjects:
+        context.rdfsubclasses.clear()
+    key = rdfObjectKey(rdfobject)
+    _insertSorted(context.rdfobjects, context.rdfobjectkeys, klass, key, rdfobject)
+    if namespace.rdfobjects == None:
+        namespace.rdfobjects = {}
+        namespace.rdfobjectkeys = {}
+    _insertSorted(namespace.rdfobjects, namespace.rdfobjectkeys, klass, key, rdfobject)
+
+def _indexRDFObjects(rdfobjects):
+    """Add a list of new rdfobjects to the class index and the namespace index.
+    Each index list is merged once with the sorted new objects, instead of an insert per object."""
+    if len(rdfobjects) < 8:
+        for rdfobject in rdfobjects:
+            _indexRDFObject(rdfobject)
+        return
+    buckets = {}    # (objectindex, keyindex, klass) -> list of (key, rdfobject)
+    indexes = {}    # id(objectindex) -> (objectindex, keyindex)
+    for rdfobject in rdfobjects:
+        klass = type(rdfobject)
+        namespace = rdfobject.namespace
+        context = namespace.context
+        if klass not in context.rdfobjects:
+            context.rdfsubclasses.clear()
+        if namespace.rdfobjects == None:
+            namespace.rdfobjects = {}
+            namespace.rdfobjectkeys = {}
+        key = rdfObjectKey(rdfobject)
+        for (objectindex, keyindex) in ((context.rdfobjects, context.rdfobjectkeys), (namespace.rdfobjects, namespace.rdfobjectkeys)):
+            indexes[id(objectindex)] = (objectindex, keyindex)
+            buckets.setdefault((id(objectindex), klass), []).append((key, rdfobject))
+    for ((indexid, klass), newentries) in buckets.iteritems():
+        (objectindex, keyindex) = indexes[indexid]
+        newentries.sort(key=lambda entry: entry[0])
+        if klass not in objectindex:
+            objectindex[klass] = [rdfobject for (key, rdfobject) in newentries]
+            keyindex[klass] = [key for (key, rdfobject) in newentries]
+            continue
+        merged = list(heapq.merge(itertools.izip(keyindex[klass], objectindex[klass]), newentries))
+        objectindex[klass] = [rdfobject for (key, rdfobject) in merged]
+        keyindex[klass] = [key for (key, rdfobject) in merged]
+
+def _unindexRDFObject(rdfobject):
+    """Remove the rdfobject from the class index and the namespace index, using its current key.
+    Returns True if the object was indexed."""
+    klass = type(rdfobject)
+    namespace = rdfobject.namespace
+    if not (namespace and rdfobject.identifier):
+        return False
+    context = namespace.context
+    key = rdfObjectKey(rdfobject)
+    found = _removeSorted(context.rdfobjects, context.rdfobjectkeys, klass, key, rdfobject)
+    if namespace.rdfobjects != None:
+        _removeSorted(namespace.rdfobjects, namespace.rdfobjectkeys, klass, key, rdfobject)
+    return found
+
+def _unindexRDFObjects(rdfobjects):
+    """Remove a list of rdfobjects from the class index and the namespace index.
+    Each affected index list is filtered once, instead of a removal per object."""
+    if len(rdfobjects) < 8:
+        for rdfobject in rdfobjects:
+            _unindexRDFObject(rdfobject)
+        return
+    removed = set()     # set of id(rdfobject)
+    indexes = {}        # (id(objectindex), klass) -> (objectindex, keyindex, klass)
+    for rdfobject in rdfobjects:
+        namespace = rdfobject.namespace
+        if not (namespace and rdfobject.identifier):
+            continue
+        removed.add(id(rdfobject))
+        klass = type(rdfobject)
+        context = namespace.context
+        indexes[(id(context.rdfobjects), klass)] = (context.rdfobjects, context.rdfobjectkeys, klass)
+        if namespace.rdfobjects != None:
+            indexes[(id(namespace.rdfobjects), klass)] = (namespace.rdfobjects, namespace.rdfobjectkeys, klass)
+    for (objectindex, keyindex, klass) in indexes.values():
+        if klass not in objectindex:
+            continue
+        keptobjects = []
+        keptkeys = []
+        for (key, rdfobject) in itertools.izip(keyindex[klass], objectindex[klass]):
+            if id(rdfobject) not in removed:
+                keptkeys.append(key)
+                keptobjects.append(rdfobject)
+        objectindex[klass] = keptobjects
+        keyindex[klass] = keptkeys
+
+
 def VerifyEqualAttributes(subject, ignoreNone=False, **attributes):
     """Verifies that the given attributes are present in the xmlobject, and have the same value"""
     for (attribute, value) in attributes.iteritems():
@@ -383,7 +1050,7 @@ def VerifyEqualAttributes(subject, ignoreNone=False, **attributes):
 # sort keys
 
 def rdfObjectKey(subject):
-    return subject.namespace.uri+subject.identifier
+    return subject.getURIdentifier()
 
 def classKey(subject):
     return subject.__name__
@@ -413,9 +1080,7 @@ def UTF8(value):
 
 
 # Makes sure there is only one namespace with the same URI.
-# Singleton pattern: keep the list of namespaces in a single (global) list
-
-xmlnamespaces = {}        # dict, sorted by URL
+# Singleton pattern: keep the list of namespaces in a single list per context (context.xmlnamespaces)
 
 
 class XMLNamespace(object):
@@ -423,14 +1088,19 @@ class XMLNamespace(object):
     uri         = '#'   # URI of the namespace. MUST be unique
     schemaurl   = None  # URL with RDFS defining the schema
     humanurl    = None  # URL with human readable explanation of the schema
-    elements    = None  # list (set in __init__)
+    elements    = None  # dict: identifier -> RDFObject (set in __init__)
+    rdfobjects  = None  # dict: class -> list of RDFObjects in this namespace, ordered by rdfObjectKey (set in __init__)
+    rdfobjectkeys = None # dict: class -> list of rdfObjectKey of the objects in rdfobjects (set in __init__)
     metaschema  = False # True if it is a "well known" schema, which meaning is hardcoded in this script
     layerschema = False # True if it is a schema defining a technology, which must be read to be understand, and to be able to parse network descriptions
     networkschema = False # True is the schema describes (part of) a network
+    context     = None  # TopologyContext this namespace belongs to (set in __init__)
     
-    def __init__(self,uri,prefix=None,schemaurl=None,humanurl=None,metaschema=False,layerschema=False,networkschema=False):
-        global xmlnamespaces
+    def __init__(self,uri,prefix=None,schemaurl=None,humanurl=None,metaschema=False,layerschema=False,networkschema=False,context=None):
+        self.context = GetActiveContext(context)
         self.elements = {}
+        self.rdfobjects = {}
+        self.rdfobjectkeys = {}
         self.setURI(uri)
         if prefix:
             self.setPrefix(prefix)
@@ -449,7 +1119,7 @@ class XMLNamespace(object):
             schematype = "network"
         else:
             schematype = "regular"
-        xmlnamespaces[uri] = self
+        self.context.xmlnamespaces[uri] = self
         logger = logging.getLogger("pynt.xmlns")
         logger.info("Created %s namespace %s" % (schematype,uri))
     
@@ -464,13 +1134,28 @@ class XMLNamespace(object):
         # check if prefix already exists
         if uri != self.uri:
             try:
-                GetNamespaceByURI(uri)
+                GetNamespaceByURI(uri, context=self.context)
             except UndefinedNamespaceException:
                 # good, it doesn't exist yet
                 pass
             else: 
                 raise DuplicateNamespaceException("A namespace with URI %s already exists" % uri)
-        self.uri = uri
+        if not self.elements:
+            self.uri = uri
+            return
+        # the URI is part of the cached URI and sort key of all elements
+        global threadlock
+        threadlock.acquire()
+        try:
+            rdfobjects = [rdfobject for rdfobject in self.elements.values() if rdfobject != None]
+            indexed = [_unindexRDFObject(rdfobject) for rdfobject in rdfobjects]
+            self.uri = uri
+            for (rdfobject, wasindexed) in zip(rdfobjects, indexed):
+                rdfobject.uridentifier = None
+                if wasindexed:
+                    _indexRDFObject(rdfobject)
+        finally:
+            threadlock.release()
     
     def setSchemaURL(self,schemaurl):   self.schemaurl = schemaurl
     def setHumanURL(self,humanurl):     self.humanurl = humanurl
@@ -493,7 +1178,7 @@ class XMLNamespace(object):
         # check if prefix already exists
         if prefix != self.prefix:
             try:
-                otherns = GetNamespaceByPrefix(prefix)
+                otherns = GetNamespaceByPrefix(prefix, context=self.context)
             except UndefinedNamespaceException:
                 # good, it doesn't exist yet
                 pass
@@ -503,11 +1188,11 @@ class XMLNamespace(object):
     
     def getPrefix(self):
         if self.prefix == None:
-            self.prefix = GetUniquePrefix(self.uri)
+            self.prefix = GetUniquePrefix(self.uri, context=self.context)
         return self.prefix
 
 
-def GetUniquePrefix(uri="",prefix=""):
+def GetUniquePrefix(uri="",prefix="",context=None):
     if prefix == "":
         match = re.search(r'.*\b([\w\.\-]+)\W*', uri)
         if match:
@@ -523,7 +1208,7 @@ def GetUniquePrefix(uri="",prefix=""):
         else:
             testprefix = prefix + str(counter)
         try:
-            GetNamespaceByPrefix(testprefix)
+            GetNamespaceByPrefix(testprefix, context=context)
         except UndefinedNamespaceException:
             break
         counter += 1
@@ -532,11 +1217,12 @@ def GetUniquePrefix(uri="",prefix=""):
 
 # TODO: deprecte GetCreate* and replace with override of __metaclass__(type), __call__(cls, *args, **kwargs) and __new__(klass, self,uri,prefix=None,schemaurl=None,humanurl=None,metaschema=False,layerschema=False,networkschema=False, *args, **kwargs) in class XMLNamespace
 
-def GetCreateNamespace(uri,prefix=None,schemaurl=None,humanurl=None,metaschema=False,layerschema=False,networkschema=False):
-    """create a new namespace with given parameters.
+def GetCreateNamespace(uri,prefix=None,schemaurl=None,humanurl=None,metaschema=False,layerschema=False,networkschema=False,context=None):
+    """create a new namespace with given parameters in the given (or else the active) context.
     If a namespace with the same URI exist, check if the properties are the 
     same. If not, raise an exception. Returns the namespace instance"""
-    global xmlnamespaces
+    context = GetActiveContext(context)
+    xmlnamespaces = context.xmlnamespaces
     uri = UTF8(uri)
     if uri in xmlnamespaces:
         VerifyEqualAttributes(xmlnamespaces[uri], ignoreNone=True, prefix=prefix, schemaurl=schemaurl)
@@ -547,7 +1233,7 @@ def GetCreateNamespace(uri,prefix=None,schemaurl=None,humanurl=None,metaschema=F
     # check if it still doesn't exist (another thread may have created it in the last few miliseconds)
     if uri not in xmlnamespaces:
         # create a new object
-        xmlnamespaces[uri] = XMLNamespace(uri,prefix=prefix,schemaurl=schemaurl,humanurl=humanurl,metaschema=metaschema,layerschema=layerschema,networkschema=networkschema)
+        xmlnamespaces[uri] = XMLNamespace(uri,prefix=prefix,schemaurl=schemaurl,humanurl=humanurl,metaschema=metaschema,layerschema=layerschema,networkschema=networkschema,context=context)
     else:
         VerifyEqualAttributes(xmlnamespaces[uri], ignoreNone=True, prefix=prefix, schemaurl=schemaurl)
     threadlock.release()
@@ -558,172 +1244,203 @@ def DeleteNamespace(namespace):
     """Delete the given namespace, as well as all RDFObject elements in the namespace"""
     # TODO: Use namespace.delete()?
     # remember that namespace.__del__() is only called if the object reference count is zero, which is NOT true for "del namespace".
-    for rdfobject in namespace.elements.values():
-        DeleteRDFObject(rdfobject)
-    assert(len(namespace.elements) == 0)
-    global xmlnamespaces
-    del xmlnamespaces[namespace.uri]
-
-
-def DeleteAllNamespaces():
-    """Delete all global namespace objects, and removes all elements in the namespaces"""
-    global rdfobjects
-    rdfobjects = {}
-    global xmlnamespaces
-    xmlnamespaces = {}
-
-
-def GetNamespaceByURI(uri):
+    context = namespace.context
+    global threadlock
+    threadlock.acquire()
+    try:
+        # remove all objects of this namespace from the class index in one pass per class
+        for klass in namespace.rdfobjects.keys():
+            if klass not in context.rdfobjects:
+                continue
+            keptobjects = []
+            keptkeys = []
+            for (key, rdfobject) in itertools.izip(context.rdfobjectkeys[klass], context.rdfobjects[klass]):
+                if rdfobject.namespace is not namespace:
+                    keptkeys.append(key)
+                    keptobjects.append(rdfobject)
+            context.rdfobjects[klass] = keptobjects
+            context.rdfobjectkeys[klass] = keptkeys
+    finally:
+        threadlock.release()
+    namespace.elements = {}
+    namespace.rdfobjects = {}
+    namespace.rdfobjectkeys = {}
+    del context.xmlnamespaces[namespace.uri]
+
+
+def DeleteAllNamespaces(context=None):
+    """Delete all namespace objects of the given (or else the active) context, and removes all elements in the namespaces"""
+    context = GetActiveContext(context)
+    context.rdfobjects = {}
+    context.rdfobjectkeys = {}
+    context.rdfsubclasses = {}
+    context.xmlnamespaces = {}
+
+
+def GetNamespaceByURI(uri, context=None):
     """return the XMLNamespace with the given namespace URI, or raise an UndefinedNamespaceException"""
-    global xmlnamespaces
+    xmlnamespaces = GetActiveContext(context).xmlnamespaces
     if uri in xmlnamespaces:
         return xmlnamespaces[uri]
     else:
         raise UndefinedNamespaceException("No namespace with URI %s" % uri)
 
 
-def GetNamespaceByPrefix(prefix):
+def GetNamespaceByPrefix(prefix, context=None):
     """return the XMLNamespace with the given prefix, or raise an UndefinedNamespaceException"""
-    global xmlnamespaces
-    for xmlns in xmlnamespaces.values():
+    for xmlns in GetActiveContext(context).xmlnamespaces.values():
         # Do not call getPrefix(); that will give in infinite recursion
         if xmlns.prefix == prefix:
             return xmlns
     raise UndefinedNamespaceException("No namespace with prefix %s" % prefix)
 
 
-def GetNamespaceBySchemaURL(schemaurl):
+def GetNamespaceBySchemaURL(schemaurl, context=None):
     """return the XMLNamespace whose schema can be downloaded at the given URL, or raise an UndefinedNamespaceException"""
-    global xmlnamespaces
-    for xmlns in xmlnamespaces.values():
+    for xmlns in GetActiveContext(context).xmlnamespaces.values():
         if xmlns.schemaurl == schemaurl:
             return xmlns
     raise UndefinedNamespaceException("No namespace with schema at URL %s" % schemaurl)
 
 
-def NamespaceExists(namespace):
+def NamespaceExists(namespace, context=None):
     try:
-        GetNamespaceByURI(namespace)
+        GetNamespaceByURI(namespace, context=context)
     except UndefinedNamespaceException:
         return False
     else: 
         return True
 
 
-def GetNamespaces():
+def GetNamespaces(context=None):
     """return a list of namespace objects that are currently in use"""
-    global xmlnamespaces
     # We return all, including namespaces with len(elements) == 0
-    namespaces = xmlnamespaces.values()
+    namespaces = GetActiveContext(context).xmlnamespaces.values()
     namespaces.sort(key=xmlnamespaceKey)
     return namespaces
 
 
 
-def GetDefaultNamespace():
-    return GetCreateNamespace("#", prefix="local")
+def GetDefaultNamespace(context=None):
+    return GetCreateNamespace("#", prefix="local", context=context)
 
 
-def GetCreateWellKnownNamespace(prefix, uri=None):
+def GetCreateWellKnownNamespace(prefix, uri=None, context=None):
     """Create a namespace by prefix, using a lookup table of well-known prefixes and uris"""
     if (prefix == "rdf"):
         namespace = GetCreateNamespace(prefix = "rdf",
             uri       = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
             schemaurl = 'http://www.w3.org/1999/02/22-rdf-syntax-ns',
             humanurl  = 'http://www.w3.org/TR/rdf-schema/',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     elif (prefix == "rdfs"):
         namespace = GetCreateNamespace(prefix = "rdfs",
             uri       = 'http://www.w3.org/2000/01/rdf-schema#',
             schemaurl = 'http://www.w3.org/2000/01/rdf-schema',
             humanurl  = 'http://www.w3.org/TR/rdf-schema/',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     elif (prefix == "owl"):
         namespace = GetCreateNamespace(prefix = "owl",
             uri       = 'http://www.w3.org/2002/07/owl#',
             schemaurl = 'http://www.w3.org/2002/07/owl',
             humanurl  = 'http://www.w3.org/TR/owl-semantics/',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     elif (prefix == "xsd"):
         namespace = GetCreateNamespace(prefix = "xsd",
             uri       = 'http://www.w3.org/2001/XMLSchema#',
             schemaurl = 'http://www.w3.org/TR/xmlschema-2/#schema', # XSD format, not RDF!
             humanurl  = 'http://www.w3.org/TR/xmlschema-2/',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     elif (prefix == "vcard"):
         namespace = GetCreateNamespace(prefix = "vcard",
             uri       = 'http://www.w3.org/2001/vcard-rdf/3.0#',
             schemaurl = 'http://www.w3.org/2001/vcard-rdf/3.0',
             humanurl  = 'http://www.w3.org/TR/vcard-rdf',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     elif (prefix == "geo"):
         namespace = GetCreateNamespace(prefix = "geo",
             uri       = 'http://www.w3.org/2003/01/geo/wgs84_pos#',
             schemaurl = 'http://www.w3.org/2003/01/geo/wgs84_pos',
             humanurl  = 'http://www.w3.org/2003/01/geo/',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     elif (prefix == "vs"):
         namespace = GetCreateNamespace(prefix = "vs",
             uri       = 'http://www.w3.org/2003/06/sw-vocab-status/ns#',
             schemaurl = 'http://www.w3.org/2003/06/sw-vocab-status/ns.rdf',
             humanurl  = None,
-            metaschema= True)
+            metaschema= True,
+            context   = context)
     elif (prefix == "nmwgt"):
         namespace = GetCreateNamespace(prefix = "nmwgt",
             uri       = 'http://ogf.org/schema/network/topology/ctrlPlane/20080828/',
             schemaurl = 'http://ogf.org/schema/network/topology/ctrlPlane/20080828/',
             humanurl = 'http://nmwg.internet2.edu/nm-schema-base.html',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     # Very well known namespaces
     elif (prefix == "dc"):
         namespace = GetCreateNamespace(prefix = "dc",
             uri       = 'http://purl.org/dc/elements/1.1/',
             schemaurl = 'http://purl.org/dc/elements/1.1/',
             humanurl  = 'http://dublincore.org/documents/dcmi-terms/#H2',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     elif (prefix == "dcterms"):
         namespace = GetCreateNamespace(prefix = "dcterms",
             uri       = 'http://purl.org/dc/terms/',
             schemaurl = 'http://purl.org/dc/terms/',
             humanurl  = 'http://dublincore.org/documents/dcmi-terms/#H3',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     elif (prefix == "dctype"):
         namespace = GetCreateNamespace(prefix = "dctype",
             uri       = 'http://purl.org/dc/dcmitype/',
             schemaurl = 'http://purl.org/dc/dcmitype/',
             humanurl  = 'http://dublincore.org/documents/dcmi-terms/#H5',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     # NDL namespaces
     elif (prefix == "ndl") or (prefix == "topology"):
         namespace = GetCreateNamespace(prefix = "ndl",
             uri       = 'http://www.science.uva.nl/research/sne/ndl#',
             schemaurl = 'http://www.science.uva.nl/research/sne/schema/topology.rdf',
             humanurl  = 'http://www.science.uva.nl/research/sne/ndl/?c=11-Topology-Schema',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     elif (prefix == "layer"):
         namespace = GetCreateNamespace(prefix = "layer",
             uri       = 'http://www.science.uva.nl/research/sne/ndl/layer#',
             schemaurl = 'http://www.science.uva.nl/research/sne/schema/layer.rdf',
             humanurl  = 'http://www.science.uva.nl/research/sne/ndl/?c=12-Layer-Schema',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     elif (prefix == "capability"):
         namespace = GetCreateNamespace(prefix = "capability",
             uri       = 'http://www.science.uva.nl/research/sne/ndl/capability#',
             schemaurl = 'http://www.science.uva.nl/research/sne/schema/capability.rdf',
             humanurl  = 'http://www.science.uva.nl/research/sne/ndl/?c=13-Capability-Schema',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     elif (prefix == "domain"):
         namespace = GetCreateNamespace(prefix = "domain",
             uri       = 'http://www.science.uva.nl/research/sne/ndl/domain#',
             schemaurl = 'http://www.science.uva.nl/research/sne/schema/domain.rdf',
             humanurl  = 'http://www.science.uva.nl/research/sne/ndl/?c=14-Domain-Schema',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     elif (prefix == "physical") or (prefix == "location"):
         namespace = GetCreateNamespace(prefix = "physical",
             uri       = 'http://www.science.uva.nl/research/sne/ndl/physical#',
             schemaurl = 'http://www.science.uva.nl/research/sne/schema/physical.rdf',
             humanurl  = 'http://www.science.uva.nl/research/sne/ndl/?c=15-Physical-Schema',
-            metaschema = True)
+            metaschema = True,
+            context   = context)
     else:
         raise UndefinedNamespaceException("The 'well-known' namespace with prefix '%s' is unknown to me. For technology-specific namespaces, use pynt.technologies.GetCreateWellKnownNamespace() instead pynt.xmlns.GetCreateWellKnownNamespace()" % prefix)
     # seeAlso: http://ebiquity.umbc.edu/blogger/100-most-common-rdf-namespaces/
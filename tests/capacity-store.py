@@ -0,0 +1,103 @@
+#!/usr/bin/python
+
+import unittest
+import sys
+sys.path.append('../')
+import pynt.xmlns
+import pynt.elements
+import pynt.capacity
+
+class TestCapacityStore(unittest.TestCase):
+    def setUp(self):
+        """ A device with 4 interfaces, with an available capacity of 0, 100, 200 and 300, and 
+        an interface of another device
+        """
+        pynt.xmlns.DeleteAllRDFObjects()
+        self.namespace = pynt.xmlns.GetCreateNamespace("http://example.net/capacity#")
+        self.context = self.namespace.context
+        self.context.capacitystore = None
+        self.device = pynt.elements.GetCreateDevice("router", self.namespace)
+        self.interfaces = []
+        for i in range(4):
+            interface = self.device.getCreateNativeInterface("port%d" % i)
+            interface.setAvailableCapacity(100.0 * i)
+            self.interfaces.append(interface)
+        self.other = pynt.elements.GetCreateDevice("other", self.namespace).getCreateNativeInterface("other-port0")
+
+    def tearDown(self):
+        self.context.capacitystore = None
+        pynt.xmlns.DeleteAllRDFObjects()
+
+    def getStore(self):
+        store = pynt.capacity.GetCapacityStore(self.context)
+        self.assertEqual(store.sequence, self.context.getJournal().getSequence())
+        return store
+
+    def markUnchanged(self, store):
+        """Overwrite the row of the interface of the other device, which is only read again by a full update."""
+        store.columns["metric"][self.other.getObjectId()] = -1.0
+
+    def retrieveAllBut(self, identifier):
+        """Mark all objects, except the one with the given identifier, as retrieved in the current generation."""
+        for rdfobject in pynt.xmlns.GetAllRDFObjects(context=self.context):
+            if rdfobject.getIdentifier() != identifier:
+                rdfobject.generation = self.context.getGeneration()
+
+    def test_Select(self):
+        """ The store selects and filters interfaces on their available capacity
+        """
+        store = self.getStore()
+        self.assertEqual(store.getInterfaces("availablecapacity", minimum=150), self.interfaces[2:])
+        self.assertEqual(store.filterInterfaces(self.interfaces[::-1], "availablecapacity", below=150), self.interfaces[1::-1])
+        self.assertEqual(store.getValue(self.interfaces[3], "availablecapacity"), 300.0)
+
+    def test_IncrementalUpdate(self):
+        """ An update only reads the connection points in the journal
+        """
+        store = self.getStore()
+        self.markUnchanged(store)
+        self.interfaces[1].setAvailableCapacity(1000.0)
+        store = self.getStore()
+        self.assertEqual(store.getValue(self.interfaces[1], "availablecapacity"), 1000.0)
+        self.assertEqual(store.getValue(self.other, "metric"), -1.0)
+        interface = self.device.getCreateNativeInterface("port4")
+        interface.setAvailableCapacity(500.0)
+        store = self.getStore()
+        self.assertEqual(store.getInterfaces("availablecapacity", minimum=400), [self.interfaces[1], interface])
+        self.assertEqual(store.getValue(self.other, "metric"), -1.0)
+
+    def test_DeviceDomain(self):
+        """ A change of the domain of a device updates the domain of all its interfaces
+        """
+        domain = pynt.elements.GetCreateAdminDomain("domain", self.namespace)
+        store = self.getStore()
+        self.assertEqual(store.getInterfaces("availablecapacity", domain=domain), [])
+        self.device.setDomain(domain)
+        store = self.getStore()
+        self.assertEqual(store.getInterfaces("availablecapacity", minimum=100, domain=domain), self.interfaces[1:])
+        self.assertEqual(list(store.domains[[interface.getObjectId() for interface in self.interfaces]]), [domain.getObjectId()] * 4)
+
+    def test_CollectedInterface(self):
+        """ The row of a collected connection point is cleared
+        """
+        interface = pynt.xmlns.GetCreateRDFObject("temporary", namespace=self.namespace, klass=pynt.elements.Interface)
+        interface.setAvailableCapacity(1000.0)
+        objectid = interface.getObjectId()
+        store = self.getStore()
+        self.markUnchanged(store)
+        self.assertEqual(store.getInterfaces("availablecapacity", minimum=1000), [interface])
+        interface = None
+        self.context.newGeneration()
+        self.retrieveAllBut("temporary")
+        self.assertEqual(pynt.xmlns.CollectRDFObjects(context=self.context), 1)
+        store = self.getStore()
+        self.assertEqual(store.getInterfaces("availablecapacity", minimum=1000), [])
+        self.assertFalse(store.present[objectid])
+        self.assertEqual(store.interfaces[objectid], None)
+        self.assertEqual(store.getValue(self.other, "metric"), -1.0)
+
+TestCapacityStore = unittest.skipIf(not pynt.capacity.IsAvailable(), "NumPy is not installed")(TestCapacityStore)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/python
+
+import unittest
+import sys
+sys.path.append('../')
+import pynt.xmlns
+import pynt.elements
+
+class TestCollectRDFObjects(unittest.TestCase):
+    def setUp(self):
+        """ 20 devices, which are not referenced, and 2 devices which are referenced by an interface
+        """
+        pynt.xmlns.DeleteAllRDFObjects()
+        self.namespace = pynt.xmlns.GetCreateNamespace("http://example.net/collect#")
+        self.context = self.namespace.context
+        for i in range(20):
+            device = pynt.xmlns.GetCreateRDFObject("device%d" % i, namespace=self.namespace, klass=pynt.elements.Device)
+            device.setName("device %d" % i)
+        self.interfaces = []
+        for i in range(2):
+            device = pynt.xmlns.GetCreateRDFObject("referenced%d" % i, namespace=self.namespace, klass=pynt.elements.Device)
+            interface = device.getCreateNativeInterface("port%d" % i)
+            self.interfaces.append(interface)
+        device = None
+
+    def tearDown(self):
+        pynt.xmlns.DeleteAllRDFObjects()
+
+    def test_Collect(self):
+        """ Unreferenced old objects are freed, referenced old objects are registered again
+        """
+        self.context.newGeneration()
+        for interface in self.interfaces:
+            pynt.xmlns.GetRDFObject(interface.getIdentifier(), namespace=self.namespace, klass=pynt.elements.Interface)
+        sequence = self.context.getJournal().getSequence()
+        collected = pynt.xmlns.CollectRDFObjects(context=self.context)
+        self.assertEqual(collected, 20)
+        devices = pynt.xmlns.GetAllRDFObjects(klass=pynt.elements.Device, context=self.context)
+        self.assertEqual([device.getIdentifier() for device in devices], ["referenced0", "referenced1"])
+        self.assertEqual(set(pynt.xmlns.GetAllRDFObjects(namespace=self.namespace)), set(devices + self.interfaces))
+        for device in devices:
+            self.assertEqual(pynt.xmlns.GetRDFObject(device.getIdentifier(), namespace=self.namespace), device)
+        self.assertRaises(pynt.xmlns.UndefinedNamespaceException, pynt.xmlns.GetRDFObject, "device0", namespace=self.namespace)
+        changes = self.context.getJournal().getChanges(sequence)
+        self.assertEqual(len(changes), 20)
+        for (sequence, subject, change, value) in changes:
+            self.assertEqual(change, "delete")
+            self.assert_(isinstance(subject, pynt.xmlns.CollectedRDFObject))
+            self.assert_(subject.getIdentifier().startswith("device"))
+        self.assertEqual(len(set([subject.getIdentifier() for (sequence, subject, change, value) in changes])), 20)
+        # the journal does not keep the collected objects alive
+        self.assertEqual([subject for (sequence, subject, change, value) in self.context.getJournal().getChanges(0) \
+                if isinstance(subject, pynt.elements.Device) and subject.getIdentifier().startswith("device")], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
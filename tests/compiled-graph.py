@@ -0,0 +1,81 @@
+#!/usr/bin/python
+
+import unittest
+import sys
+sys.path.append('../')
+import pynt.xmlns
+import pynt.elements
+import pynt.layers
+import pynt.graph
+import pynt.technologies.ethernet
+
+class TestCompiledGraph(unittest.TestCase):
+    def setUp(self):
+        """ A switch with 3 ports, a tagged port of an Ethernet switch, links, a connection, a broadcast 
+        segment, a cross connect and an adaptation to a MAC interface
+        """
+        pynt.xmlns.DeleteAllRDFObjects()
+        self.namespace = pynt.xmlns.GetCreateNamespace("http://example.net/graph#")
+        self.context = self.namespace.context
+        ethernet = pynt.technologies.ethernet.GetLayer('ethernet')
+        mac = pynt.technologies.ethernet.GetLayer('mac')
+        device = pynt.elements.GetCreateDevice("switch", self.namespace)
+        switchmatrix = pynt.xmlns.GetCreateRDFObject("switchmatrix", namespace=self.namespace, klass=pynt.elements.SwitchMatrix)
+        switchmatrix.setLayer(ethernet)
+        switchmatrix.setDevice(device)
+        switchmatrix.setSwitchingCapability(True)
+        ports = []
+        for p in range(3):
+            interface = device.getCreateNativeInterface("port%d" % p)
+            interface.setLayer(ethernet)
+            interface.setSwitchMatrix(switchmatrix)
+            ports.append(interface)
+        ports[0].addSwitchedInterface(ports[1], bidirectional=True)
+        client = device.getCreateNativeInterface("port0-mac")
+        client.setLayer(mac)
+        adaptationfunction = pynt.layers.GetCreateAdaptationFunction("MAC-in-Ethernet", self.namespace, clientlayer=mac, serverlayer=ethernet)
+        ports[0].addClientInterface(client, adaptationfunction)
+        ethernetdevice = pynt.xmlns.GetCreateRDFObject("ethernetswitch", namespace=self.namespace, klass=pynt.technologies.ethernet.EthernetDevice)
+        tagged = ethernetdevice.getCreateNativeInterface("tagged")
+        tagged.setSwitchMatrix(ethernetdevice.getSwitchMatrix())
+        for vlanid in range(100, 110):
+            tagged.addTaggedVLAN(vlanid)
+        tagged.getTaggedInterface(105)
+        untagged = ethernetdevice.getCreateNativeInterface("untagged")
+        untagged.setSwitchMatrix(ethernetdevice.getSwitchMatrix())
+        untagged.setUntaggedVLANid(105)
+        ports[0].addLinkedInterface(tagged)
+        tagged.addLinkedInterface(ports[0])
+        ports[1].addConnectedInterface(untagged)
+        segment = pynt.elements.GetCreateBroadcastSegment("segment", self.namespace)
+        segment.setLayer(ethernet)
+        ports[2].setBroadcastSegment(segment)
+        untagged.setBroadcastSegment(segment)
+
+    def tearDown(self):
+        pynt.xmlns.DeleteAllRDFObjects()
+
+    def test_Adjacency(self):
+        """ The CSR offsets and targets of each kind match ConnectionPoint.getNeighbours()
+        """
+        graph = pynt.graph.GetCompiledGraph(self.context)
+        for kind in pynt.elements.neighbourfunctions:
+            offsets = graph.getOffsets(kind)
+            targets = graph.targets[kind]
+            vias = graph.vias[kind]
+            self.assertEqual(len(offsets), graph.getNodeCount() + 1)
+            self.assertEqual(offsets[-1], len(targets))
+            self.assertEqual(len(vias), len(targets))
+            for (nodeid, node) in enumerate(graph.nodes):
+                if isinstance(node, pynt.elements.ConnectionPoint):
+                    expected = [(neighbour, via) for (neighbour, via) in node.getNeighbours(kind) if graph.getNodeId(neighbour) != None]
+                else:
+                    expected = []
+                compiled = [(graph.getNode(targets[i]), vias[i]) for i in xrange(offsets[nodeid], offsets[nodeid+1])]
+                self.assertEqual(compiled, expected, "%s neighbours of %s" % (kind, node))
+                self.assertEqual(list(graph.getNeighbourIds(nodeid, kind)), [graph.getNodeId(neighbour) for (neighbour, via) in expected])
+            self.assert_(len(targets) > 0, "no %s neighbours" % kind)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+
+import unittest
+import sys
+sys.path.append('../')
+import pynt.xmlns
+import pynt.elements
+import pynt.graph
+import pynt.technologies.ethernet
+
+class TestTaggedVLANs(unittest.TestCase):
+    def setUp(self):
+        """ A switch with one port, tagged with 60 VLANs
+        """
+        pynt.xmlns.DeleteAllRDFObjects()
+        self.namespace = pynt.xmlns.GetCreateNamespace("http://example.net/tagged#")
+        self.device = pynt.xmlns.GetCreateRDFObject("switch", namespace=self.namespace, klass=pynt.technologies.ethernet.EthernetDevice)
+        self.port = self.device.getCreateNativeInterface("port1")
+        self.port.setSwitchMatrix(self.device.getSwitchMatrix())
+        for vlanid in range(100, 160):
+            self.port.addTaggedVLAN(vlanid)
+
+    def tearDown(self):
+        pynt.xmlns.DeleteAllRDFObjects()
+
+    def countObjects(self):
+        return len(pynt.xmlns.GetAllRDFObjects())
+
+    def test_Queries(self):
+        """ Adaptation and logical interface queries are answered by one potential client interface
+        """
+        self.port.getAllClientTuples()
+        count = self.countObjects()
+        potential = self.port.getPotentialTaggedInterface()
+        self.assert_(isinstance(potential, pynt.elements.PotentialMuxInterface))
+        self.assertEqual(str(potential.getLabelSet()), "{100-159}")
+        self.assertEqual(self.port.getClientInterfaces(), [])
+        self.assertEqual(self.port.getAllClientTuples()[0][0], potential)
+        self.assertEqual(self.port.getClientAdaptationFunction().getName(), "Tagged Ethernet")
+        self.assert_(potential in self.device.getLogicalInterfaces())
+        self.assertEqual(len(self.port.getTaggedVLANids()), 60)
+        pynt.graph.GetCompiledGraph(self.namespace.context)
+        self.assertEqual(self.countObjects(), count)
+
+    def test_SpecificVLAN(self):
+        """ Using a specific VLAN creates one client interface, and removes it from the potential interface
+        """
+        self.port.getAllClientTuples()
+        count = self.countObjects()
+        interface = self.port.getTaggedInterface(120)
+        self.assertEqual(self.countObjects(), count + 1)
+        self.assertEqual(interface.getLabel(), 120)
+        self.assertEqual(self.port.getClientInterfaces(), [interface])
+        potential = self.port.getPotentialTaggedInterface()
+        self.assertEqual(str(potential.getLabelSet()), "{100-119, 121-159}")
+        self.assertEqual(self.port.getTaggedInterface(120), interface)
+        self.assertEqual(self.countObjects(), count + 1)
+
+    def test_AllVLANsCreated(self):
+        """ The potential interface is removed from the adaptation when all VLANs are created
+        """
+        self.port.getAllClientTuples()
+        self.port.createTaggedInterfaces()
+        self.assertEqual(self.port.getPotentialTaggedInterface(), None)
+        clients = [client for (client, adaptation) in self.port.getAllClientTuples()]
+        self.assertEqual(len(clients), 60)
+        self.assertEqual([client for client in clients if client.isPotential()], [])
+        self.port.addTaggedVLAN(200)
+        self.assertEqual(str(self.port.getPotentialTaggedInterface().getLabelSet()), "{200}")
+        self.assertEqual(len(self.port.getAllClientTuples()), 61)
+
+
+if __name__ == '__main__':
+    unittest.main()
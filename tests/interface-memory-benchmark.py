@@ -0,0 +1,94 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Benchmark for the memory use of interfaces. Creates N interfaces of a few common
+classes, as a fetcher does for tagged VLAN interfaces, and reports the bytes per interface:
+the size of the object with its own attribute dict and containers, and the growth of the
+resident memory of the process (which includes the indexes of pynt.xmlns)."""
+
+import sys
+import gc
+import optparse
+sys.path.append('../')
+import pynt.xmlns
+import pynt.elements
+import pynt.rangeset
+import pynt.technologies.ethernet
+
+
+def ObjectSize(subject, seen=None):
+    """Return the size of subject, including the dicts, lists and label sets owned by it.
+    Other RDF objects, layers and the shared empty containers are not counted."""
+    if seen == None:
+        seen = set(sharedcontainers)
+    seen.add(id(subject))
+    size = sys.getsizeof(subject)
+    for referent in gc.get_referents(subject):
+        if id(referent) in seen:
+            continue
+        if isinstance(referent, (dict, list, tuple, pynt.rangeset.RangeSet)):
+            size += ObjectSize(referent, seen)
+    return size
+
+
+# shared empty containers (not present in older versions, so the benchmark can compare)
+sharedcontainers = set([id(getattr(pynt.xmlns, name)) for name in ('emptylist', 'emptydict') if hasattr(pynt.xmlns, name)])
+
+
+def ResidentMemory():
+    """Return the resident memory of this process in bytes, or None if unknown (Linux only)."""
+    try:
+        return int(open("/proc/self/statm").read().split()[1]) * 4096
+    except (IOError, IndexError, ValueError):
+        return None
+
+
+def CreateInterfaces(klass, count, labelset=None):
+    namespace = pynt.xmlns.GetCreateNamespace("http://example.net/memory/%s#" % klass.__name__)
+    layer = pynt.technologies.ethernet.GetLayer('ethernet')
+    interfaces = []
+    for i in range(count):
+        interface = pynt.elements.GetCreateConnectionPoint("interface%d" % i, namespace, klass=klass)
+        interface.setLayer(layer)
+        if labelset != None:
+            if isinstance(interface, pynt.elements.SingleLabelCPMixIn):
+                interface.setLabel(1)
+            interface.setLabelSet(labelset)
+        interfaces.append(interface)
+    return interfaces
+
+
+def RunBenchmark(klass, count, labelset=None):
+    gc.collect()
+    before = ResidentMemory()
+    interfaces = CreateInterfaces(klass, count, labelset)
+    gc.collect()
+    after = ResidentMemory()
+    objectsize = sum([ObjectSize(interface) for interface in interfaces]) / float(count)
+    if (before == None) or (after == None):
+        return (objectsize, None)
+    return (objectsize, (after - before) / float(count))
+
+
+def Main():
+    parser = optparse.OptionParser()
+    parser.add_option("-n", "--interfaces", dest="count", type="int", default=20000, help="number of interfaces per class")
+    (options, args) = parser.parse_args()
+    vlans = pynt.rangeset.RangeSet("1-4095", itemtype=int)
+    benchmarks = [
+            (pynt.elements.Interface, None),
+            (pynt.technologies.ethernet.EthernetInterface, None),
+            (pynt.elements.ConfigurableInterface, vlans),
+            (pynt.elements.PotentialMuxInterface, vlans),
+        ]
+    print "%-24s %10s %14s %14s" % ("class", "interfaces", "object (B)", "resident (B)")
+    for (klass, labelset) in benchmarks:
+        (objectsize, residentsize) = RunBenchmark(klass, options.count, labelset)
+        if residentsize == None:
+            residentsize = "unknown"
+        else:
+            residentsize = "%.0f" % residentsize
+        print "%-24s %10d %14.0f %14s" % (klass.__name__, options.count, objectsize, residentsize)
+
+
+if __name__ == '__main__':
+    Main()
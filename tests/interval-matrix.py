@@ -0,0 +1,43 @@
+#!/usr/bin/python
+
+import unittest
+import sys
+sys.path.append('../')
+import pynt.rangeset
+
+
+class TestIntervalMatrixItemTypes(unittest.TestCase):
+    def setUp(self):
+        self.integers = pynt.rangeset.RangeSet("1-10", itemtype=int, interval=1)
+        self.floats = pynt.rangeset.RangeSet("3.0-6.0", itemtype=float, interval=1.0)
+        self.bitmap = pynt.rangeset.BitmapRangeSet("3-20")
+
+    def assertCombined(self, results, expected):
+        self.assertEqual([(result.itemtype, str(result)) for result in results], \
+                [(rangeset.itemtype, str(rangeset)) for rangeset in expected])
+
+    def test_MixedIntegersAndFloats(self):
+        """ A batch of sets of integers and floats is not combined as integers
+        """
+        groups = [[self.integers, self.integers], [self.floats, self.floats]]
+        self.assertFalse(pynt.rangeset._useIntervalMatrix(groups))
+        self.assertCombined(pynt.rangeset.IntersectAll(groups), [self.integers, self.floats])
+        self.assertCombined(pynt.rangeset.UnionAll(groups), [self.integers, self.floats])
+        if pynt.rangeset.IsIntervalMatrixAvailable():
+            self.assertRaises(ValueError, pynt.rangeset.IntervalMatrix, groups)
+
+    def test_FloatsWithBitmap(self):
+        """ A batch of sets of floats with a group of BitmapRangeSets is not combined in one matrix
+        """
+        groups = [[self.floats], [self.bitmap, self.bitmap]]
+        self.assertFalse(pynt.rangeset._useIntervalMatrix(groups))
+        self.assertCombined(pynt.rangeset.IntersectAll(groups), [self.floats, self.bitmap])
+        self.assertCombined(pynt.rangeset.UnionAll(groups), [self.floats, self.bitmap])
+        groups = [[self.floats], [pynt.rangeset.BitmapRangeSet(None)]]
+        self.assertFalse(pynt.rangeset._useIntervalMatrix(groups))
+        if pynt.rangeset.IsIntervalMatrixAvailable():
+            self.assertRaises(ValueError, pynt.rangeset.IntervalMatrix, groups)
+
+
+if __name__ == '__main__':
+    unittest.main()
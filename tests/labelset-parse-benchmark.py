@@ -0,0 +1,137 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Benchmark for parsing and printing the label sets of a large NDL file. Writes an NDL file with
+N interfaces, each with a nmwgt:vlanRangeAvailability of random, unsorted and overlapping VLAN
+ranges, as written by pynt.output.manualrdf. The file is read with xml.sax, and the time to parse
+the label sets with RangeSet, SortedRangeSet and BitmapRangeSet is reported, as well as the time
+to print them twice (the second time, the string is cached). For comparison, the first row builds
+each RangeSet item by item with add(). The printed label sets of all classes are compared."""
+
+import sys
+import os
+import time
+import random
+import tempfile
+import optparse
+import StringIO
+import xml.sax
+import xml.sax.handler
+sys.path.append('../')
+import pynt.rangeset
+
+
+ndlheader = """<?xml version="1.0" encoding="UTF-8"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:ndl="http://www.science.uva.nl/research/sne/ndl#"
+         xmlns:nmwgt="http://ogf.org/schema/network/topology/base/20070828/">
+"""
+ndlinterface = """<ndl:Interface rdf:about="#intf%d">
+    <ndl:name>intf%d</ndl:name>
+    <nmwgt:vlanRangeAvailability>%s</nmwgt:vlanRangeAvailability>
+</ndl:Interface>
+"""
+ndlfooter = """</rdf:RDF>
+"""
+
+def RandomLabels(rangecount, rng):
+    """Return a string with rangecount random VLAN ranges and single VLANs, like "6,8-15,24-32,48"."""
+    items = []
+    for i in range(rangecount):
+        min = rng.randint(0, 4095)
+        if rng.random() < 0.5:
+            items.append("%d" % min)
+        else:
+            items.append("%d-%d" % (min, rng.randint(min, 4095)))
+    return ",".join(items)
+
+def WriteNdl(filename, interfacecount, rangecount, rng):
+    ndlfile = open(filename, 'w')
+    ndlfile.write(ndlheader)
+    for i in range(interfacecount):
+        ndlfile.write(ndlinterface % (i, i, RandomLabels(rangecount, rng)))
+    ndlfile.write(ndlfooter)
+    ndlfile.close()
+
+
+class LabelHandler(xml.sax.handler.ContentHandler):
+    """Collect the text of all nmwgt:vlanRangeAvailability elements."""
+    def __init__(self):
+        self.labelstrings = []
+        self.text = None
+    def startElement(self, name, attrs):
+        if name == "nmwgt:vlanRangeAvailability":
+            self.text = []
+    def characters(self, content):
+        if self.text != None:
+            self.text.append(content)
+    def endElement(self, name):
+        if name == "nmwgt:vlanRangeAvailability":
+            self.labelstrings.append(str("".join(self.text)))
+            self.text = None
+
+def ReadNdl(filename):
+    handler = LabelHandler()
+    xml.sax.parse(filename, handler)
+    return handler.labelstrings
+
+
+def AddItems(labelstring):
+    """Build a RangeSet item by item."""
+    rangeset = pynt.rangeset.RangeSet(None, itemtype=int, interval=1)
+    for item in labelstring.split(","):
+        rangeset.add(item)
+    return rangeset
+
+def Print(rangesets):
+    output = StringIO.StringIO()
+    for rangeset in rangesets:
+        output.write('<nmwgt:vlanRangeAvailability>%s</nmwgt:vlanRangeAvailability>\n' % str(rangeset)[1:-1])
+    return output.getvalue()
+
+def Timed(function, *args):
+    starttime = time.time()
+    result = function(*args)
+    return (time.time() - starttime, result)
+
+parsers = [
+    # name, function to parse a label string
+    ("add()",           AddItems),
+    ("RangeSet",        lambda labelstring: pynt.rangeset.RangeSet(labelstring, itemtype=int, interval=1)),
+    ("SortedRangeSet",  lambda labelstring: pynt.rangeset.SortedRangeSet(labelstring, itemtype=int, interval=1)),
+    ("BitmapRangeSet",  lambda labelstring: pynt.rangeset.BitmapRangeSet(labelstring, offset=0)),
+]
+
+
+def Main():
+    parser = optparse.OptionParser()
+    parser.add_option("-n", "--interfaces", dest="interfacecount", type="int", default=10000, help="number of interfaces")
+    parser.add_option("-r", "--ranges", dest="rangecount", type="int", default=20, help="number of ranges in the label set of each interface")
+    parser.add_option("-f", "--file", dest="filename", default=None, help="write the NDL file to this file, and keep it")
+    parser.add_option("-s", "--seed", dest="seed", type="int", default=1, help="seed of the random labels")
+    (options, args) = parser.parse_args()
+    filename = options.filename
+    if filename == None:
+        (handle, filename) = tempfile.mkstemp(suffix=".rdf")
+        os.close(handle)
+    try:
+        WriteNdl(filename, options.interfacecount, options.rangecount, random.Random(options.seed))
+        (readduration, labelstrings) = Timed(ReadNdl, filename)
+    finally:
+        if options.filename == None:
+            os.remove(filename)
+    print "%d interfaces with %d ranges each, read in %.4f s" % (len(labelstrings), options.rangecount, readduration)
+    print "%-15s %12s %12s %12s" % ("class", "parse", "print", "print again")
+    outputs = []
+    for (name, function) in parsers:
+        (parseduration, rangesets) = Timed(lambda: [function(labelstring) for labelstring in labelstrings])
+        (printduration, output) = Timed(Print, rangesets)
+        (cachedduration, cachedoutput) = Timed(Print, rangesets)
+        print "%-15s %12.4f %12.4f %12.4f" % (name, parseduration, printduration, cachedduration)
+        assert(output == cachedoutput)
+        outputs.append(output)
+    for output in outputs[1:]:
+        assert(output == outputs[0])
+
+
+if __name__ == '__main__':
+    Main()
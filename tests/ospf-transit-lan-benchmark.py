@@ -0,0 +1,118 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Benchmark for loading an OSPF dump with large transit LANs. Writes a Quagga OSPF dump with
+N routers, each with a point-to-point link to the next router, a stub network, and an interface
+on one of L transit LANs, plus a network LSA for each transit LAN. The dump is read with
+OspfEmulatorInput, and the time to build the topology with OspfFetcher.parseLSAs() is reported."""
+
+import sys
+import os
+import time
+import struct
+import tempfile
+import optparse
+sys.path.append('../')
+import pynt.xmlns
+import pynt.elements
+import pynt.input.ospf
+import pynt.protocols.ospfinput
+
+
+def IpAddress(address):
+    return "".join([chr(int(b)) for b in address.split(".")])
+
+def RouterId(routerno):
+    return "10.%d.%d.1" % (routerno // 256, routerno % 256)
+
+def LanAddress(lanno, hostno):
+    return "10.%d.%d.%d" % (128 + lanno, hostno // 256, hostno % 256)
+
+
+def PackLSA(lsatype, linkstateid, advertisingrouter, body, sequence):
+    """Return a Quagga message with a LSA: message header, change header, LSA header and body."""
+    lsaheader = struct.pack("!HBB4s4sIHH", 1, 0, lsatype, IpAddress(linkstateid), IpAddress(advertisingrouter),
+            0x80000001, 0, 20 + len(body))
+    changeheader = struct.pack("!4sIB3x", IpAddress(advertisingrouter), 0, 0)
+    message = changeheader + lsaheader + body
+    return struct.pack("!BBHI", 1, 4, len(message), sequence) + message
+
+def PackRouterLSA(routerno, routercount, lancount, sequence):
+    routerid = RouterId(routerno)
+    lanno = routerno % lancount
+    links = [
+        # point-to-point link to the next router
+        (RouterId((routerno + 1) % routercount), "192.168.%d.%d" % (routerno // 256, routerno % 256), 1, 10),
+        # transit network: link id is the address of the designated router (host 1 of the LAN)
+        (LanAddress(lanno, 1), LanAddress(lanno, 2 + routerno // lancount), 2, 10),
+        # stub network
+        ("172.%d.%d.0" % (16 + routerno // 256, routerno % 256), "255.255.255.0", 3, 1),
+    ]
+    body = struct.pack("!BBH", 0, 0, len(links))
+    for (linkid, linkdata, linktype, metric) in links:
+        body += struct.pack("!4s4sBBH", IpAddress(linkid), IpAddress(linkdata), linktype, 0, metric)
+    return PackLSA(1, routerid, routerid, body, sequence)
+
+def PackNetworkLSA(lanno, routercount, lancount, sequence):
+    attachedrouters = [RouterId(routerno) for routerno in range(lanno, routercount, lancount)]
+    body = IpAddress("255.255.0.0") + "".join([IpAddress(routerid) for routerid in attachedrouters])
+    return PackLSA(2, LanAddress(lanno, 1), attachedrouters[0], body, sequence)
+
+def WriteDump(filename, routercount, lancount):
+    dumpfile = open(filename, 'wb')
+    sequence = 0
+    for routerno in range(routercount):
+        sequence += 1
+        dumpfile.write(PackRouterLSA(routerno, routercount, lancount, sequence))
+    for lanno in range(lancount):
+        sequence += 1
+        dumpfile.write(PackNetworkLSA(lanno, routercount, lancount, sequence))
+    dumpfile.close()
+
+
+def ReadDump(filename):
+    io = pynt.protocols.ospfinput.OspfEmulatorInput(filename=filename)
+    io.connect()
+    try:
+        return io.getLSAs()
+    finally:
+        io.io.close()
+
+
+def RunBenchmark(lsas):
+    pynt.xmlns.DeleteAllRDFObjects()
+    fetcher = pynt.input.ospf.OspfFetcher("ospf", identifier="ospf", nsuri="http://example.net/ospf#")
+    starttime = time.time()
+    fetcher.parseLSAs(lsas)
+    return time.time() - starttime
+
+
+def Main():
+    parser = optparse.OptionParser()
+    parser.add_option("-r", "--routers", dest="routercount", type="int", default=2000, help="number of routers")
+    parser.add_option("-l", "--lans", dest="lancount", type="int", default=4, help="number of transit LANs")
+    parser.add_option("-f", "--file", dest="filename", default=None, help="write the OSPF dump to this file, and keep it")
+    parser.add_option("-i", "--iterations", dest="iterations", type="int", default=3, help="number of loads")
+    (options, args) = parser.parse_args()
+    filename = options.filename
+    if filename == None:
+        (handle, filename) = tempfile.mkstemp(suffix=".ospf")
+        os.close(handle)
+    try:
+        WriteDump(filename, options.routercount, options.lancount)
+        lsas = ReadDump(filename)
+    finally:
+        if options.filename == None:
+            os.remove(filename)
+    print "%d routers, %d transit LANs of about %d routers, %d LSAs" % (options.routercount, options.lancount,
+            options.routercount // options.lancount, len(lsas))
+    durations = [RunBenchmark(lsas) for i in range(options.iterations)]
+    segments = pynt.xmlns.GetAllRDFObjects(klass=pynt.elements.BroadcastSegment)
+    print "%d objects, %d broadcast segments, largest has %d interfaces" % (len(pynt.xmlns.GetAllRDFObjects()),
+            len(segments), max([len(segment.getConnectedInterfaces()) for segment in segments]))
+    print "%-12s %10s" % ("load", "time (s)")
+    for (i, duration) in enumerate(durations):
+        print "%-12d %10.3f" % (i + 1, duration)
+
+
+if __name__ == '__main__':
+    Main()
@@ -0,0 +1,84 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Benchmark for the cost of logging during path finding. Searches a path through a chain
+of Ethernet switches, with the log level at WARNING and at DEBUG, and with tracing turned
+off by pynt.logger.SetTracing(False). Log messages are formatted, but not written."""
+
+import sys
+import time
+import logging
+import optparse
+sys.path.append('../')
+import pynt.logger
+import pynt.xmlns
+import pynt.elements
+import pynt.algorithm
+import pynt.algorithm.output
+import pynt.technologies.ethernet
+
+
+class NullHandler(logging.Handler):
+    """Handler that formats each message, but discards the result."""
+    def emit(self, record):
+        self.format(record)
+
+
+def CreateChain(devicecount, portcount):
+    """Create a chain of Ethernet devices. Returns the first and last interface."""
+    namespace = pynt.xmlns.GetCreateNamespace("http://example.net/logging#")
+    layer = pynt.technologies.ethernet.GetLayer('ethernet')
+    interfaces = {}
+    for d in range(devicecount):
+        device = pynt.xmlns.GetCreateRDFObject("device%d" % d, namespace=namespace, klass=pynt.technologies.ethernet.EthernetDevice)
+        switchmatrix = device.getSwitchMatrix()
+        for p in range(portcount):
+            interface = device.getCreateNativeInterface("device%d-port%d" % (d, p))
+            interface.setLayer(layer)
+            interface.setSwitchMatrix(switchmatrix)
+            interfaces[(d, p)] = interface
+    for d in range(devicecount - 1):
+        interfaces[(d, 1)].addLinkedInterface(interfaces[(d+1, 0)])
+        interfaces[(d+1, 0)].addLinkedInterface(interfaces[(d, 1)])
+    return (interfaces[(0, 0)], interfaces[(devicecount-1, portcount-1)])
+
+
+def RunBenchmark(algorithmclass, source, destination, iterations):
+    starttime = time.time()
+    for i in range(iterations):
+        algorithm = algorithmclass()
+        algorithm.setPrinter(pynt.algorithm.output.NoPrinter())
+        algorithm.setEndpoints(source, destination)
+        algorithm.findShortestPath()
+    return time.time() - starttime
+
+
+def Main():
+    parser = optparse.OptionParser()
+    parser.add_option("-d", "--devices", dest="devicecount", type="int", default=8, help="number of devices in the chain")
+    parser.add_option("-p", "--ports", dest="portcount", type="int", default=4, help="number of ports per device")
+    parser.add_option("-i", "--iterations", dest="iterations", type="int", default=200, help="number of searches per setting")
+    (options, args) = parser.parse_args()
+    rootlogger = logging.getLogger()
+    for handler in rootlogger.handlers[:]:
+        rootlogger.removeHandler(handler)
+    rootlogger.addHandler(NullHandler())
+    rootlogger.setLevel(logging.WARNING)
+    (source, destination) = CreateChain(options.devicecount, options.portcount)
+    settings = [
+            ("WARNING", logging.WARNING, True),
+            ("DEBUG", logging.DEBUG, True),
+            ("DEBUG, tracing off", logging.DEBUG, False),
+        ]
+    print "%-20s %-12s %10s %12s" % ("log level", "algorithm", "time (s)", "searches/s")
+    for algorithmclass in [pynt.algorithm.PathFind, pynt.algorithm.PFAvailable]:
+        for (name, loglevel, tracing) in settings:
+            rootlogger.setLevel(loglevel)
+            pynt.logger.SetTracing(tracing)
+            duration = RunBenchmark(algorithmclass, source, destination, options.iterations)
+            print "%-20s %-12s %10.3f %12.1f" % (name, algorithmclass.__name__, duration, options.iterations / duration)
+    rootlogger.setLevel(logging.WARNING)
+    pynt.logger.SetTracing(True)
+
+
+if __name__ == '__main__':
+    Main()
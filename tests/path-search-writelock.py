@@ -0,0 +1,75 @@
+#!/usr/bin/python
+
+import unittest
+import threading
+import sys
+sys.path.append('../')
+import pynt.xmlns
+import pynt.algorithm
+import pynt.algorithm.output
+import pynt.technologies.ethernet
+
+class TestPathSearchWritelock(unittest.TestCase):
+    def setUp(self):
+        """ A chain of 4 Ethernet switches, with 2 ports each: device0-port0 ... device3-port1
+        """
+        pynt.xmlns.DeleteAllRDFObjects()
+        self.namespace = pynt.xmlns.GetCreateNamespace("http://example.net/chain#")
+        self.context = self.namespace.context
+        layer = pynt.technologies.ethernet.GetLayer('ethernet')
+        self.ports = {}
+        for d in range(4):
+            device = pynt.xmlns.GetCreateRDFObject("device%d" % d, namespace=self.namespace, klass=pynt.technologies.ethernet.EthernetDevice)
+            for p in range(2):
+                interface = device.getCreateNativeInterface("device%d-port%d" % (d, p))
+                interface.setLayer(layer)
+                interface.setSwitchMatrix(device.getSwitchMatrix())
+                self.ports[(d, p)] = interface
+        for d in range(3):
+            self.ports[(d, 1)].addLinkedInterface(self.ports[(d+1, 0)])
+            self.ports[(d+1, 0)].addLinkedInterface(self.ports[(d, 1)])
+
+    def tearDown(self):
+        pynt.xmlns.DeleteAllRDFObjects()
+
+    def search(self, result):
+        algorithm = pynt.algorithm.PathFind()
+        algorithm.setPrinter(pynt.algorithm.output.NoPrinter())
+        algorithm.labelcontinuity = True
+        algorithm.setEndpoints(self.ports[(0, 0)], self.ports[(3, 1)])
+        result.extend(algorithm.findShortestPath())
+
+    def test_LabelsChangedDuringFetch(self):
+        """ A search does not see the labels of a half-applied fetch, but waits for the fetch
+        """
+        result = []
+        self.search(result)
+        self.assertEqual(len(result), 1)
+        halfway = threading.Event()
+        proceed = threading.Event()
+        def fetch():
+            self.context.writelock.acquire()
+            try:
+                self.ports[(1, 0)].setLabel(150)
+                halfway.set()
+                proceed.wait()
+                self.ports[(2, 1)].setLabel(151)
+            finally:
+                self.context.writelock.release()
+        fetcher = threading.Thread(target=fetch)
+        fetcher.start()
+        halfway.wait()
+        result = []
+        searcher = threading.Thread(target=self.search, args=(result,))
+        searcher.start()
+        searcher.join(0.2)
+        self.assert_(searcher.isAlive(), "search did not wait for the fetch")
+        proceed.set()
+        fetcher.join()
+        searcher.join()
+        # the search sees both labels, so there is no common label
+        self.assertEqual(result, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Benchmark for pynt.rangeset.RangeSet, SortedRangeSet and BitmapRangeSet with label sets. Builds 
+random sets of VLAN tags (integers 0-4095) and of wavelengths (750.0-1700.0 nm, in steps of 0.1 nm), 
+item by item, and reports the time to build them, and to compute the union, intersection and 
+difference, and membership of each item, with each implementation. BitmapRangeSet only stores 
+integers, so it is skipped for wavelengths. The set operations are also timed on interned sets, 
+where all but the first iteration are cache hits. The results of all implementations are compared.
+Finally, the common labels of a batch of paths are computed with IntersectAll(), which uses an 
+IntervalMatrix if NumPy is installed, and with one intersection per hop."""
+
+import sys
+import time
+import random
+import optparse
+sys.path.append('../')
+import pynt.rangeset
+
+
+def VlanItems(count, rng):
+    return [rng.randint(0, 4095) for i in range(count)]
+
+def WavelengthItems(count, rng):
+    return [round(750.0 + 0.1 * rng.randint(0, 9500), 1) for i in range(count)]
+
+labelspaces = [
+    # name, function returning random items, itemtype, interval
+    ("vlan",        VlanItems,          int,    1),
+    ("wavelength",  WavelengthItems,    float,  0.1),
+]
+
+
+def Build(klass, items, itemtype, interval):
+    rangeset = klass(None, itemtype=itemtype, interval=interval)
+    for item in items:
+        rangeset.add(item)
+    return rangeset
+
+def Timed(function, *args):
+    starttime = time.time()
+    result = function(*args)
+    return (time.time() - starttime, result)
+
+def RunBenchmark(klass, items1, items2, itemtype, interval, iterations):
+    """Return a dict operation -> duration, and the resulting sets."""
+    durations = {}
+    (durations["build"], set1) = Timed(Build, klass, items1, itemtype, interval)
+    set2 = Build(klass, items2, itemtype, interval)
+    results = {}
+    for operation in ["union", "intersection", "difference"]:
+        function = getattr(set1, operation)
+        starttime = time.time()
+        for i in range(iterations):
+            results[operation] = function(set2)
+        durations[operation] = time.time() - starttime
+    starttime = time.time()
+    results["contains"] = [item in set1 for item in items2]
+    durations["contains"] = time.time() - starttime
+    starttime = time.time()
+    for i in range(iterations):
+        results["len"] = len(results["union"])
+    durations["len"] = time.time() - starttime
+    return (durations, set1, results)
+
+def RunInternedBenchmark(set1, set2, iterations):
+    """Return a dict operation -> duration, for interned copies of the given sets."""
+    durations = {}
+    (durations["build"], set1) = Timed(pynt.rangeset.Intern, set1)
+    set2 = pynt.rangeset.Intern(set2)
+    results = {}
+    for operation in ["union", "intersection", "difference"]:
+        function = getattr(set1, operation)
+        starttime = time.time()
+        for i in range(iterations):
+            results[operation] = function(set2)
+        durations[operation] = time.time() - starttime
+    return (durations, results)
+
+def RunBatchBenchmark(groups):
+    """Return the durations of IntersectAll() and of one intersection per set, and the results."""
+    (matrixduration, matrixresult) = Timed(pynt.rangeset.IntersectAll, groups)
+    starttime = time.time()
+    result = []
+    for group in groups:
+        common = group[0]
+        for rangeset in group[1:]:
+            common = common.intersection(rangeset)
+        result.append(common)
+    return (matrixduration, time.time() - starttime, matrixresult, result)
+
+
+def Main():
+    parser = optparse.OptionParser()
+    parser.add_option("-n", "--items", dest="itemcount", type="int", default=1000, help="number of random items in each set")
+    parser.add_option("-i", "--iterations", dest="iterations", type="int", default=5, help="number of times each set operation is done")
+    parser.add_option("-s", "--seed", dest="seed", type="int", default=1, help="seed of the random items")
+    parser.add_option("-p", "--paths", dest="pathcount", type="int", default=200, help="number of paths in the batch")
+    parser.add_option("-l", "--hops", dest="hopcount", type="int", default=10, help="number of hops of each path in the batch")
+    (options, args) = parser.parse_args()
+    operations = ["build", "union", "intersection", "difference", "contains"]
+    print "%-11s %-15s %8s %s" % ("labels", "class", "ranges", " ".join(["%12s" % operation for operation in operations + ["len"]]))
+    for (name, itemfunction, itemtype, interval) in labelspaces:
+        rng = random.Random(options.seed)
+        items1 = itemfunction(options.itemcount, rng)
+        items2 = itemfunction(options.itemcount, rng)
+        results = []
+        classes = [pynt.rangeset.RangeSet, pynt.rangeset.SortedRangeSet]
+        if (itemtype == int) and (interval == 1):
+            classes.append(pynt.rangeset.BitmapRangeSet)
+        for klass in classes:
+            (durations, rangeset, result) = RunBenchmark(klass, items1, items2, itemtype, interval, options.iterations)
+            results.append((rangeset, result))
+            print "%-11s %-15s %8d %s" % (name, klass.__name__, len(rangeset.ranges), " ".join(["%12.4f" % durations[operation] for operation in operations + ["len"]]))
+            if klass != pynt.rangeset.RangeSet:
+                (interneddurations, internedresult) = RunInternedBenchmark(rangeset, Build(klass, items2, itemtype, interval), options.iterations)
+                print "%-11s %-15s %8s %s" % (name, "Interned", "", " ".join(["%12.4f" % interneddurations[operation] for operation in operations[:4]]))
+                for operation in ["union", "intersection", "difference"]:
+                    assert(internedresult[operation] == result[operation])
+        starttime = time.time()
+        bulkset = pynt.rangeset.SortedRangeSet.FromItems(items1, itemtype=itemtype, interval=interval)
+        print "%-11s %-15s %8d %12.4f" % (name, "FromItems", len(bulkset.ranges), time.time() - starttime)
+        # All implementations must contain the same items. Note that RangeSet does not always merge adjacent ranges.
+        (set1, result1) = results[0]
+        for (set2, result2) in results[1:]:
+            assert(set1.issubset(set2) and set2.issubset(set1) and (bulkset == set2))
+            for operation in ["union", "intersection", "difference"]:
+                assert(result1[operation].issubset(result2[operation]) and result2[operation].issubset(result1[operation]))
+            assert(result1["contains"] == result2["contains"])
+    print
+    print "batch of %d paths of %d hops, NumPy %s" % (options.pathcount, options.hopcount, 
+            pynt.rangeset.IsIntervalMatrixAvailable() and "installed" or "not installed")
+    print "%-11s %12s %12s" % ("labels", "IntersectAll", "per hop")
+    for (name, itemfunction, itemtype, interval) in labelspaces:
+        rng = random.Random(options.seed)
+        groups = [[pynt.rangeset.SortedRangeSet.FromItems(itemfunction(options.itemcount, rng), itemtype=itemtype, interval=interval) 
+                for hop in range(options.hopcount)] for path in range(options.pathcount)]
+        (matrixduration, duration, matrixresult, result) = RunBatchBenchmark(groups)
+        print "%-11s %12.4f %12.4f" % (name, matrixduration, duration)
+        assert(matrixresult == result)
+
+
+if __name__ == '__main__':
+    Main()
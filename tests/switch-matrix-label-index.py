@@ -0,0 +1,62 @@
+#!/usr/bin/python
+
+import unittest
+import sys
+sys.path.append('../')
+import pynt.xmlns
+import pynt.elements
+import pynt.technologies.ethernet
+
+class TestSwitchMatrixLabelIndex(unittest.TestCase):
+    def setUp(self):
+        pynt.xmlns.DeleteAllRDFObjects()
+        self.namespace = pynt.xmlns.GetCreateNamespace("http://example.net/labelindex#")
+        self.layer = pynt.technologies.ethernet.GetLayer('ethernet')
+        self.device = pynt.xmlns.GetCreateRDFObject("switch", namespace=self.namespace, klass=pynt.technologies.ethernet.EthernetDevice)
+        self.switchmatrix = self.device.getSwitchMatrix()
+
+    def tearDown(self):
+        pynt.xmlns.DeleteAllRDFObjects()
+
+    def test_PotentialMuxInterface(self):
+        """ A switch matrix accepts interfaces with multiple labels, which are not part of the label index
+        """
+        interface = self.device.getCreateNativeInterface("port1")
+        interface.setLayer(self.layer)
+        interface.setLabel(10)
+        interface.setSwitchMatrix(self.switchmatrix)
+        potential = self.device.getCreateNativeInterface("mux1", klass=pynt.elements.PotentialMuxInterface)
+        potential.setLayer(self.layer)
+        self.switchmatrix.addInterface(potential)
+        self.assertEqual(self.switchmatrix.getInterfaces(), [interface, potential])
+        self.assertEqual(str(self.switchmatrix.getLabelsInUse()), "{10}")
+        self.switchmatrix.updateLabelIndex(potential, None, 20)
+        self.assertEqual(self.switchmatrix.getInterfacesWithLabel(20), [])
+        other = self.device.getCreateNativeInterface("port2")
+        other.setLayer(self.layer)
+        other.setLabel(11)
+        other.setSwitchMatrix(self.switchmatrix)
+        self.assertEqual(self.switchmatrix.getInterfacesWithLabel(11), [other])
+        self.assertEqual(str(self.switchmatrix.getLabelsInUse()), "{10-11}")
+        self.assertEqual(self.switchmatrix.getActualSwitchedInterfaces(interface), [])
+
+    def test_LabelIndexOrder(self):
+        """ The interfaces with a label are in the order of the switch matrix, in whatever order the labels are set
+        """
+        interfaces = []
+        for i in range(8):
+            interface = self.device.getCreateNativeInterface("port%d" % i, klass=pynt.elements.Interface)
+            interface.setLayer(self.layer)
+            interface.setSwitchMatrix(self.switchmatrix)
+            interfaces.append(interface)
+        for i in [5, 2, 7, 0, 3, 6, 1, 4]:
+            interfaces[i].setLabel(10 + i % 2)
+        self.assertEqual(self.switchmatrix.getInterfacesWithLabel(10), interfaces[0::2])
+        self.assertEqual(self.switchmatrix.getInterfacesWithLabel(11), interfaces[1::2])
+        interfaces[3].setLabel(10)
+        self.assertEqual(self.switchmatrix.getInterfacesWithLabel(10), [interfaces[i] for i in [0, 2, 3, 4, 6]])
+        self.assertEqual(self.switchmatrix.getInterfacesWithLabel(11), [interfaces[1], interfaces[5], interfaces[7]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+
+import unittest
+import sys
+sys.path.append('../')
+import pynt
+import pynt.xmlns
+import pynt.elements
+import pynt.layers
+import pynt.rangeset
+import pynt.technologies.ethernet
+
+class TestTransactionRollback(unittest.TestCase):
+    def setUp(self):
+        """ A switch with 4 Ethernet ports, and a MAC interface that is not adapted yet
+        """
+        pynt.xmlns.DeleteAllRDFObjects()
+        self.namespace = pynt.xmlns.GetCreateNamespace("http://example.net/transaction#")
+        ethernet = pynt.technologies.ethernet.GetLayer('ethernet')
+        mac = pynt.technologies.ethernet.GetLayer('mac')
+        self.adaptationfunction = pynt.layers.GetCreateAdaptationFunction("MAC-in-Ethernet", self.namespace, clientlayer=mac, serverlayer=ethernet)
+        self.device = pynt.elements.GetCreateDevice("switch", self.namespace)
+        self.switchmatrix = pynt.xmlns.GetCreateRDFObject("switchmatrix", namespace=self.namespace, klass=pynt.elements.SwitchMatrix)
+        self.switchmatrix.setLayer(ethernet)
+        self.switchmatrix.setDevice(self.device)
+        self.switchmatrix.setSwitchingCapability(True)
+        self.ports = []
+        for p in range(4):
+            interface = self.device.getCreateNativeInterface("port%d" % p)
+            interface.setLayer(ethernet)
+            interface.setSwitchMatrix(self.switchmatrix)
+            self.ports.append(interface)
+        self.client = self.device.getCreateNativeInterface("port0-mac")
+        self.client.setLayer(mac)
+
+    def tearDown(self):
+        pynt.xmlns.DeleteAllRDFObjects()
+
+    def test_Rollback(self):
+        """ If a later change fails, the earlier cross connect, label and adaptation are rolled back
+        """
+        transaction = pynt.elements.Transaction(self.namespace.context)
+        transaction.addSwitchedInterface(self.ports[0], self.ports[1])
+        transaction.setLabel(self.ports[2], 10)
+        transaction.addClientInterface(self.ports[0], self.client, self.adaptationfunction)
+        transaction.addSwitchedInterface(self.ports[3], self.ports[3], bidirectional=True)   # fails: loopback
+        self.assertRaises(pynt.ConsistencyException, transaction.commit)
+        self.assertFalse(self.switchmatrix.hasCrossConnect(self.ports[0], self.ports[1]))
+        self.assertEqual(self.ports[1].getSwitchSourceInterfaces(), [])
+        self.assertEqual(self.ports[2].getLabel(), None)
+        self.assertEqual(self.ports[0].getClientInterfaces(), [])
+        self.assertEqual(self.ports[0].getAllClientTuples(), ())
+        self.assertEqual(self.client.getServerInterfaces(), [])
+        self.assertEqual(len(transaction.getEdits()), 4)
+        # without the failing change, the transaction is applied
+        transaction.edits.pop()
+        transaction.commit()
+        self.assert_(self.switchmatrix.hasCrossConnect(self.ports[0], self.ports[1]))
+        self.assertEqual(self.ports[2].getLabel(), 10)
+        self.assertEqual(self.ports[0].getClientInterfaces(), [self.client])
+
+    def test_InternedLabelSets(self):
+        """ Saving the state does not copy interned label sets
+        """
+        interned = pynt.rangeset.Intern(pynt.rangeset.RangeSet("1-10", itemtype=int, interval=1))
+        self.assert_(pynt.elements._copyContainer(interned) is interned)
+        self.assert_(pynt.elements._copyContainer([interned])[0] is interned)
+        mutable = pynt.rangeset.RangeSet("1-10", itemtype=int, interval=1)
+        self.assert_(pynt.elements._copyContainer(mutable) is not mutable)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Benchmark for concurrent object creation with pynt.xmlns.GetCreateRDFObject.
+N threads create the same set of objects at the same time, so most threads find
+an object that is being created by another thread, and have to wait for it."""
+
+import sys
+import time
+import threading
+import optparse
+sys.path.append('../')
+import pynt.xmlns
+
+
+class SlowRDFObject(pynt.xmlns.RDFObject):
+    """RDFObject with a slow __init__, like objects created by a device fetcher."""
+    def __init__(self, identifier, namespace, delay=0.0):
+        pynt.xmlns.RDFObject.__init__(self, identifier=identifier, namespace=namespace)
+        if delay:
+            time.sleep(delay)
+
+
+def CreateObjects(namespace, count, offset, delay):
+    for i in range(count):
+        identifier = "object%d" % ((i + offset) % count)
+        pynt.xmlns.GetCreateRDFObject(identifier, namespace=namespace, klass=SlowRDFObject, delay=delay)
+
+
+def RunBenchmark(threadcount, objectcount, delay):
+    pynt.xmlns.DeleteAllRDFObjects()
+    namespace = pynt.xmlns.GetCreateNamespace("http://example.net/benchmark%d#" % threadcount)
+    threads = []
+    for t in range(threadcount):
+        # each thread starts at a different object, and walks all objects
+        offset = t * objectcount / threadcount
+        threads.append(threading.Thread(target=CreateObjects, args=(namespace, objectcount, offset, delay)))
+    starttime = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.time() - starttime
+    assert(len(pynt.xmlns.GetAllRDFObjects(SlowRDFObject, namespace=namespace)) == objectcount)
+    return duration
+
+
+def Main():
+    parser = optparse.OptionParser()
+    parser.add_option("-n", "--objects", dest="objectcount", type="int", default=2000, help="number of objects to create")
+    parser.add_option("-d", "--delay", dest="delay", type="float", default=0.001, help="duration of each __init__ in seconds")
+    parser.add_option("-t", "--threads", dest="threads", default="1,2,4,8,16", help="comma-separated list of thread counts")
+    (options, args) = parser.parse_args()
+    print "%7s %8s %10s %12s" % ("threads", "objects", "time (s)", "objects/s")
+    for threadcount in [int(t) for t in options.threads.split(",")]:
+        duration = RunBenchmark(threadcount, options.objectcount, options.delay)
+        print "%7d %8d %10.3f %12.0f" % (threadcount, options.objectcount, duration, options.objectcount / duration)
+
+
+if __name__ == '__main__':
+    Main()